@@ -10,11 +10,12 @@ from db import (
     init_db, seed_from_csv, get_lessons, get_sentences_by_lesson,
     update_audio_paths, add_sentence, update_sentence, delete_sentence
 )
-from tts import synthesize, play_audio
-from threading import Thread
+from tts import close_audio, play_audio, stop_audio
+from tts_worker import TTSWorker
 
 PROJECT_DIR = Path(__file__).parent
 CSV_PATH = PROJECT_DIR / "data" / "sentences.csv"
+TTS_POLL_MS = 50
 
 
 def ensure_db_seeded():
@@ -33,6 +34,13 @@ class TrainerApp:
         self.current_index = 0
         self.current_lesson = None
 
+        # TTS chạy trong một process riêng, giữ engine sẵn sàng; UI poll kết quả
+        self.tts_worker = TTSWorker()
+        self.tts_worker.start()
+        self.tts_waiting = {}  # basename -> (sentence id, lang)
+        self.master.after(TTS_POLL_MS, self._poll_tts)
+        self.master.protocol("WM_DELETE_WINDOW", self.close)
+
         # Menu chọn bài
         lesson_frame = tk.Frame(master)
         lesson_frame.pack(pady=5, fill=tk.X)
@@ -145,6 +153,8 @@ class TrainerApp:
 
 
     def next_sentence(self):
+        # Câu mới: cắt ngay câu đang phát
+        stop_audio()
         rows = get_sentences_by_lesson(self.current_lesson)
         if not rows:
             self.vi_label.config(text="(Không có câu trong bài này)")
@@ -175,29 +185,43 @@ class TrainerApp:
 
         # Thread(target=self._play_vi_audio_thread).start()
 
-    def _play_vi_audio_thread(self):
-        if not self.vi_audio or not Path(self.vi_audio).exists():
-            vi_path = synthesize(self.vi, "vi", f"vi_{self._id}")
-            update_audio_paths(self._id, vi_audio=str(vi_path))
-            self.vi_audio = str(vi_path)
-        play_audio(Path(self.vi_audio))
-
-    def _play_en_audio_thread(self):
-        self.en_label.config(text=f"EN: {self.en}")
-        if not self.en_audio or not Path(self.en_audio).exists():
-            en_path = synthesize(self.en, "en", f"en_{self._id}")
-            update_audio_paths(self._id, en_audio=str(en_path))
-            self.en_audio = str(en_path)
-        play_audio(Path(self.en_audio))
+    def _play_or_synthesize(self, lang):
+        audio = self.vi_audio if lang == "vi" else self.en_audio
+        if audio and Path(audio).exists():
+            play_audio(Path(audio))
+            return
+        # Bấm nhiều lần khi đang tổng hợp: chỉ tổng hợp (và phát) một lần
+        basename = f"{lang}_{self._id}"
+        text = self.vi if lang == "vi" else self.en
+        if self.tts_worker.request(text, lang, basename):
+            self.tts_waiting[basename] = (self._id, lang)
+
+    def _poll_tts(self):
+        for basename, path in self.tts_worker.poll():
+            sentence_id, lang = self.tts_waiting.pop(basename, (None, None))
+            if sentence_id is None or not path:
+                continue
+            update_audio_paths(sentence_id, **{f"{lang}_audio": path})
+            # Chỉ phát nếu vẫn đang ở câu đó
+            if sentence_id == self._id:
+                setattr(self, f"{lang}_audio", path)
+                play_audio(Path(path))
+        self.master.after(TTS_POLL_MS, self._poll_tts)
 
     def play_vi(self):
-        Thread(target=self._play_vi_audio_thread).start()
+        self._play_or_synthesize("vi")
 
     def show_en(self):
-        Thread(target=self._play_en_audio_thread).start()
+        self.en_label.config(text=f"EN: {self.en}")
+        self._play_or_synthesize("en")
 
     def play_en(self):
-        Thread(target=self._play_en_audio_thread).start()
+        self._play_or_synthesize("en")
+
+    def close(self):
+        self.tts_worker.stop()
+        close_audio()
+        self.master.destroy()
 
     def open_manage_window(self):
         win = tk.Toplevel(self.master)
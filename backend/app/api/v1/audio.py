@@ -1,38 +1,357 @@
 """
 Audio Endpoints
 """
-from fastapi import APIRouter, Depends, Path
-from fastapi.responses import FileResponse
+import asyncio
+import os
+
+from fastapi import APIRouter, Depends, Path, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
 from sqlalchemy.orm import Session
+from starlette.background import BackgroundTask
 
 from app.core.database import get_db
-from app.core.exceptions import NotFoundException
+from app.config import settings
+from app.core.exceptions import BadRequestException, NotFoundException
+from app.core.metrics import metrics
+from app.core.http_cache import IMMUTABLE, REVALIDATE, etag_for, file_response, is_fresh, not_modified
 from app.models.sentence import Sentence
 from app.models.audio_file import AudioFile
+from app.models.lesson import Lesson
+from app.schemas.audio import AudioJobStatus, AudioWarmResponse, AudioSpriteManifest
 from app.services.tts_service import TTSService
-from app.dependencies import get_optional_user
+from app.services.audio_synthesizer import AudioStream, audio_synthesizer
+from app.services.audio_eviction import audio_access
+from app.services.audio_index import audio_index
+from app.services import audio_cache, audio_sprite, audio_variants, tts_queue
+from app.dependencies import get_current_admin
 
 router = APIRouter()
 
 
+@router.post("/audio/warm", response_model=AudioWarmResponse)
+async def warm_audio(
+    lesson_id: int = Query(None, description="Lesson to warm (default: all active lessons)"),
+    admin=Depends(get_current_admin),
+    db: Session = Depends(get_db),
+):
+    """
+    Queue audio generation for every sentence of a lesson, or of all
+    active lessons, in both languages
+    
+    Requires: Admin authentication
+    
+    Jobs are processed in the background by the pre-generation workers
+    (TTS_PREGENERATE); poll GET /audio/warm for progress.
+    """
+    if not settings.tts_pregenerate:
+        raise BadRequestException("Audio pre-generation is off (TTS_PREGENERATE)")
+    if lesson_id is not None and not db.query(Lesson.id).filter(Lesson.id == lesson_id).first():
+        raise NotFoundException(f"Lesson with id {lesson_id} not found")
+    
+    enqueued = tts_queue.enqueue_lessons(db, lesson_id)
+    db.commit()
+    return AudioWarmResponse(
+        lesson_id=lesson_id,
+        enqueued=enqueued,
+        jobs=AudioJobStatus(**tts_queue.status(db, lesson_id)),
+    )
+
+
+@router.get("/audio/warm", response_model=AudioJobStatus)
+async def get_warm_status(
+    lesson_id: int = Query(None, description="Filter by lesson ID"),
+    admin=Depends(get_current_admin),
+    db: Session = Depends(get_db),
+):
+    """
+    Audio generation job counts by status
+    
+    Requires: Admin authentication
+    """
+    return AudioJobStatus(**tts_queue.status(db, lesson_id))
+
+
+async def _lesson_sprite(db: Session, lesson_id: int, language: str, parts=None) -> dict:
+    """Manifest of the lesson's current sprite, synthesizing missing audio and rebuilding as needed."""
+    if TTSService().extension != "mp3":
+        raise BadRequestException("Audio sprites need an MP3 TTS engine")
+    if parts is None:
+        parts = _sprite_segments(db, lesson_id, language)
+    
+    missing = audio_sprite.missing_audio(lesson_id, language, parts)
+    if missing:
+        await _synthesize_segments(db, language, missing)
+    return await run_in_threadpool(audio_sprite.build, lesson_id, language, parts)
+
+
+async def _synthesize_segments(db: Session, language: str, parts: list) -> None:
+    """
+    Synthesize the audio of `parts` a few at a time (a cold lesson must not
+    fill the synthesizer queue, which answers 503 past `max_pending`) and
+    record each clip for its sentence, so the GC and the eviction see it.
+    """
+    # The pool runs max_workers at once; half the queue stays for /audio misses
+    limit = asyncio.Semaphore(max(1, min(audio_synthesizer.max_workers, audio_synthesizer.max_pending // 2)))
+    
+    async def synthesize(part):
+        async with limit:
+            return await audio_synthesizer.get(part.key, language, part.text)
+    
+    paths = await asyncio.gather(*(synthesize(part) for part in parts), return_exceptions=True)
+    done = [(part, path) for part, path in zip(parts, paths) if not isinstance(path, BaseException)]
+    for part, path in done:
+        audio_cache.record(db, part.sentence_id, language, part.key, path)
+    db.commit()
+    for part, path in done:
+        audio_index.put(part.sentence_id, language, part.key, path)
+    
+    for path in paths:
+        if isinstance(path, BaseException):
+            raise path
+
+
+def _sprite_segments(db: Session, lesson_id: int, language: str) -> list:
+    if not db.query(Lesson.id).filter(Lesson.id == lesson_id).first():
+        raise NotFoundException(f"Lesson with id {lesson_id} not found")
+    parts = audio_sprite.segments(db, lesson_id, language)
+    if not parts:
+        raise NotFoundException(f"Lesson with id {lesson_id} has no sentences")
+    return parts
+
+
+def _sprite_url(lesson_id: int, language: str, version: str) -> str:
+    return f"{settings.api_v1_prefix}/audio/lessons/{lesson_id}/{language}/sprite?v={version}"
+
+
+@router.get("/audio/lessons/{lesson_id}/{language}/manifest", response_model=AudioSpriteManifest)
+async def get_lesson_sprite_manifest(
+    request: Request,
+    lesson_id: int = Path(..., description="Lesson ID"),
+    language: str = Path(..., pattern="^(vi|en)$", description="Language: 'vi' or 'en'"),
+    db: Session = Depends(get_db),
+):
+    """
+    Get the manifest of a lesson's audio sprite
+    
+    Public endpoint (guest + registered users)
+    
+    Returns the versioned sprite URL and, for each sentence in lesson
+    order, its byte range and time range within the sprite. The sprite is
+    rebuilt (reusing unchanged segments) when the lesson's sentences change.
+    """
+    parts = _sprite_segments(db, lesson_id, language)
+    etag = etag_for(audio_sprite.version(parts))
+    if is_fresh(request, etag):
+        return not_modified(etag, REVALIDATE)
+    
+    manifest = await _lesson_sprite(db, lesson_id, language, parts)
+    body = AudioSpriteManifest(**manifest, url=_sprite_url(lesson_id, language, manifest["version"]))
+    return JSONResponse(body.model_dump(), headers={"ETag": etag, "Cache-Control": REVALIDATE})
+
+
+@router.get("/audio/lessons/{lesson_id}/{language}/sprite")
+async def get_lesson_sprite(
+    request: Request,
+    lesson_id: int = Path(..., description="Lesson ID"),
+    language: str = Path(..., pattern="^(vi|en)$", description="Language: 'vi' or 'en'"),
+    v: str = Query(None, pattern="^[0-9a-f]{64}$", description="Sprite version, as in the manifest URL"),
+    db: Session = Depends(get_db),
+):
+    """
+    Get a lesson's audio sprite: every sentence's audio in one MP3
+    
+    Public endpoint (guest + registered users)
+    
+    Use the manifest for segment offsets. Versioned URLs (from the
+    manifest) are immutable; a version that is no longer current answers
+    404, so fetch the manifest again.
+    """
+    filename = f"lesson_{lesson_id}_{language}.mp3"
+    
+    if v is not None:
+        etag = etag_for(v)
+        if is_fresh(request, etag):
+            return not_modified(etag, IMMUTABLE)
+        path = audio_sprite.sprite_path(lesson_id, language, v)
+        if not os.path.exists(path):
+            raise NotFoundException("Sprite version is out of date, fetch the manifest again")
+        return file_response(request, path, etag, IMMUTABLE, "audio/mpeg", filename)
+    
+    manifest = await _lesson_sprite(db, lesson_id, language)
+    path = audio_sprite.sprite_path(lesson_id, language, manifest["version"])
+    return file_response(request, path, etag_for(manifest["version"]), REVALIDATE, "audio/mpeg", filename)
+
+
+def _variant_etag(key: str, variant: audio_variants.Variant) -> str:
+    if variant.name == audio_variants.ORIGINAL:
+        return etag_for(key)
+    return etag_for(f"{key}.{variant.name}")
+
+
+async def _serve_audio(
+    request: Request,
+    key: str,
+    audio_path: str,
+    variant: audio_variants.Variant,
+    cache_control: str,
+    name: str,
+    negotiated: bool,
+    stat: os.stat_result = None,
+) -> Response:
+    """
+    Serve the audio at `audio_path` (whose `stat` may be known already) as
+    `variant`, transcoding on first use (the original if that fails), or
+    redirect to its copy in the shared storage, once that is known to exist.
+    """
+    path = audio_path
+    if variant.name != audio_variants.ORIGINAL:
+        path = audio_variants.variant_path(key, variant)
+        if not os.path.exists(path):
+            path = await run_in_threadpool(audio_variants.transcode, key, variant)
+        if path is None:
+            variant, path = audio_variants.original(), audio_path
+        else:
+            stat = None
+    
+    etag = _variant_etag(key, variant)
+    if settings.audio_redirect:
+        url = TTSService().presigned_url(path)
+        if url is not None:
+            # The signed URL expires: let clients reuse the redirect for half its life
+            headers = {"ETag": etag, "Cache-Control": f"private, max-age={settings.audio_presign_seconds // 2}"}
+            return _vary(RedirectResponse(url, status_code=307, headers=headers), negotiated)
+    
+    response = file_response(request, path, etag, cache_control, variant.media_type, f"{name}.{variant.extension}", stat)
+    return _vary(response, negotiated)
+
+
+def _streamable(request: Request, tts: TTSService, variant: audio_variants.Variant) -> bool:
+    """Whether a miss can be answered while it is synthesized: whole original audio from a streaming engine."""
+    return settings.tts_stream and tts.streams and variant.name == audio_variants.ORIGINAL and "range" not in request.headers
+
+
+async def _stream_audio(
+    db: Session,
+    sentence_id: int,
+    language: str,
+    key: str,
+    text: str,
+    variant: audio_variants.Variant,
+    cache_control: str,
+    name: str,
+    negotiated: bool,
+) -> Response:
+    """
+    Answer a miss with the audio as it is synthesized (while the job saves
+    it to the cache), recording it for the sentence once it is complete.
+    """
+    stream = audio_synthesizer.stream(key, language, text)
+    # Failures before the first byte still get a proper status
+    await asyncio.shield(asyncio.wrap_future(stream.ready))
+    
+    audio_access.add(sentence_id, language)
+    headers = {
+        "ETag": _variant_etag(key, variant),
+        "Cache-Control": cache_control,
+        "Content-Disposition": f'attachment; filename="{name}.{variant.extension}"',
+    }
+    task = BackgroundTask(_record_streamed, db, sentence_id, language, key, stream)
+    response = StreamingResponse(stream, media_type=variant.media_type, headers=headers, background=task)
+    return _vary(response, negotiated)
+
+
+def _record_streamed(db: Session, sentence_id: int, language: str, key: str, stream: AudioStream) -> None:
+    if stream.path is None:
+        return  # failed mid-stream: nothing to record
+    # The request's session was closed when the endpoint returned; this reopens it
+    try:
+        audio_cache.record(db, sentence_id, language, key, stream.path)
+        db.commit()
+    finally:
+        db.close()
+    audio_index.put(sentence_id, language, key, stream.path)
+
+
+def _vary(response: Response, negotiated: bool) -> Response:
+    """Caches must key responses chosen from the Accept header on it."""
+    if negotiated:
+        response.headers["Vary"] = "Accept"
+    return response
+
+
 @router.get("/audio/{sentence_id}/{language}")
 async def get_audio(
+    request: Request,
     sentence_id: int = Path(..., description="Sentence ID"),
     language: str = Path(..., pattern="^(vi|en)$", description="Language: 'vi' or 'en'"),
-    user=Depends(get_optional_user),
+    v: str = Query(None, pattern="^[0-9a-f]{64}$", description="Audio version, as in the sentence's audio URL"),
+    quality: str = Query(None, pattern="^(high|medium|low)$", description="high: as synthesized, medium: mono 16 kHz MP3, low: Opus"),
     db: Session = Depends(get_db),
 ):
     """
     Get audio file for a sentence
     - **sentence_id**: Sentence ID
     - **language**: Language code ('vi' or 'en')
+    - **v**: Audio version (optional; sentence responses include it in their audio URLs)
+    - **quality**: Encoding (optional; otherwise chosen from the Accept header)
     
     Public endpoint (guest + registered users)
     
-    Returns: MP3 audio file
+    Returns: the audio as synthesized (MP3 for gTTS, WAV for pyttsx3), or
+    a compact variant: `quality=low` or an Accept header naming audio/ogg
+    gets mono Opus, `quality=medium` mono 16 kHz MP3.
     
-    Note: Audio is generated on-demand if not exists and cached for future requests
+    Note: Audio is generated on-demand if not exists and cached for future requests,
+    keyed by its text: sentences with the same phrase share one file.
+    A miss is streamed as it is synthesized (no Content-Length), unless
+    it asks for a range or a variant.
+    Concurrent requests for the same audio share one generation; when the
+    generator queue is full the endpoint answers 503 with Retry-After.
+    
+    Caching: the ETag is the audio's content key (and variant). Versioned
+    URLs are immutable and revalidate without touching the database or
+    the file; unversioned URLs must revalidate (304 when unchanged). Range
+    requests are answered with 206. Audio served before is looked up in
+    an in-process index rather than `audio_files`; unversioned URLs still
+    read the sentence's text to check the entry is current.
     """
+    name = f"sentence_{sentence_id}_{language}"
+    variant = audio_variants.negotiate(request.headers.get("accept"), quality)
+    negotiated = quality is None
+    indexed = audio_index.get(sentence_id, language)
+    
+    if v is not None:
+        # A versioned URL names its content, so the request alone decides
+        served = audio_variants.resolve(v, variant)
+        etag = _variant_etag(v, served)
+        if is_fresh(request, etag):
+            return _vary(not_modified(etag, IMMUTABLE), negotiated)
+        if indexed is not None and indexed.key == v:
+            metrics.incr("tts.cache.hits")
+            audio_access.add(sentence_id, language)
+            return await _serve_audio(request, v, indexed.path, served, IMMUTABLE, name, negotiated, indexed.stat)
+        audio_path = TTSService().get_audio_path(v)
+        if os.path.exists(audio_path):
+            metrics.incr("tts.cache.hits")
+            audio_access.add(sentence_id, language)
+            return await _serve_audio(request, v, audio_path, served, IMMUTABLE, name, negotiated)
+        # Not cached (yet): fall through to the sentence's current audio
+    elif indexed is not None:
+        # Another worker may have edited the sentence without this index hearing
+        # of it: check the entry against the current text (one column, by key)
+        text_column = Sentence.vi_text if language == "vi" else Sentence.en_text
+        text = db.query(text_column).filter(Sentence.id == sentence_id).scalar()
+        if text is not None and TTSService().audio_key(text, language) == indexed.key:
+            served = audio_variants.resolve(indexed.key, variant)
+            etag = _variant_etag(indexed.key, served)
+            if is_fresh(request, etag):
+                return _vary(not_modified(etag, REVALIDATE), negotiated)
+            metrics.incr("tts.cache.hits")
+            audio_access.add(sentence_id, language)
+            return await _serve_audio(request, indexed.key, indexed.path, served, REVALIDATE, name, negotiated, indexed.stat)
+        # Stale: resolve the sentence's current audio as if it were not indexed
+    
     # Get sentence
     sentence = db.query(Sentence).filter(Sentence.id == sentence_id).first()
     if not sentence:
@@ -41,37 +360,36 @@ async def get_audio(
     # Get text based on language
     text = sentence.vi_text if language == "vi" else sentence.en_text
     
-    # Generate audio (or get cached)
+    # Audio is cached by content: an edited sentence resolves to a new key
+    key = TTSService().audio_key(text, language)
+    served = audio_variants.resolve(key, variant)
+    etag = _variant_etag(key, served)
+    cache_control = IMMUTABLE if v == key else REVALIDATE
+    if is_fresh(request, etag):
+        return _vary(not_modified(etag, cache_control), negotiated)
+    
     tts = TTSService()
-    audio_path = tts.generate_audio(text, language, sentence_id)
+    if _streamable(request, tts, served) and not os.path.exists(tts.get_audio_path(key)):
+        return await _stream_audio(db, sentence_id, language, key, text, served, cache_control, name, negotiated)
+    
+    # Generate audio (or get cached) without blocking the event loop
+    audio_path = await audio_synthesizer.get(key, language, text)
     
-    # Check if AudioFile record exists, create if not
+    # Point the AudioFile record at the current blob
     audio_file = (
         db.query(AudioFile)
         .filter(AudioFile.sentence_id == sentence_id, AudioFile.language == language)
         .first()
     )
     
-    if not audio_file:
-        # Get file size
-        import os
-        file_size = os.path.getsize(audio_path) if os.path.exists(audio_path) else 0
-        
-        audio_file = AudioFile(
-            sentence_id=sentence_id,
-            language=language,
-            file_path=audio_path,
-            file_size=file_size,
-        )
-        db.add(audio_file)
+    if not audio_file or audio_file.audio_key != key:
+        audio_cache.record(db, sentence_id, language, key, audio_path)
         db.commit()
+    audio_index.put(sentence_id, language, key, audio_path)
     
     # Return audio file
-    return FileResponse(
-        audio_path,
-        media_type="audio/mpeg",
-        filename=f"sentence_{sentence_id}_{language}.mp3",
-    )
+    audio_access.add(sentence_id, language)
+    return await _serve_audio(request, key, audio_path, served, cache_control, name, negotiated)
 
 
 @router.delete("/audio/{sentence_id}")
@@ -84,18 +402,22 @@ async def delete_audio_cache(
     
     This is a public endpoint to allow cache invalidation
     
-    Use case: When sentence text is updated
+    Use case: Force the audio to be synthesized again (text edits
+    already resolve to new audio on their own)
     """
     # Check sentence exists
     sentence = db.query(Sentence).filter(Sentence.id == sentence_id).first()
     if not sentence:
         raise NotFoundException(f"Sentence with id {sentence_id} not found")
     
-    # Delete audio files
-    TTSService.delete_audio(sentence_id)
-    
-    # Delete AudioFile records
+    # Delete AudioFile records, then the blobs no other sentence shares
+    keys = [
+        key for (key,) in
+        db.query(AudioFile.audio_key).filter(AudioFile.sentence_id == sentence_id)
+    ]
     db.query(AudioFile).filter(AudioFile.sentence_id == sentence_id).delete()
     db.commit()
+    audio_index.discard(sentence_id)
+    audio_cache.release(db, keys)
     
     return {"message": f"Audio cache for sentence {sentence_id} deleted"}
@@ -13,6 +13,9 @@ from app.models.sentence import Sentence
 from app.schemas.lesson import LessonCreate, LessonUpdate, LessonInDB
 from app.schemas.common import PaginatedResponse, PaginationParams, PaginationMeta
 from app.dependencies import get_current_admin, get_optional_user
+from app.services.audio_index import audio_index
+from app.services.lesson_pool import lesson_pool_index
+from app.services import lesson_progress
 
 router = APIRouter()
 
@@ -135,6 +138,8 @@ async def update_lesson(
     
     db.commit()
     db.refresh(lesson)
+    # Active flag and order feed the all-lessons corpus index
+    lesson_pool_index.invalidate(lesson_id)
     return lesson
 
 
@@ -155,8 +160,14 @@ async def delete_lesson(
     if not lesson:
         raise NotFoundException(f"Lesson with id {lesson_id} not found")
     
+    sentence_ids = [sentence_id for (sentence_id,) in db.query(Sentence.id).filter(Sentence.lesson_id == lesson_id)]
     db.delete(lesson)
+    db.flush()
+    lesson_progress.refresh(db, [lesson_id])
     db.commit()
+    lesson_pool_index.invalidate(lesson_id)
+    for sentence_id in sentence_ids:
+        audio_index.discard(sentence_id)
     return None
 
 
@@ -175,5 +186,6 @@ async def get_lesson_sentences_count(
     if not lesson:
         raise NotFoundException(f"Lesson with id {lesson_id} not found")
     
-    count = db.query(Sentence).filter(Sentence.lesson_id == lesson_id).count()
+    # Served from the cached lesson pool, kept current by the sentence endpoints
+    count = len(lesson_pool_index.get(db, lesson_id))
     return {"lesson_id": lesson_id, "sentences_count": count}
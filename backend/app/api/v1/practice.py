@@ -2,58 +2,132 @@
 Practice Endpoints
 """
 from fastapi import APIRouter, Depends, Query, status
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app.config import settings
 from app.core.database import get_db
 from app.core.exceptions import NotFoundException
 from app.models.sentence import Sentence
 from app.schemas.practice import (
     NextSentenceResponse,
+    PracticeBatchResponse,
+    PracticeRecordBatchRequest,
     PracticeRecordRequest,
     PracticeStats,
 )
+from app.schemas.sentence import SentenceWithAudio
 from app.services.practice_service import PracticeService
+from app.services.srs import Review
 from app.dependencies import get_optional_user
 
 router = APIRouter()
 
 
+MODE_PATTERN = "^(" + "|".join(PracticeService.MODES) + ")$"
+
+
+def _resolve_mode(mode: str | None, user) -> str:
+    """Default to smart selection for users and random for guests."""
+    if mode is None or (mode == "smart" and not user):
+        return "smart" if user else "random"
+    return mode
+
+
+def _seconds(minutes: float | None) -> float | None:
+    return None if minutes is None else minutes * 60
+
+
 @router.get("/practice/next", response_model=NextSentenceResponse)
 async def get_next_sentence(
     lesson_id: int = Query(None, description="Filter by lesson ID"),
+    mode: str = Query(None, pattern=MODE_PATTERN, description="smart, random, ordered or shuffled"),
+    cursor: str = Query(None, description="Cursor from the previous ordered/shuffled response"),
+    recent_minutes: float = Query(
+        None, ge=0, le=settings.recent_practice_max_window_seconds / 60,
+        description="Smart mode: queue sentences practiced this recently last",
+    ),
     user=Depends(get_optional_user),
     db: Session = Depends(get_db),
 ):
     """
     Get next sentence for practice
     
-    Smart selection algorithm:
-    - For authenticated users: Returns least practiced sentence (excluding recently practiced < 5 min)
+    Smart selection algorithm (SM-2 spaced repetition):
+    - For authenticated users: Returns the most overdue review, then an unpracticed sentence,
+      then the next one coming due (recently practiced ones last, see recent_minutes)
     - For guests: Returns random sentence
     
-    - **lesson_id**: Optional lesson filter
+    Walk modes (guest + registered users), resumed with the returned `cursor`:
+    - **ordered**: Lesson order, wrapping around at the end
+    - **shuffled**: Every sentence once in a random order, then a new shuffle
+    
+    - **lesson_id**: Optional lesson filter; omit to practice across all lessons (smart or random)
+    - **mode**: Selection mode (default: smart for users, random for guests)
+    - **cursor**: Opaque walk position; omit to start a new walk
+    - **recent_minutes**: Smart mode recency window (default: 5)
     
     Public endpoint (guest + registered users)
     """
-    sentence, progress = PracticeService.get_next_sentence(db, lesson_id, "smart" if user else "random", user)
+    mode = _resolve_mode(mode, user)
+    next_cursor = None
+    if mode in PracticeService.WALK_MODES:
+        sentences, progress, next_cursor = PracticeService.walk(db, lesson_id, mode, 1, cursor, user)
+        sentence = sentences[0]
+    else:
+        sentence, progress = PracticeService.get_next_sentence(db, lesson_id, mode, user, _seconds(recent_minutes))
     if not sentence:
         raise NotFoundException("No sentences available for practice")
     
-    # Convert to SentenceWithAudio schema
-    from app.schemas.sentence import SentenceWithAudio
-    sentence_data = SentenceWithAudio(
-        id=sentence.id,
-        lesson_id=sentence.lesson_id,
-        vi_text=sentence.vi_text,
-        en_text=sentence.en_text,
-        order_index=sentence.order_index,
-        created_at=sentence.created_at,
-        updated_at=sentence.updated_at,
-        vi_audio_url=f"/api/v1/audio/{sentence.id}/vi",
-        en_audio_url=f"/api/v1/audio/{sentence.id}/en"
+    return NextSentenceResponse(
+        sentence=SentenceWithAudio.from_sentence(sentence),
+        progress=progress,
+        cursor=next_cursor,
     )
+
+
+@router.get("/practice/batch", response_model=PracticeBatchResponse)
+async def get_sentence_batch(
+    lesson_id: int = Query(None, description="Filter by lesson ID"),
+    count: int = Query(10, ge=1, le=50, description="Number of sentences to queue"),
+    mode: str = Query(None, pattern=MODE_PATTERN, description="smart, random, ordered or shuffled"),
+    cursor: str = Query(None, description="Cursor from the previous ordered/shuffled response"),
+    recent_minutes: float = Query(
+        None, ge=0, le=settings.recent_practice_max_window_seconds / 60,
+        description="Smart mode: queue sentences practiced this recently last",
+    ),
+    user=Depends(get_optional_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Get the next sentences for practice as an ordered queue
+    
+    Same selection as /practice/next, returned `count` at a time so clients
+    can drill offline and warm audio URLs ahead of time. May return fewer
+    than `count` sentences when the lesson is smaller.
+    
+    - **lesson_id**: Optional lesson filter; omit to practice across all lessons (smart or random)
+    - **count**: Queue length (1-50, default: 10)
+    - **mode**: Selection mode (default: smart for users, random for guests)
+    - **cursor**: Opaque walk position for ordered/shuffled; omit to start a new walk
+    - **recent_minutes**: Smart mode recency window (default: 5)
+    
+    Public endpoint (guest + registered users)
+    """
+    mode = _resolve_mode(mode, user)
+    next_cursor = None
+    if mode in PracticeService.WALK_MODES:
+        sentences, progress, next_cursor = PracticeService.walk(db, lesson_id, mode, count, cursor, user)
+    else:
+        sentences, progress = PracticeService.get_next_sentences(
+            db, lesson_id, count, mode, user, _seconds(recent_minutes)
+        )
     
-    return NextSentenceResponse(sentence=sentence_data, progress=progress)
+    return PracticeBatchResponse(
+        sentences=[SentenceWithAudio.from_sentence(s) for s in sentences],
+        progress=progress,
+        cursor=next_cursor,
+    )
 
 
 @router.post("/practice/record", status_code=status.HTTP_201_CREATED)
@@ -69,6 +143,7 @@ async def record_practice(
     For guests: No-op (returns success but doesn't save)
     
     - **sentence_id**: Sentence that was practiced
+    - **grade**: Recall quality 0-5 (default: 4); below 3 restarts the review interval
     
     Public endpoint (guest + registered users)
     """
@@ -79,7 +154,7 @@ async def record_practice(
     
     # Record practice (only for authenticated users)
     if user:
-        PracticeService.record_practice(db, user, request.sentence_id)
+        PracticeService.record_practice(db, user, request.sentence_id, request.grade)
         message = "Practice recorded successfully"
     else:
         message = "Practice completed (not recorded for guest)"
@@ -87,6 +162,42 @@ async def record_practice(
     return {"message": message, "sentence_id": request.sentence_id}
 
 
+@router.post("/practice/record/batch", status_code=status.HTTP_201_CREATED)
+async def record_practice_batch(
+    request: PracticeRecordBatchRequest,
+    user=Depends(get_optional_user),
+    db: Session = Depends(get_db),
+):
+    """
+    Record many practice sessions at once (e.g. syncing offline practice)
+    
+    For authenticated users: Validates all sentence ids in one query and applies
+    every record with a single upsert; repeats of a sentence are merged
+    For guests: No-op (returns success but doesn't save)
+    
+    - **records**: List of `{sentence_id, practiced_at, count, grade}` (1-1000 items)
+    
+    Public endpoint (guest + registered users)
+    """
+    sentence_ids = {record.sentence_id for record in request.records}
+    found = set(db.execute(select(Sentence.id).where(Sentence.id.in_(sentence_ids))).scalars())
+    missing = sorted(sentence_ids - found)
+    if missing:
+        raise NotFoundException(f"Sentences not found: {', '.join(map(str, missing))}")
+    
+    if user:
+        recorded = PracticeService.record_practice_batch(db, user, [
+            Review(user.id, record.sentence_id, record.grade, record.practiced_at, record.count)
+            for record in request.records
+        ])
+        message = "Practice batch recorded successfully"
+    else:
+        recorded = 0
+        message = "Practice completed (not recorded for guest)"
+    
+    return {"message": message, "recorded": recorded, "sentence_ids": sorted(sentence_ids)}
+
+
 @router.get("/practice/stats", response_model=PracticeStats)
 async def get_practice_stats(
     lesson_id: int = Query(None, description="Filter by lesson ID"),
@@ -105,28 +216,27 @@ async def get_practice_stats(
     """
     from app.core.exceptions import UnauthorizedException
     from app.models.progress import UserProgress
-    from sqlalchemy import func
+    from app.services import lesson_progress
     
     if not user:
         raise UnauthorizedException("Authentication required for statistics")
     
-    # Base query
-    query = db.query(UserProgress).filter(UserProgress.user_id == user.id)
-    
-    # Lesson filter
+    # Counters: one read of the per-lesson rollup
     if lesson_id is not None:
-        query = query.join(Sentence).filter(Sentence.lesson_id == lesson_id)
-    
-    # Count stats
-    total_practiced = query.count()
-    total_practice_count = query.with_entities(func.sum(UserProgress.practiced_count)).scalar() or 0
+        total_practiced, total_practice_count = lesson_progress.get(db, user.id, lesson_id)
+    else:
+        total_practiced, total_practice_count = lesson_progress.totals(db, user.id)
     
-    # Recent activity (last 7 days)
+    # Recent activity (last 7 days) is a sliding window, so it is still counted
     from datetime import datetime, timedelta
     week_ago = datetime.utcnow() - timedelta(days=7)
-    recent_count = (
-        query.filter(UserProgress.last_practiced_at >= week_ago).count()
+    query = db.query(UserProgress).filter(
+        UserProgress.user_id == user.id,
+        UserProgress.last_practiced_at >= week_ago,
     )
+    if lesson_id is not None:
+        query = query.join(Sentence).filter(Sentence.lesson_id == lesson_id)
+    recent_count = query.count()
     
     return PracticeStats(
         total_practiced=total_practiced,
@@ -10,6 +10,7 @@ from app.core.database import get_db
 from app.core.exceptions import NotFoundException, BadRequestException
 from app.models.lesson import Lesson
 from app.models.sentence import Sentence
+from app.models.audio_file import AudioFile
 from app.schemas.sentence import (
     SentenceCreate,
     SentenceUpdate,
@@ -19,6 +20,10 @@ from app.schemas.sentence import (
 )
 from app.schemas.common import PaginatedResponse, PaginationParams, PaginationMeta
 from app.dependencies import get_current_admin, get_optional_user
+from app.services.audio_index import audio_index
+from app.services.lesson_pool import lesson_pool_index
+from app.services import lesson_progress, tts_queue
+from app.services.tts_service import audio_url
 
 router = APIRouter()
 
@@ -76,8 +81,8 @@ async def get_sentences(
                 order_index=sentence.order_index,
                 created_at=sentence.created_at,
                 updated_at=sentence.updated_at,
-                vi_audio_url=f"/api/v1/audio/{sentence.id}/vi",
-                en_audio_url=f"/api/v1/audio/{sentence.id}/en",
+                vi_audio_url=audio_url(sentence.id, "vi", sentence.vi_text),
+                en_audio_url=audio_url(sentence.id, "en", sentence.en_text),
             )
         )
     
@@ -131,8 +136,8 @@ async def get_sentence(
         order_index=sentence.order_index,
         created_at=sentence.created_at,
         updated_at=sentence.updated_at,
-        vi_audio_url=f"/api/v1/audio/{sentence.id}/vi",
-        en_audio_url=f"/api/v1/audio/{sentence.id}/en",
+        vi_audio_url=audio_url(sentence.id, "vi", sentence.vi_text),
+        en_audio_url=audio_url(sentence.id, "en", sentence.en_text),
     )
 
 
@@ -168,8 +173,11 @@ async def create_sentence(
     
     sentence = Sentence(**sentence_data.model_dump())
     db.add(sentence)
+    db.flush()
+    tts_queue.enqueue(db, [sentence.id])
     db.commit()
     db.refresh(sentence)
+    lesson_pool_index.invalidate(sentence.lesson_id)
     return sentence
 
 
@@ -217,9 +225,12 @@ async def bulk_create_sentences(
         db.add(sentence)
         created_sentences.append(sentence)
     
+    db.flush()
+    tts_queue.enqueue(db, [sentence.id for sentence in created_sentences])
     db.commit()
     for sentence in created_sentences:
         db.refresh(sentence)
+    lesson_pool_index.invalidate(bulk_data.lesson_id)
     
     return created_sentences
 
@@ -241,18 +252,33 @@ async def update_sentence(
         raise NotFoundException(f"Sentence with id {sentence_id} not found")
     
     # Update fields
+    old_lesson_id = sentence.lesson_id
     update_data = sentence_data.model_dump(exclude_unset=True)
+    changed_languages = [
+        language for language in ("vi", "en")
+        if f"{language}_text" in update_data and update_data[f"{language}_text"] != getattr(sentence, f"{language}_text")
+    ]
     for field, value in update_data.items():
         setattr(sentence, field, value)
     
+    if sentence.lesson_id != old_lesson_id:
+        # Practice history follows the sentence to its new lesson
+        db.flush()
+        lesson_progress.move(db, [sentence_id], old_lesson_id, sentence.lesson_id)
+    
+    # New text resolves to new audio: drop the old mapping (its blob is
+    # garbage-collected once no sentence shares it) and queue the new one
+    if changed_languages:
+        db.query(AudioFile).filter(
+            AudioFile.sentence_id == sentence_id,
+            AudioFile.language.in_(changed_languages),
+        ).delete(synchronize_session=False)
+        tts_queue.enqueue(db, [sentence_id], changed_languages)
     db.commit()
     db.refresh(sentence)
-    
-    # Delete cached audio files if text changed
-    if "vi_text" in update_data or "en_text" in update_data:
-        from app.services.tts_service import TTSService
-        tts = TTSService()
-        tts.delete_audio(sentence_id)
+    lesson_pool_index.invalidate(old_lesson_id, sentence.lesson_id)
+    if changed_languages:
+        audio_index.discard(sentence_id, *changed_languages)
     
     return sentence
 
@@ -268,17 +294,18 @@ async def delete_sentence(
     
     Requires: Admin authentication
     
-    Note: This will also delete associated audio files
+    Note: Its audio is removed by the audio garbage collector unless
+    another sentence shares it
     """
     sentence = db.query(Sentence).filter(Sentence.id == sentence_id).first()
     if not sentence:
         raise NotFoundException(f"Sentence with id {sentence_id} not found")
     
-    # Delete audio files
-    from app.services.tts_service import TTSService
-    tts = TTSService()
-    tts.delete_audio(sentence_id)
-    
+    lesson_id = sentence.lesson_id
     db.delete(sentence)
+    db.flush()
+    lesson_progress.refresh(db, [lesson_id])
     db.commit()
+    lesson_pool_index.invalidate(lesson_id)
+    audio_index.discard(sentence_id)
     return None
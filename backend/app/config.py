@@ -16,9 +16,51 @@ class Settings(BaseSettings):
     refresh_token_expire_days: int = 7
     
     # TTS
-    tts_engine: str = "gtts"
+    tts_engine: str = "gtts"  # gtts | pyttsx3 | synthetic (silent, offline: for load tests)
+    tts_voice: str = ""  # gTTS accent domain (e.g. "com.au") or pyttsx3 voice id; part of the audio cache key
     audio_dir: str = "./audio"
-    max_audio_size_mb: int = 5
+    max_audio_size_mb: int = 512  # Audio cache budget: least recently served clips are evicted past it (0 = unbounded)
+    audio_local_max_mb: int = 512  # With shared storage: this node's copies, least recently served dropped past it (0 = unbounded)
+    tts_max_workers: int = 4  # Concurrent syntheses per worker process
+    tts_max_pending: int = 64  # Queued + running syntheses before /audio answers 503
+    tts_chunk_min_chars: int = 40  # Long sentences are cached per clause of at least this length (0: whole)
+    audio_chunk_max_age_days: float = 30.0  # Clause audio unused this long is garbage-collected
+    tts_stream: bool = True  # Stream cache misses to the client while they are synthesized
+    tts_pregenerate: bool = False  # Queue audio jobs on sentence writes and run the workers in this process
+    tts_pregenerate_workers: int = 2  # Synthesizer slots the job workers may hold (0: only queue jobs)
+    tts_job_max_attempts: int = 3
+    tts_job_retry_seconds: float = 30.0  # Delay before retrying a failed job, doubled per attempt
+    tts_job_poll_seconds: float = 5.0
+    tts_job_lease_seconds: float = 600.0  # A job running longer belongs to a dead process and is claimed again
+    audio_gc_grace_seconds: float = 3600.0  # Unreferenced audio younger than this is kept
+    tts_synthetic_seconds_per_char: float = 0.06
+    tts_synthetic_latency_seconds: float = 0.0  # Stands in for the gTTS round trip
+    audio_access_flush_seconds: float = 5.0  # Batching of hit counts / last-served times
+    audio_evict_interval_seconds: float = 60.0
+    audio_evict_min_idle_seconds: float = 300.0  # Clips served more recently are never evicted
+    audio_index_ttl_seconds: float = 60.0  # In-process (sentence, language) -> audio index; 0 disables
+    audio_storage: str = "local"  # local | s3: shared store behind audio_dir, so nodes synthesize once
+    audio_storage_dir: str = ""  # local: a directory shared between nodes (empty: audio_dir only)
+    audio_s3_bucket: str = ""
+    audio_s3_prefix: str = "audio/"
+    audio_s3_endpoint_url: str = ""  # e.g. http://minio:9000
+    audio_s3_region: str = ""
+    audio_redirect: bool = False  # Redirect /audio to presigned storage URLs instead of proxying
+    audio_presign_seconds: int = 3600
+    ffmpeg_path: str = "ffmpeg"  # Transcodes compact audio variants; without it the original is served
+    audio_transcode_timeout: float = 30.0
+    
+    # Practice
+    lesson_pool_ttl_seconds: float = 300.0
+    practice_write_behind: bool = False
+    practice_flush_interval_seconds: float = 1.0
+    practice_flush_max_pending: int = 500
+    recent_practice_backend: str = "memory"  # memory | redis (shared between workers)
+    recent_practice_redis_url: str = "redis://localhost:6379/0"
+    recent_practice_window_seconds: float = 300.0
+    recent_practice_max_window_seconds: float = 3600.0
+    recent_practice_capacity: int = 256  # per user
+    recent_practice_max_users: int = 10000
     
     # CORS
     cors_origins: str = "http://localhost:3000"
@@ -0,0 +1,145 @@
+"""
+Conditional and partial file responses
+
+Starlette's FileResponse sends the whole file every time. These helpers
+add what browsers and audio players use to avoid that: strong ETags with
+If-None-Match / If-Modified-Since (304), and single byte ranges with
+If-Range (206, 416 when unsatisfiable).
+"""
+import os
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Iterator, Optional
+
+from fastapi import Request, Response
+from fastapi.responses import FileResponse, StreamingResponse
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+
+_CHUNK_SIZE = 64 * 1024
+
+
+def etag_for(key: str) -> str:
+    return f'"{key}"'
+
+
+def _etag_listed(header: str, etag: str) -> bool:
+    """If-None-Match uses the weak comparison: W/ prefixes are ignored."""
+    if header.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in header.split(","))
+
+
+def _not_modified_since(header: str, mtime: float) -> bool:
+    try:
+        return int(mtime) <= parsedate_to_datetime(header).timestamp()
+    except (TypeError, ValueError):
+        return False
+
+
+def is_fresh(request: Request, etag: str, mtime: Optional[float] = None) -> bool:
+    """
+    Whether the client's cached copy is current. If-Modified-Since is only
+    consulted without If-None-Match, and only when `mtime` is known.
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_listed(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None and mtime is not None:
+        return _not_modified_since(if_modified_since, mtime)
+    return False
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": cache_control})
+
+
+def _parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """
+    (start, end) inclusive for a single `bytes=` range, None to ignore the
+    header (malformed or multiple ranges: the full file is sent), or
+    (size, size) when the range cannot be satisfied.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        if first:
+            start = int(first)
+            end = int(last) if last else max(start, size - 1)
+            if end < start:
+                return None
+        else:
+            suffix = int(last)
+            if suffix <= 0:
+                return (size, size)
+            start, end = max(size - suffix, 0), size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        return (size, size)
+    return start, min(end, size - 1)
+
+
+def _if_range_matches(request: Request, etag: str, mtime: float) -> bool:
+    if_range = request.headers.get("if-range")
+    if if_range is None:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag  # strong comparison
+    return _not_modified_since(if_range, mtime)
+
+
+def _iter_range(path: str, start: int, length: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def file_response(
+    request: Request,
+    path: str,
+    etag: str,
+    cache_control: str,
+    media_type: str,
+    filename: Optional[str] = None,
+    stat: Optional[os.stat_result] = None,
+) -> Response:
+    """Serve `path` honouring conditional and Range request headers. Pass `stat` if already known."""
+    stat = stat or os.stat(path)
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes",
+    }
+    if is_fresh(request, etag, stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if range_header and _if_range_matches(request, etag, stat.st_mtime):
+        byte_range = _parse_range(range_header, stat.st_size)
+        if byte_range == (stat.st_size, stat.st_size):
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{stat.st_size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+            headers["Content-Length"] = str(length)
+            return StreamingResponse(
+                _iter_range(path, start, length),
+                status_code=206,
+                media_type=media_type,
+                headers=headers,
+            )
+
+    return FileResponse(path, media_type=media_type, filename=filename, headers=headers, stat_result=stat)
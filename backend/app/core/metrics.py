@@ -0,0 +1,82 @@
+"""
+In-process Metrics
+Thread-safe counters, gauges and timers exposed to admins on GET /metrics.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class Metrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = defaultdict(float)
+        self._gauges: dict[str, float] = {}
+        self._timers: dict[str, list[float]] = {}  # name -> [count, total, max]
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """Increment a counter."""
+        with self._lock:
+            self._counters[name] += value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to its current value."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, seconds: float) -> None:
+        """Record one duration sample for a timer."""
+        with self._lock:
+            timer = self._timers.setdefault(name, [0, 0.0, 0.0])
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Time the wrapped block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def snapshot(self) -> dict:
+        """
+        Return all metrics as plain data.
+
+        Every `<prefix>.hits` / `<prefix>.misses` counter pair also gets a
+        derived `<prefix>.hit_rate` entry.
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+            timers = {
+                name: {
+                    "count": count,
+                    "total_ms": round(total * 1000, 3),
+                    "avg_ms": round(total * 1000 / count, 3) if count else 0,
+                    "max_ms": round(peak * 1000, 3),
+                }
+                for name, (count, total, peak) in self._timers.items()
+            }
+
+        ratios = {}
+        for name, hits in counters.items():
+            if name.endswith(".hits"):
+                prefix = name[: -len(".hits")]
+                lookups = hits + counters.get(f"{prefix}.misses", 0)
+                ratios[f"{prefix}.hit_rate"] = round(hits / lookups, 4) if lookups else 0
+
+        return {"counters": counters, "gauges": gauges, "timers": timers, "ratios": ratios}
+
+    def reset(self) -> None:
+        """Clear all metrics."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._timers.clear()
+
+
+metrics = Metrics()
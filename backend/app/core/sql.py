@@ -0,0 +1,48 @@
+"""
+Dialect-aware SQL helpers
+Small constructs that differ between SQLite (tests, local dev) and
+PostgreSQL (production).
+"""
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.expression import FunctionElement
+from sqlalchemy.types import DateTime
+
+
+def upsert(db: Session, table):
+    """
+    Return an INSERT for `table` that supports `on_conflict_do_update`
+    on the session's database.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"Upsert is not supported on {dialect}")
+
+
+class add_days(FunctionElement):
+    """`timestamp + days` where `days` may be a SQL expression."""
+    type = DateTime(timezone=True)
+    name = "add_days"
+    inherit_cache = True
+
+
+@compiles(add_days)
+def _add_days_default(element, compiler, **kw):
+    timestamp, days = list(element.clauses)
+    return "(%s + (%s) * INTERVAL '1 day')" % (
+        compiler.process(timestamp, **kw),
+        compiler.process(days, **kw),
+    )
+
+
+@compiles(add_days, "sqlite")
+def _add_days_sqlite(element, compiler, **kw):
+    timestamp, days = list(element.clauses)
+    return "datetime(%s, '+' || (%s) || ' days')" % (
+        compiler.process(timestamp, **kw),
+        compiler.process(days, **kw),
+    )
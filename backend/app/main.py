@@ -2,7 +2,7 @@
 FastAPI Application - Main Entry Point
 """
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request, status
+from fastapi import Depends, FastAPI, Request, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -12,14 +12,17 @@ from slowapi.util import get_remote_address
 
 from app.config import settings
 from app.core.database import engine, Base
+from app.core.metrics import metrics
 from app.core.exceptions import (
     NotFoundException,
     UnauthorizedException,
     ForbiddenException,
     BadRequestException,
     ConflictException,
+    ServiceUnavailableException,
 )
 from app.api.v1 import auth, lessons, sentences, audio, practice, users
+from app.dependencies import get_current_admin
 
 
 # Lifespan context manager
@@ -35,8 +38,36 @@ async def lifespan(app: FastAPI):
     from app.core.database import SessionLocal
     seed_database(SessionLocal)
     
+    from app.services.practice_buffer import practice_buffer
+    if settings.practice_write_behind:
+        practice_buffer.start()
+    
+    from app.services.tts_queue import tts_queue
+    if settings.tts_pregenerate:
+        tts_queue.start()
+    
+    from app.services.audio_eviction import audio_access, audio_evictor
+    audio_access.start()
+    if settings.max_audio_size_mb > 0:
+        audio_evictor.start()
+    
+    from app.services.audio_index import audio_index
+    db = SessionLocal()
+    try:
+        print(f"✅ Audio index warmed: {audio_index.warm(db)} clips")
+    except Exception as e:
+        print(f"⚠️ Audio index warm-up failed: {e}")
+    finally:
+        db.close()
+    
     yield
     # Shutdown: Cleanup
+    practice_buffer.stop()
+    tts_queue.stop()
+    audio_evictor.stop()
+    audio_access.stop()
+    from app.services.audio_synthesizer import audio_synthesizer
+    audio_synthesizer.shutdown()
     print("👋 Shutting down...")
 
 
@@ -112,6 +143,16 @@ async def conflict_exception_handler(request: Request, exc: ConflictException):
     )
 
 
+@app.exception_handler(ServiceUnavailableException)
+async def service_unavailable_exception_handler(request: Request, exc: ServiceUnavailableException):
+    """Handle 503 Service Unavailable"""
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"error": "Service Unavailable", "message": exc.detail},
+        headers=exc.headers,
+    )
+
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Handle 422 Validation Errors"""
@@ -145,6 +186,12 @@ async def health_check():
     return {"status": "ok", "message": "API is running"}
 
 
+@app.get("/metrics", tags=["Health"], dependencies=[Depends(get_current_admin)])
+async def get_metrics():
+    """In-process counters, gauges and timers for this worker (admin only)"""
+    return metrics.snapshot()
+
+
 # Include routers
 app.include_router(auth.router, prefix="/api/v1", tags=["Authentication"])
 app.include_router(lessons.router, prefix="/api/v1", tags=["Lessons"])
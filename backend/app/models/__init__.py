@@ -2,7 +2,8 @@ from app.core.database import Base
 from app.models.user import User
 from app.models.lesson import Lesson
 from app.models.sentence import Sentence
-from app.models.audio_file import AudioFile
-from app.models.progress import UserProgress
+from app.models.audio_file import AudioBlob, AudioFile
+from app.models.progress import UserProgress, UserLessonProgress
+from app.models.tts_job import TTSJob
 
-__all__ = ["Base", "User", "Lesson", "Sentence", "AudioFile", "UserProgress"]
+__all__ = ["Base", "User", "Lesson", "Sentence", "AudioBlob", "AudioFile", "UserProgress", "UserLessonProgress", "TTSJob"]
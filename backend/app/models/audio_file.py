@@ -4,18 +4,36 @@ from sqlalchemy.sql import func
 from app.core.database import Base
 
 
+class AudioBlob(Base):
+    """One synthesized file, named by its content key (see TTSService.audio_key)."""
+    __tablename__ = "audio_blobs"
+    
+    key = Column(String(64), primary_key=True)
+    language = Column(String(2), nullable=False)
+    file_size = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    
+    # Relationships
+    audio_files = relationship("AudioFile", back_populates="blob")
+
+
 class AudioFile(Base):
     __tablename__ = "audio_files"
     
     id = Column(Integer, primary_key=True, index=True)
     sentence_id = Column(Integer, ForeignKey("sentences.id", ondelete="CASCADE"), nullable=False, index=True)
     language = Column(String(2), nullable=False)  # 'vi' or 'en'
-    file_path = Column(String(512), unique=True, nullable=False)
+    audio_key = Column(String(64), ForeignKey("audio_blobs.key", ondelete="CASCADE"), nullable=False, index=True)
+    file_path = Column(String(512), nullable=False)  # Shared by every sentence with the same key
     file_size = Column(Integer, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    # Access tracking for LRU eviction, written in batches (see audio_eviction)
+    hit_count = Column(Integer, nullable=False, default=0, server_default="0")
+    last_served_at = Column(DateTime(timezone=True), nullable=True)
     
     # Relationships
     sentence = relationship("Sentence", back_populates="audio_files")
+    blob = relationship("AudioBlob", back_populates="audio_files")
     
     __table_args__ = (
         UniqueConstraint('sentence_id', 'language', name='uix_sentence_language'),
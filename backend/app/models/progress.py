@@ -1,7 +1,21 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, UniqueConstraint
+from datetime import datetime, timedelta
+from sqlalchemy import Column, Integer, Float, ForeignKey, DateTime, UniqueConstraint, Index, select
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from app.core.database import Base
+from app.models.sentence import Sentence
+
+
+def default_due_at(context):
+    """First review is due one day after the first practice."""
+    last_practiced_at = context.get_current_parameters().get("last_practiced_at")
+    return (last_practiced_at or datetime.utcnow()) + timedelta(days=1)
+
+
+def default_lesson_id(context):
+    """Rows added without a lesson take their sentence's."""
+    sentence_id = context.get_current_parameters().get("sentence_id")
+    return context.connection.scalar(select(Sentence.lesson_id).where(Sentence.id == sentence_id))
 
 
 class UserProgress(Base):
@@ -10,11 +24,37 @@ class UserProgress(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     sentence_id = Column(Integer, ForeignKey("sentences.id", ondelete="CASCADE"), nullable=False, index=True)
+    # Copy of the sentence's lesson, so per-lesson selection never joins
+    # `sentences`; moved with the sentence by lesson_progress.move()
+    lesson_id = Column(Integer, ForeignKey("lessons.id", ondelete="CASCADE"), default=default_lesson_id, nullable=False)
     practiced_count = Column(Integer, default=1, nullable=False)
     last_practiced_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+    
+    # SM-2 schedule (see app/services/srs.py)
+    due_at = Column(DateTime(timezone=True), default=default_due_at, nullable=False)
+    interval_days = Column(Integer, default=1, server_default="1", nullable=False)
+    ease_factor = Column(Float, default=2.5, server_default="2.5", nullable=False)
+    repetitions = Column(Integer, default=1, server_default="1", nullable=False)
+    
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
     
     __table_args__ = (
         UniqueConstraint('user_id', 'sentence_id', name='uix_user_sentence'),
+        Index('ix_user_progress_user_lesson_due', 'user_id', 'lesson_id', 'due_at'),
     )
+
+
+class UserLessonProgress(Base):
+    """
+    Per-user, per-lesson rollup of user_progress, kept current by
+    app/services/lesson_progress.py so progress reads are a key lookup.
+    """
+    __tablename__ = "user_lesson_progress"
+    
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    lesson_id = Column(Integer, ForeignKey("lessons.id", ondelete="CASCADE"), primary_key=True)
+    practiced_count = Column(Integer, default=0, server_default="0", nullable=False)  # distinct sentences
+    total_practice_count = Column(Integer, default=0, server_default="0", nullable=False)
+    last_practiced_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
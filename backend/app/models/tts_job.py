@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, UniqueConstraint, Index
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class TTSJob(Base):
+    """Pending audio pre-generation for one sentence and language (see app/services/tts_queue.py)."""
+    __tablename__ = "tts_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    sentence_id = Column(Integer, ForeignKey("sentences.id", ondelete="CASCADE"), nullable=False)
+    language = Column(String(2), nullable=False)  # 'vi' or 'en'
+    status = Column(String(16), default="pending", server_default="pending", nullable=False)  # pending, running, done, failed
+    attempts = Column(Integer, default=0, server_default="0", nullable=False)
+    error = Column(Text, nullable=True)
+    not_before = Column(DateTime(timezone=True), nullable=True)  # retry backoff after a failure
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+    
+    __table_args__ = (
+        UniqueConstraint('sentence_id', 'language', name='uix_tts_job_sentence_language'),
+        Index('ix_tts_jobs_status_id', 'status', 'id'),
+    )
@@ -9,7 +9,8 @@ from app.schemas.user import UserCreate, UserUpdate, UserInDB, UserPublic
 from app.schemas.auth import LoginRequest, RegisterRequest, TokenResponse, TokenRefreshRequest, TokenData
 from app.schemas.lesson import LessonCreate, LessonUpdate, LessonInDB
 from app.schemas.sentence import SentenceCreate, SentenceUpdate, SentenceInDB, SentenceWithAudio, BulkSentenceCreate
-from app.schemas.practice import PracticeRecordRequest, PracticeProgressItem, PracticeStats, NextSentenceResponse
+from app.schemas.audio import AudioJobStatus, AudioWarmResponse, AudioSpriteSegment, AudioSpriteManifest
+from app.schemas.practice import PracticeRecordRequest, PracticeRecordItem, PracticeRecordBatchRequest, PracticeProgressItem, PracticeStats, NextSentenceResponse, PracticeBatchResponse
 
 __all__ = [
     "PaginationParams",
@@ -34,8 +35,15 @@ __all__ = [
     "SentenceInDB",
     "SentenceWithAudio",
     "BulkSentenceCreate",
+    "AudioJobStatus",
+    "AudioWarmResponse",
+    "AudioSpriteSegment",
+    "AudioSpriteManifest",
     "PracticeRecordRequest",
+    "PracticeRecordItem",
+    "PracticeRecordBatchRequest",
     "PracticeProgressItem",
     "PracticeStats",
     "NextSentenceResponse",
+    "PracticeBatchResponse",
 ]
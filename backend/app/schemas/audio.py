@@ -0,0 +1,34 @@
+from pydantic import BaseModel
+
+
+class AudioJobStatus(BaseModel):
+    pending: int
+    running: int
+    done: int
+    failed: int
+    total: int
+
+
+class AudioWarmResponse(BaseModel):
+    lesson_id: int | None = None  # None: all active lessons
+    enqueued: int
+    jobs: AudioJobStatus
+
+
+class AudioSpriteSegment(BaseModel):
+    sentence_id: int
+    key: str  # Audio content key, as in the sentence's audio URL
+    offset: int  # Byte offset in the sprite
+    length: int  # Bytes
+    start: float  # Seconds from the start of the sprite
+    duration: float  # Seconds
+
+
+class AudioSpriteManifest(BaseModel):
+    lesson_id: int
+    language: str
+    version: str
+    url: str  # Versioned sprite URL
+    size: int  # Bytes
+    duration: float  # Seconds
+    segments: list[AudioSpriteSegment]  # In lesson order
@@ -1,10 +1,23 @@
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from app.schemas.sentence import SentenceWithAudio
+from app.services.srs import DEFAULT_GRADE, MIN_GRADE, MAX_GRADE
 
 
 class PracticeRecordRequest(BaseModel):
     sentence_id: int
+    grade: int = Field(DEFAULT_GRADE, ge=MIN_GRADE, le=MAX_GRADE)  # SM-2 recall grade
+
+
+class PracticeRecordItem(BaseModel):
+    sentence_id: int
+    practiced_at: datetime | None = None  # Defaults to the time of the request
+    count: int = Field(1, ge=1, le=1000)
+    grade: int = Field(DEFAULT_GRADE, ge=MIN_GRADE, le=MAX_GRADE)
+
+
+class PracticeRecordBatchRequest(BaseModel):
+    records: list[PracticeRecordItem] = Field(..., min_length=1, max_length=1000)
 
 
 class PracticeProgressItem(BaseModel):
@@ -27,3 +40,10 @@ class PracticeStats(BaseModel):
 class NextSentenceResponse(BaseModel):
     sentence: SentenceWithAudio
     progress: dict | None = None  # {"practiced_count": 3, "total_in_lesson": 50, ...}
+    cursor: str | None = None  # "ordered"/"shuffled" modes: pass back to continue the walk
+
+
+class PracticeBatchResponse(BaseModel):
+    sentences: list[SentenceWithAudio]  # In practice order
+    progress: dict | None = None
+    cursor: str | None = None
@@ -1,5 +1,6 @@
 from datetime import datetime
 from pydantic import BaseModel
+from app.services.tts_service import audio_url
 
 
 class SentenceBase(BaseModel):
@@ -32,6 +33,21 @@ class SentenceInDB(SentenceBase):
 class SentenceWithAudio(SentenceInDB):
     vi_audio_url: str
     en_audio_url: str
+    
+    @classmethod
+    def from_sentence(cls, sentence) -> "SentenceWithAudio":
+        """Build from a Sentence (or any object with the same attributes)."""
+        return cls(
+            id=sentence.id,
+            lesson_id=sentence.lesson_id,
+            vi_text=sentence.vi_text,
+            en_text=sentence.en_text,
+            order_index=sentence.order_index,
+            created_at=sentence.created_at,
+            updated_at=sentence.updated_at,
+            vi_audio_url=audio_url(sentence.id, "vi", sentence.vi_text),
+            en_audio_url=audio_url(sentence.id, "en", sentence.en_text),
+        )
 
 
 class BulkSentenceCreate(BaseModel):
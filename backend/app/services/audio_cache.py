@@ -0,0 +1,155 @@
+"""
+Content-addressed audio cache bookkeeping.
+
+Audio files are named by `TTSService.audio_key` (a hash of the
+normalized text, language, engine and voice), so sentences with the same
+phrase share one file and an edited sentence simply resolves to a new
+key. `audio_blobs` has one row per file; `audio_files` maps each
+(sentence, language) to the blob it currently plays.
+
+Blobs no longer referenced by any sentence (after edits, deletes or a
+cache clear) are removed by `collect_garbage()`, run from
+scripts/audio_gc.py. It also sweeps files on disk that have no blob row
+(interrupted writes, the old `{sentence_id}_{language}` layout).
+"""
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.sql import upsert
+from app.models.audio_file import AudioBlob, AudioFile
+from app.services import audio_chunks
+from app.services.audio_index import audio_index
+from app.services.audio_sprite import SPRITE_DIR
+from app.services.tts_service import TTSService
+
+_SWEEP_BATCH = 500
+
+
+def record(db: Session, sentence_id: int, language: str, key: str, path: str) -> None:
+    """Point (sentence, language) at the blob `key`, registering the blob. The caller commits."""
+    file_size = os.path.getsize(path) if os.path.exists(path) else 0
+
+    blobs = AudioBlob.__table__
+    db.execute(upsert(db, blobs).values(key=key, language=language, file_size=file_size).on_conflict_do_nothing(
+        index_elements=[blobs.c.key],
+    ))
+
+    files = AudioFile.__table__
+    stmt = upsert(db, files).values(
+        sentence_id=sentence_id,
+        language=language,
+        audio_key=key,
+        file_path=path,
+        file_size=file_size,
+    )
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[files.c.sentence_id, files.c.language],
+        set_={
+            "audio_key": stmt.excluded.audio_key,
+            "file_path": stmt.excluded.file_path,
+            "file_size": stmt.excluded.file_size,
+        },
+    ))
+
+
+_NOT_REFERENCED = ~select(AudioFile.id).where(AudioFile.audio_key == AudioBlob.key).exists()
+
+
+def _unreferenced(keys: Optional[Iterable[str]] = None, older_than: Optional[datetime] = None):
+    stmt = select(AudioBlob.key, AudioBlob.file_size).where(_NOT_REFERENCED)
+    if keys is not None:
+        stmt = stmt.where(AudioBlob.key.in_(keys))
+    if older_than is not None:
+        stmt = stmt.where(AudioBlob.created_at <= older_than)
+    return stmt
+
+
+def _remove(db: Session, rows: list, tts: TTSService, dry_run: bool) -> tuple[int, int]:
+    sizes = dict(rows)
+    if dry_run or not sizes:
+        return len(sizes), sum(sizes.values())
+    keys = list(sizes)
+    removed = []
+    for start in range(0, len(keys), _SWEEP_BATCH):
+        batch = keys[start:start + _SWEEP_BATCH]
+        # Re-checked in the DELETE: a sentence may have picked the blob up since
+        db.execute(delete(AudioBlob).where(AudioBlob.key.in_(batch), _NOT_REFERENCED))
+        kept = set(db.scalars(select(AudioBlob.key).where(AudioBlob.key.in_(batch))))
+        removed.extend(key for key in batch if key not in kept)
+    db.commit()
+    audio_index.discard_keys(removed)
+    # Files go only after the rows: a crash in between leaves orphan files
+    # for the next sweep, never rows pointing at missing files
+    for key in removed:
+        tts.delete_blob(key)
+    return len(removed), sum(sizes[key] for key in removed)
+
+
+def release(db: Session, keys: Iterable[str], tts: Optional[TTSService] = None) -> int:
+    """Remove whichever of `keys` no sentence references any more. Commits. Returns the count."""
+    keys = list(set(keys))
+    if not keys:
+        return 0
+    rows = db.execute(_unreferenced(keys)).all()
+    return _remove(db, rows, tts or TTSService(), dry_run=False)[0]
+
+
+def collect_garbage(
+    db: Session,
+    grace_seconds: Optional[float] = None,
+    dry_run: bool = False,
+    tts: Optional[TTSService] = None,
+) -> dict[str, int]:
+    """
+    Delete unreferenced blobs and orphan files older than `grace_seconds`
+    (so audio being written right now is left alone), and clause audio
+    unused for `audio_chunk_max_age_days`. Returns counts of blobs,
+    orphan files, clause files and bytes freed.
+    """
+    tts = tts or TTSService()
+    grace_seconds = settings.audio_gc_grace_seconds if grace_seconds is None else grace_seconds
+    cutoff = datetime.utcnow() - timedelta(seconds=grace_seconds)
+
+    rows = db.execute(_unreferenced(older_than=cutoff)).all()
+    blobs, freed = _remove(db, rows, tts, dry_run)
+
+    orphans = 0
+    for batch in _sweep_candidates(tts.audio_dir, time.time() - grace_seconds):
+        stems = [os.path.basename(path).split(".")[0] for path in batch]
+        known = set(db.scalars(select(AudioBlob.key).where(AudioBlob.key.in_(set(stems)))))
+        for stem, path in zip(stems, batch):
+            if stem in known:
+                continue
+            orphans += 1
+            freed += os.path.getsize(path)
+            if not dry_run:
+                os.remove(path)
+
+    chunks, chunk_bytes = audio_chunks.collect_garbage(tts.audio_dir, dry_run=dry_run)
+    freed += chunk_bytes
+    return {"blobs": blobs, "orphan_files": orphans, "chunk_files": chunks, "bytes": freed}
+
+
+def _sweep_candidates(audio_dir: str, mtime_before: float):
+    """Files under `audio_dir` older than `mtime_before`, in batches."""
+    batch = []
+    for directory, subdirectories, filenames in os.walk(audio_dir):
+        if directory == audio_dir:
+            # Managed by audio_sprite and audio_chunks
+            subdirectories[:] = [name for name in subdirectories if name not in (SPRITE_DIR, audio_chunks.CHUNK_DIR)]
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            if os.path.getmtime(path) > mtime_before:
+                continue
+            batch.append(path)
+            if len(batch) == _SWEEP_BATCH:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
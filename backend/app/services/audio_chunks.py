@@ -0,0 +1,129 @@
+"""
+Clause-level audio for long sentences.
+
+A long sentence is synthesized clause by clause (split after , ; : . ! ?
+and merged up to `tts_chunk_min_chars`), each clause cached by its own
+content key, and the clauses' MPEG frames are joined without
+re-encoding. Editing one word then re-synthesizes only its clause, and
+a clause that recurs across sentences ("Anh ơi,") is synthesized once.
+A clause whose text is a whole cached sentence reuses that sentence's
+audio.
+
+Clause files live under `audio_dir/chunks`, outside the blob cache: the
+audio GC leaves them alone and removes those unused for
+`audio_chunk_max_age_days` instead (a clause's mtime is refreshed each
+time it is reused). Joining needs MP3, so other engines synthesize
+whole sentences.
+"""
+import os
+import re
+import time
+import uuid
+from typing import Callable, Optional
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.services import mp3
+from app.services.tts_engines import get_engine
+
+CHUNK_DIR = "chunks"  # under settings.audio_dir; skipped by the blob GC
+
+_CLAUSE_END = re.compile(r"(?<=[,;:.!?…])\s+")
+
+
+def split_clauses(text: str, min_chars: Optional[int] = None) -> list[str]:
+    """
+    `text` (normalized) cut after clause punctuation into pieces of at least
+    `min_chars` characters, short clauses merged into their neighbours.
+    """
+    min_chars = settings.tts_chunk_min_chars if min_chars is None else min_chars
+    if min_chars <= 0 or len(text) < 2 * min_chars:
+        return [text]
+
+    chunks: list[str] = []
+    for clause in _CLAUSE_END.split(text):
+        if chunks and len(chunks[-1]) < min_chars:
+            chunks[-1] += " " + clause
+        else:
+            chunks.append(clause)
+    if len(chunks) > 1 and len(chunks[-1]) < min_chars:
+        last = chunks.pop()
+        chunks[-1] += " " + last
+    return chunks
+
+
+def chunk_path(tts, key: str) -> str:
+    return os.path.join(tts.audio_dir, CHUNK_DIR, key[:2], f"{key}.{tts.extension}")
+
+
+def _clause_audio(tts, text: str, language: str) -> str:
+    """Path of the audio for one clause, synthesizing it if no sentence or clause has it yet."""
+    key = tts.audio_key(text, language)
+    sentence_path = tts.get_audio_path(key)
+    if os.path.exists(sentence_path):
+        metrics.incr("tts.chunks.hits")
+        return sentence_path
+
+    path = chunk_path(tts, key)
+    if tts.fetch(path):
+        metrics.incr("tts.chunks.hits")
+        os.utime(path)  # still in use: keep it from the age-based GC
+        return path
+
+    metrics.incr("tts.chunks.misses")
+    directory, name = os.path.split(path)
+    tmp_path = os.path.join(directory, f".tmp-{uuid.uuid4().hex}-{name}")
+    try:
+        get_engine(tts.engine).synthesize(text, language, tts.voice, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    tts.upload(path, tts.media_type)
+    return path
+
+
+def synthesize(tts, text: str, language: str, file_path: str, on_chunk: Callable[[bytes], None] = None) -> bool:
+    """
+    Write the audio for `text` (normalized) to `file_path` clause by clause,
+    handing each clause's frames to `on_chunk`. False, having written
+    nothing, if `text` is a single clause or the engine's audio can't be
+    joined: synthesize it whole.
+    """
+    if tts.extension != "mp3":
+        return False
+    clauses = split_clauses(text)
+    if len(clauses) == 1:
+        return False
+
+    sample_rate = None
+    with open(file_path, "wb") as f:
+        for clause in clauses:
+            with open(_clause_audio(tts, clause, language), "rb") as clause_file:
+                frames = mp3.extract_frames(clause_file.read())
+            if sample_rate is not None and frames.sample_rate != sample_rate:
+                raise ValueError("Clauses were synthesized at different sample rates")
+            sample_rate = frames.sample_rate
+            f.write(frames.data)
+            if on_chunk is not None:
+                on_chunk(frames.data)
+    return True
+
+
+def collect_garbage(audio_dir: str, max_age_seconds: Optional[float] = None, dry_run: bool = False) -> tuple[int, int]:
+    """Delete clause files unused for `max_age_seconds`. Returns the count and bytes freed."""
+    if max_age_seconds is None:
+        max_age_seconds = settings.audio_chunk_max_age_days * 86400
+    cutoff = time.time() - max_age_seconds
+    removed = freed = 0
+    for directory, _, filenames in os.walk(os.path.join(audio_dir, CHUNK_DIR)):
+        for filename in filenames:
+            path = os.path.join(directory, filename)
+            stat = os.stat(path)
+            if stat.st_mtime > cutoff:
+                continue
+            removed += 1
+            freed += stat.st_size
+            if not dry_run:
+                os.remove(path)
+    return removed, freed
@@ -0,0 +1,311 @@
+"""
+Size-bounded audio cache: access tracking and LRU eviction.
+
+/audio reports every clip it serves to `audio_access`, which merges
+repeats in memory and writes them to `audio_files.hit_count` /
+`last_served_at` every `audio_access_flush_seconds`, in one batch.
+
+`audio_evictor` then keeps the clips on disk within `max_audio_size_mb`:
+every `audio_evict_interval_seconds` it deletes the least recently
+served blobs (never served: oldest first) until the total fits. Clips
+served within `audio_evict_min_idle_seconds` are never evicted, so a
+response in progress is not cut short. An evicted clip is synthesized
+again on its next request. The budget counts synthesized clips; their
+transcoded variants are a fraction of that and go with them.
+
+With shared audio storage that budget is the cluster's, and each node's
+`audio_dir` only holds copies: `evict_local` keeps those within
+`audio_local_max_mb`, dropping this node's least recently served copies
+(and copies of clips another node evicted) while the shared ones stay.
+A dropped copy is downloaded again on its next request.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.models.audio_file import AudioBlob, AudioFile
+from app.services import audio_chunks
+from app.services.audio_index import audio_index
+from app.services.audio_sprite import SPRITE_DIR
+from app.services.tts_service import TTSService
+
+_BATCH = 500
+
+
+class AudioAccessLog:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        flush_interval: Optional[float] = None,
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval or settings.audio_access_flush_seconds
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: dict[tuple[int, str], list] = {}  # (sentence_id, language) -> [hits, last served]
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, sentence_id: int, language: str, served_at: datetime = None) -> None:
+        """Count one serving of a sentence's clip. Bounded by the number of clips, not requests."""
+        served_at = served_at or datetime.utcnow()
+        with self._lock:
+            entry = self._pending.setdefault((sentence_id, language), [0, served_at])
+            entry[0] += 1
+            entry[1] = max(entry[1], served_at)
+
+    def flush(self) -> int:
+        """Write the counts gathered so far. Returns the number of clips updated."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+
+            files = AudioFile.__table__
+            stmt = (
+                update(files)
+                .where(files.c.sentence_id == bindparam("b_sentence_id"), files.c.language == bindparam("b_language"))
+                .values(hit_count=files.c.hit_count + bindparam("b_hits"), last_served_at=bindparam("b_served_at"))
+            )
+            rows = [
+                {"b_sentence_id": sentence_id, "b_language": language, "b_hits": hits, "b_served_at": served_at}
+                for (sentence_id, language), (hits, served_at) in pending.items()
+            ]
+            db = self.session_factory()
+            try:
+                with metrics.timer("audio_access.flush"):
+                    db.execute(stmt, rows)
+                    db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+            return len(rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._pending.clear()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ Audio access flush error: {e}")
+
+    def start(self):
+        """Start the background flusher thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audio-access", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flusher and write whatever is still pending."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+def cache_size(db: Session) -> int:
+    return db.scalar(select(func.coalesce(func.sum(AudioBlob.file_size), 0)))
+
+
+def evict(
+    db: Session,
+    max_bytes: Optional[int] = None,
+    min_idle_seconds: Optional[float] = None,
+    tts: Optional[TTSService] = None,
+) -> dict[str, int]:
+    """
+    Delete least recently served blobs until the cache fits in `max_bytes`
+    (0: unbounded). Commits. Returns counts of blobs and bytes freed.
+    """
+    max_bytes = settings.max_audio_size_mb * 1024 * 1024 if max_bytes is None else max_bytes
+    min_idle_seconds = settings.audio_evict_min_idle_seconds if min_idle_seconds is None else min_idle_seconds
+    total = cache_size(db)
+    metrics.set_gauge("tts.cache.bytes", total)
+    if max_bytes <= 0 or total <= max_bytes:
+        return {"blobs": 0, "bytes": 0}
+
+    last_used = func.coalesce(func.max(AudioFile.last_served_at), AudioBlob.created_at)
+    cutoff = datetime.utcnow() - timedelta(seconds=min_idle_seconds)
+    result = db.execute(
+        select(AudioBlob.key, AudioBlob.file_size)
+        .outerjoin(AudioFile, AudioFile.audio_key == AudioBlob.key)
+        .group_by(AudioBlob.key, AudioBlob.file_size, AudioBlob.created_at)
+        .having(last_used <= cutoff)
+        .order_by(last_used, AudioBlob.key)
+    )
+    victims = []
+    freed = 0
+    for key, file_size in result:
+        if total - freed <= max_bytes:
+            break
+        victims.append(key)
+        freed += file_size
+    result.close()
+
+    for start in range(0, len(victims), _BATCH):
+        batch = victims[start:start + _BATCH]
+        db.execute(delete(AudioFile).where(AudioFile.audio_key.in_(batch)))
+        db.execute(delete(AudioBlob).where(AudioBlob.key.in_(batch)))
+    db.commit()
+    audio_index.discard_keys(victims)
+    # As in audio_cache: rows first, so a crash leaves orphan files, not dangling rows
+    tts = tts or TTSService()
+    for key in victims:
+        tts.delete_blob(key)
+
+    metrics.incr("tts.cache.evictions", len(victims))
+    metrics.incr("tts.cache.evicted_bytes", freed)
+    metrics.set_gauge("tts.cache.bytes", total - freed)
+    return {"blobs": len(victims), "bytes": freed}
+
+
+def _local_copies(audio_dir: str) -> dict[str, list]:
+    """Content key -> [bytes, newest mtime] of the files under `audio_dir` (a blob and its variants)."""
+    copies = {}
+    for directory, subdirectories, filenames in os.walk(audio_dir):
+        if directory == audio_dir:
+            # Managed by audio_sprite and audio_chunks
+            subdirectories[:] = [name for name in subdirectories if name not in (SPRITE_DIR, audio_chunks.CHUNK_DIR)]
+        for filename in filenames:
+            if filename.startswith("."):
+                continue  # being written
+            try:
+                stat = os.stat(os.path.join(directory, filename))
+            except FileNotFoundError:
+                continue
+            entry = copies.setdefault(filename.split(".")[0], [0, 0.0])
+            entry[0] += stat.st_size
+            entry[1] = max(entry[1], stat.st_mtime)
+    return copies
+
+
+def evict_local(
+    db: Session,
+    max_bytes: Optional[int] = None,
+    min_idle_seconds: Optional[float] = None,
+    tts: Optional[TTSService] = None,
+) -> dict[str, int]:
+    """
+    With shared storage, delete this node's copies of the least recently
+    served blobs (first those no longer in the cache at all) until its
+    `audio_dir` fits in `max_bytes` (0: unbounded). Rows and shared copies
+    are kept. Returns counts of blobs and bytes freed.
+    """
+    tts = tts or TTSService()
+    max_bytes = settings.audio_local_max_mb * 1024 * 1024 if max_bytes is None else max_bytes
+    min_idle_seconds = settings.audio_evict_min_idle_seconds if min_idle_seconds is None else min_idle_seconds
+    if not tts.storage.shared or max_bytes <= 0:
+        return {"blobs": 0, "bytes": 0}
+
+    copies = _local_copies(tts.audio_dir)
+    total = sum(size for size, _ in copies.values())
+    metrics.set_gauge("tts.cache.local_bytes", total)
+    if total <= max_bytes:
+        return {"blobs": 0, "bytes": 0}
+
+    cutoff = datetime.utcnow() - timedelta(seconds=min_idle_seconds)
+    written_before = time.time() - min_idle_seconds
+    keys = [key for key, (_, mtime) in copies.items() if mtime <= written_before]
+    last_used = func.coalesce(func.max(AudioFile.last_served_at), AudioBlob.created_at)
+    known = set()
+    idle = []
+    for start in range(0, len(keys), _BATCH):
+        batch = keys[start:start + _BATCH]
+        known.update(db.scalars(select(AudioBlob.key).where(AudioBlob.key.in_(batch))))
+        idle.extend(db.execute(
+            select(last_used, AudioBlob.key)
+            .outerjoin(AudioFile, AudioFile.audio_key == AudioBlob.key)
+            .where(AudioBlob.key.in_(batch))
+            .group_by(AudioBlob.key, AudioBlob.created_at)
+            .having(last_used <= cutoff)
+        ).all())
+    # Copies of blobs gone from the cache (evicted or collected by another node) go first
+    candidates = [key for key in keys if key not in known] + [key for _, key in sorted(idle)]
+
+    victims = []
+    freed = 0
+    for key in candidates:
+        if total - freed <= max_bytes:
+            break
+        victims.append(key)
+        freed += copies[key][0]
+    audio_index.discard_keys(victims)
+    for key in victims:
+        tts.delete_local(key)
+
+    metrics.incr("tts.cache.local_evictions", len(victims))
+    metrics.incr("tts.cache.local_evicted_bytes", freed)
+    metrics.set_gauge("tts.cache.local_bytes", total - freed)
+    return {"blobs": len(victims), "bytes": freed}
+
+
+class AudioEvictor:
+    """Background thread applying `evict` and `evict_local` on an interval, after flushing access counts."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        access_log: Optional[AudioAccessLog] = None,
+        interval: Optional[float] = None,
+    ):
+        self.session_factory = session_factory
+        self.access_log = access_log or audio_access
+        self.interval = interval or settings.audio_evict_interval_seconds
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> dict[str, int]:
+        self.access_log.flush()  # rank by up-to-date access times
+        db = self.session_factory()
+        try:
+            start = time.perf_counter()
+            result = evict(db)
+            local = evict_local(db)
+            metrics.observe("tts.cache.evict", time.perf_counter() - start)
+            return {**result, "local_blobs": local["blobs"], "local_bytes": local["bytes"]}
+        finally:
+            db.close()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"❌ Audio eviction error: {e}")
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="audio-evictor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+
+
+audio_access = AudioAccessLog()
+audio_evictor = AudioEvictor()
@@ -0,0 +1,131 @@
+"""
+In-process audio lookup index.
+
+Maps (sentence_id, language) to the sentence's current audio: content
+key, file path and the file's stat. A hit on /audio is then served
+without querying `audio_files` or stat-ing the file: a versioned URL
+from the index alone, an unversioned one after reading the sentence's
+text to check the entry against it.
+
+The index is warmed at startup from `audio_files` (keeping only rows
+whose key still matches the sentence's text under the current engine and
+voice), filled as /audio records new audio, and told about edits,
+deletes and removed blobs by the code that makes them. A TTL bounds
+staleness when another worker process made the change; it is kept below
+`audio_evict_min_idle_seconds`, so a clip served from the index is never
+one another process may have evicted.
+"""
+import os
+import threading
+import time
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.models.audio_file import AudioFile
+from app.models.sentence import Sentence
+from app.services.tts_service import TTSService
+
+
+class AudioIndexEntry(NamedTuple):
+    key: str
+    path: str
+    stat: os.stat_result
+    indexed_at: float
+
+    @property
+    def size(self) -> int:
+        return self.stat.st_size
+
+
+class AudioIndex:
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        self.ttl_seconds = settings.audio_index_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._lock = threading.Lock()
+        self._entries: dict[tuple[int, str], AudioIndexEntry] = {}
+        self._by_key: dict[str, set[tuple[int, str]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, sentence_id: int, language: str) -> Optional[AudioIndexEntry]:
+        """The sentence's current audio, if indexed and fresh."""
+        if self.ttl_seconds <= 0:
+            return None
+        entry = self._entries.get((sentence_id, language))
+        if entry is not None and time.monotonic() - entry.indexed_at < self.ttl_seconds:
+            metrics.incr("audio_index.hits")
+            return entry
+        metrics.incr("audio_index.misses")
+        return None
+
+    def put(self, sentence_id: int, language: str, key: str, path: str) -> bool:
+        """Index the audio now recorded for (sentence, language). False if its file is missing."""
+        if self.ttl_seconds <= 0:
+            return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        ref = (sentence_id, language)
+        with self._lock:
+            self._unlink(ref)
+            self._entries[ref] = AudioIndexEntry(key, path, stat, time.monotonic())
+            self._by_key.setdefault(key, set()).add(ref)
+            metrics.set_gauge("audio_index.size", len(self._entries))
+        return True
+
+    def _unlink(self, ref: tuple[int, str]) -> None:
+        entry = self._entries.pop(ref, None)
+        if entry is not None:
+            refs = self._by_key.get(entry.key)
+            if refs is not None:
+                refs.discard(ref)
+                if not refs:
+                    del self._by_key[entry.key]
+
+    def discard(self, sentence_id: int, *languages: str) -> None:
+        """Forget a sentence's audio (in `languages`, or all of it)."""
+        with self._lock:
+            for language in languages or ("vi", "en"):
+                self._unlink((sentence_id, language))
+            metrics.set_gauge("audio_index.size", len(self._entries))
+
+    def discard_keys(self, keys) -> None:
+        """Forget every sentence playing one of the blobs `keys` (they are being deleted)."""
+        with self._lock:
+            for key in keys:
+                for ref in list(self._by_key.get(key, ())):
+                    self._unlink(ref)
+            metrics.set_gauge("audio_index.size", len(self._entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_key.clear()
+            metrics.set_gauge("audio_index.size", 0)
+
+    def warm(self, db: Session, tts: Optional[TTSService] = None) -> int:
+        """Index every recorded clip that is still current. Returns the number indexed."""
+        if self.ttl_seconds <= 0:
+            return 0
+        tts = tts or TTSService()
+        rows = db.execute(
+            select(AudioFile.sentence_id, AudioFile.language, AudioFile.audio_key, Sentence.vi_text, Sentence.en_text)
+            .join(Sentence, Sentence.id == AudioFile.sentence_id)
+            .execution_options(yield_per=1000)
+        )
+        indexed = 0
+        with metrics.timer("audio_index.warm"):
+            for sentence_id, language, key, vi_text, en_text in rows:
+                text = vi_text if language == "vi" else en_text
+                if tts.audio_key(text, language) != key:
+                    continue  # recorded under another text, engine or voice
+                indexed += self.put(sentence_id, language, key, tts.get_audio_path(key))
+        return indexed
+
+
+audio_index = AudioIndex()
@@ -0,0 +1,175 @@
+"""
+Per-lesson audio sprites.
+
+One MP3 per (lesson, language): the MPEG frames of every sentence's
+audio, in lesson order, joined without re-encoding. A JSON manifest
+gives each sentence's byte and time offsets, so a client fetches one
+file per lesson and plays segments locally.
+
+A sprite is named by its version, a hash of its ordered segment keys,
+so it changes exactly when a sentence is added, removed, reordered or
+re-worded. Rebuilds are incremental: segments whose audio is unchanged
+are copied from the previous sprite, and only new audio is read and
+parsed from the blob cache.
+"""
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import defaultdict
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.models.sentence import Sentence
+from app.services import mp3
+from app.services.tts_service import TTSService
+
+SPRITE_DIR = "sprites"  # under settings.audio_dir; skipped by the audio GC
+
+
+class Segment(NamedTuple):
+    sentence_id: int
+    key: str
+    text: str
+
+
+def segments(db: Session, lesson_id: int, language: str) -> list[Segment]:
+    """The lesson's sentences in order, with the audio key of each."""
+    text_column = Sentence.vi_text if language == "vi" else Sentence.en_text
+    tts = TTSService()
+    rows = db.execute(
+        select(Sentence.id, text_column)
+        .where(Sentence.lesson_id == lesson_id)
+        .order_by(Sentence.order_index, Sentence.id)
+    )
+    return [Segment(sentence_id, tts.audio_key(text, language), text) for sentence_id, text in rows]
+
+
+def version(parts: list[Segment]) -> str:
+    return hashlib.sha256(",".join(part.key for part in parts).encode()).hexdigest()
+
+
+def sprite_dir() -> str:
+    return os.path.join(settings.audio_dir, SPRITE_DIR)
+
+
+def sprite_path(lesson_id: int, language: str, sprite_version: str) -> str:
+    return os.path.join(sprite_dir(), f"{lesson_id}_{language}_{sprite_version}.mp3")
+
+
+def _manifest_path(lesson_id: int, language: str) -> str:
+    return os.path.join(sprite_dir(), f"{lesson_id}_{language}.json")
+
+
+def load_manifest(lesson_id: int, language: str) -> Optional[dict]:
+    """The manifest of the last sprite built, if its file is still there."""
+    try:
+        with open(_manifest_path(lesson_id, language)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not os.path.exists(sprite_path(lesson_id, language, manifest["version"])):
+        return None
+    return manifest
+
+
+def missing_audio(lesson_id: int, language: str, parts: list[Segment]) -> list[Segment]:
+    """Segments a rebuild could neither copy from the current sprite nor read from the blob cache."""
+    previous = load_manifest(lesson_id, language)
+    reusable = {segment["key"] for segment in previous["segments"]} if previous else set()
+    tts = TTSService()
+    return [
+        part for part in parts
+        if part.key not in reusable and not os.path.exists(tts.get_audio_path(part.key))
+    ]
+
+
+_locks: defaultdict[tuple[int, str], threading.Lock] = defaultdict(threading.Lock)
+
+
+def build(lesson_id: int, language: str, parts: list[Segment]) -> dict:
+    """
+    Return the manifest of the sprite for `parts`, building it if the
+    current one is out of date. Every segment's audio must be in the
+    sprite already or in the blob cache (see `missing_audio`). Blocking.
+    """
+    sprite_version = version(parts)
+    with _locks[(lesson_id, language)]:
+        previous = load_manifest(lesson_id, language)
+        if previous and previous["version"] == sprite_version:
+            metrics.incr("audio_sprite.hits")
+            return previous
+
+        metrics.incr("audio_sprite.builds")
+        with metrics.timer("audio_sprite.build"):
+            manifest = _write(lesson_id, language, sprite_version, parts, previous)
+
+        if previous:
+            old_path = sprite_path(lesson_id, language, previous["version"])
+            if os.path.exists(old_path):
+                os.remove(old_path)
+        return manifest
+
+
+def _write(lesson_id: int, language: str, sprite_version: str, parts: list[Segment], previous: Optional[dict]) -> dict:
+    tts = TTSService()
+    reusable = {segment["key"]: segment for segment in previous["segments"]} if previous else {}
+    old_sprite = open(sprite_path(lesson_id, language, previous["version"]), "rb") if previous else None
+
+    os.makedirs(sprite_dir(), exist_ok=True)
+    final_path = sprite_path(lesson_id, language, sprite_version)
+    tmp_path = os.path.join(sprite_dir(), f".tmp-{uuid.uuid4().hex}.mp3")
+    entries = []
+    offset = 0
+    start = 0.0
+    try:
+        with open(tmp_path, "wb") as out:
+            for part in parts:
+                old = reusable.get(part.key)
+                if old is not None:
+                    old_sprite.seek(old["offset"])
+                    data = old_sprite.read(old["length"])
+                    duration = old["duration"]
+                    metrics.incr("audio_sprite.segments_reused")
+                else:
+                    with open(tts.get_audio_path(part.key), "rb") as f:
+                        frames = mp3.extract_frames(f.read())
+                    data, duration = frames.data, frames.duration
+                    metrics.incr("audio_sprite.segments_parsed")
+
+                out.write(data)
+                entries.append({
+                    "sentence_id": part.sentence_id,
+                    "key": part.key,
+                    "offset": offset,
+                    "length": len(data),
+                    "start": round(start, 6),
+                    "duration": round(duration, 6),
+                })
+                offset += len(data)
+                start += duration
+        os.replace(tmp_path, final_path)
+    finally:
+        if old_sprite is not None:
+            old_sprite.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    manifest = {
+        "lesson_id": lesson_id,
+        "language": language,
+        "version": sprite_version,
+        "size": offset,
+        "duration": round(start, 6),
+        "segments": entries,
+    }
+    manifest_tmp = f"{_manifest_path(lesson_id, language)}.{uuid.uuid4().hex}.tmp"
+    with open(manifest_tmp, "w") as f:
+        json.dump(manifest, f)
+    os.replace(manifest_tmp, _manifest_path(lesson_id, language))
+    return manifest
@@ -0,0 +1,165 @@
+"""
+Where synthesized audio is kept, so several backend nodes can share it.
+
+`settings.audio_dir` is always the node's working copy: audio is
+synthesized, transcoded and served from there. A storage backend is the
+shared store behind it. TTSService uploads every new clip to it and, on
+a local miss, downloads from it before synthesizing, so a phrase is
+synthesized once for the whole cluster.
+
+- `local` (default): a directory. Without AUDIO_STORAGE_DIR it is
+  `audio_dir` itself and nothing is copied (a single node); point it
+  at a shared mount to share between nodes.
+- `s3`: an S3-compatible bucket (AWS, MinIO...), needs the `boto3`
+  package. With AUDIO_REDIRECT on, /audio redirects clients to a
+  presigned URL instead of proxying the bytes, once the object is known
+  to be there (an upload that failed leaves the local copy to serve).
+
+Objects are named like the files in `audio_dir` ("ab/abcd....mp3"):
+content-addressed, so they never change once written. With a shared
+store, each node's `audio_dir` is a cache of it, kept within
+AUDIO_LOCAL_MAX_MB by `audio_eviction.evict_local`.
+"""
+import glob
+import os
+import shutil
+import uuid
+from typing import Optional
+
+from app.config import settings
+from app.core.http_cache import IMMUTABLE
+
+
+def _copy_atomic(source: str, dest: str) -> None:
+    directory = os.path.dirname(dest)
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = os.path.join(directory, f".tmp-{uuid.uuid4().hex}-{os.path.basename(dest)}")
+    try:
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, dest)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class LocalAudioStorage:
+    """A directory; None means the node's own `audio_dir` (no copies)."""
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or None
+
+    @property
+    def shared(self) -> bool:
+        """Whether `audio_dir` is only a copy (see audio_eviction.evict_local)."""
+        return self.root is not None
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, *name.split("/"))
+
+    def fetch(self, name: str, dest: str) -> bool:
+        """Copy object `name` to the local file `dest`. False if there is no such object."""
+        if self.root is None:
+            return os.path.exists(dest)
+        source = self._path(name)
+        if not os.path.exists(source):
+            return False
+        shutil.copyfile(source, dest)
+        return True
+
+    def put(self, name: str, source: str, media_type: str) -> None:
+        """Store the local file `source` as object `name`."""
+        if self.root is not None:
+            _copy_atomic(source, self._path(name))
+
+    def exists(self, name: str) -> bool:
+        """Whether object `name` is stored."""
+        return self.root is not None and os.path.exists(self._path(name))
+
+    def delete_prefix(self, prefix: str) -> None:
+        """Delete every object whose name starts with `prefix`."""
+        if self.root is not None:
+            for path in glob.glob(glob.escape(self._path(prefix)) + "*"):
+                os.remove(path)
+
+    def presigned_url(self, name: str) -> Optional[str]:
+        """A URL clients can fetch object `name` from directly, if the backend has one."""
+        return None
+
+
+class S3AudioStorage:
+    """An S3-compatible bucket, objects under `prefix`."""
+
+    shared = True
+
+    def __init__(self, client, bucket: str, prefix: str = "", presign_seconds: Optional[int] = None):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.presign_seconds = presign_seconds or settings.audio_presign_seconds
+
+    @classmethod
+    def from_settings(cls) -> "S3AudioStorage":
+        try:
+            import boto3
+        except ImportError:
+            raise RuntimeError("AUDIO_STORAGE=s3 needs the 'boto3' package")
+        client = boto3.client(
+            "s3",
+            endpoint_url=settings.audio_s3_endpoint_url or None,
+            region_name=settings.audio_s3_region or None,
+        )
+        return cls(client, settings.audio_s3_bucket, settings.audio_s3_prefix)
+
+    def fetch(self, name: str, dest: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.download_file(self.bucket, self.prefix + name, dest)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey"):
+                return False
+            raise
+        return True
+
+    def put(self, name: str, source: str, media_type: str) -> None:
+        self.client.upload_file(source, self.bucket, self.prefix + name, ExtraArgs={
+            "ContentType": media_type,
+            "CacheControl": IMMUTABLE,
+        })
+
+    def exists(self, name: str) -> bool:
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + name)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+        return True
+
+    def delete_prefix(self, prefix: str) -> None:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self.prefix + prefix):
+            objects = [{"Key": item["Key"]} for item in page.get("Contents", [])]
+            if objects:
+                self.client.delete_objects(Bucket=self.bucket, Delete={"Objects": objects})
+
+    def presigned_url(self, name: str) -> Optional[str]:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={"Bucket": self.bucket, "Key": self.prefix + name},
+            ExpiresIn=self.presign_seconds,
+        )
+
+
+_storage = None
+
+
+def get_audio_storage():
+    """The process-wide storage backend picked by `audio_storage`."""
+    global _storage
+    if _storage is None:
+        if settings.audio_storage == "s3":
+            _storage = S3AudioStorage.from_settings()
+        else:
+            _storage = LocalAudioStorage(settings.audio_storage_dir)
+    return _storage
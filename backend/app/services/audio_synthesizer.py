@@ -0,0 +1,184 @@
+"""
+Off-loop audio synthesis.
+
+gTTS is a blocking network call, so /audio hands cache misses to a
+bounded thread pool instead of running them on the event loop.
+Concurrent requests for the same audio key (see `TTSService.audio_key`)
+share one in-flight job, even across sentences with the same phrase.
+
+When more than `tts_max_pending` jobs are queued or running, new misses
+are refused with 503 rather than queued without bound.
+
+Each job also publishes the audio as the engine produces it (see
+`AudioStream`), so /audio can start answering a miss with the first
+chunk while the rest is synthesized and saved to the cache.
+"""
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterator, Optional
+
+from app.config import settings
+from app.core.exceptions import ServiceUnavailableException
+from app.core.metrics import metrics
+from app.services.tts_service import TTSService
+
+
+_READ_SIZE = 64 * 1024
+
+
+class AudioStream:
+    """
+    The bytes of one in-flight synthesis, for any number of readers.
+
+    Chunks are kept in memory until the job ends, so a reader joining late
+    still gets the audio from its start. `ready` resolves at the first
+    chunk (or the end, or the error) of the job.
+    """
+
+    def __init__(self):
+        self.ready: Future = Future()
+        self.path: Optional[str] = None
+        self._cond = threading.Condition()
+        self._chunks: list[bytes] = []
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._started = time.perf_counter()
+
+    def append(self, chunk: bytes) -> None:
+        with self._cond:
+            if not self._chunks:
+                metrics.observe("tts.first_chunk", time.perf_counter() - self._started)
+            self._chunks.append(chunk)
+            self._cond.notify_all()
+        if not self.ready.done():
+            self.ready.set_result(None)
+
+    def finish(self, path: str) -> None:
+        with self._cond:
+            self.path = path
+            self._done = True
+            self._cond.notify_all()
+        if not self.ready.done():
+            self.ready.set_result(None)
+
+    def fail(self, error: BaseException) -> None:
+        with self._cond:
+            self._error = error
+            self._done = True
+            self._cond.notify_all()
+        if not self.ready.done():
+            self.ready.set_exception(error)
+
+    def __iter__(self) -> Iterator[bytes]:
+        """Every chunk, blocking until the next one is produced."""
+        sent = 0
+        while True:
+            with self._cond:
+                while sent == len(self._chunks) and not self._done:
+                    self._cond.wait()
+                chunks = self._chunks[sent:]
+                done, error = self._done, self._error
+            yield from chunks
+            sent += len(chunks)
+            if done and sent == len(self._chunks):
+                break
+        if error is not None:
+            raise error
+        if sent == 0:
+            # The engine does not stream (or the audio was fetched): read the result
+            with open(self.path, "rb") as f:
+                while chunk := f.read(_READ_SIZE):
+                    yield chunk
+
+
+class AudioSynthesizer:
+    def __init__(self, max_workers: Optional[int] = None, max_pending: Optional[int] = None):
+        self.max_workers = max_workers or settings.tts_max_workers
+        self.max_pending = max_pending or settings.tts_max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._inflight: dict[str, Future] = {}
+        self._streams: dict[str, AudioStream] = {}
+
+    def _pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="tts")
+        return self._executor
+
+    def submit(self, key: str, language: str, text: str) -> Future:
+        """Start (or join) the synthesis of the audio for `key`."""
+        return self._submit(key, language, text, streaming=False)[0]
+
+    def stream(self, key: str, language: str, text: str) -> AudioStream:
+        """
+        Start (or join) the synthesis of the audio for `key`, to read it as
+        it is produced. Joining a job started by `submit`, the audio comes
+        when it is complete.
+        """
+        metrics.incr("tts.cache.misses")
+        return self._submit(key, language, text, streaming=True)[1]
+
+    def _submit(self, key: str, language: str, text: str, streaming: bool) -> tuple[Future, AudioStream]:
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                metrics.incr("tts.deduplicated")
+                return future, self._streams[key]
+            if len(self._inflight) >= self.max_pending:
+                metrics.incr("tts.rejected")
+                raise ServiceUnavailableException("Audio generation is busy, please retry")
+
+            submitted = time.perf_counter()
+            stream = AudioStream()
+            future = self._pool().submit(self._synthesize, language, text, submitted, stream, streaming)
+            self._inflight[key] = future
+            self._streams[key] = stream
+            metrics.set_gauge("tts.pending", len(self._inflight))
+
+        future.add_done_callback(lambda _: self._done(key, stream))
+        return future, stream
+
+    def _done(self, key: str, stream: AudioStream) -> None:
+        with self._lock:
+            self._inflight.pop(key, None)
+            self._streams.pop(key, None)
+            metrics.set_gauge("tts.pending", len(self._inflight))
+        if not stream.ready.done():
+            # Cancelled before it ran (shutdown): release the readers
+            stream.fail(ServiceUnavailableException("Audio generation was cancelled, please retry"))
+
+    def _synthesize(self, language: str, text: str, submitted: float, stream: AudioStream, streaming: bool) -> str:
+        metrics.observe("tts.queue_wait", time.perf_counter() - submitted)
+        with metrics.timer("tts.synthesis"):
+            try:
+                if streaming:
+                    path = TTSService().generate_audio(text, language, on_chunk=stream.append)
+                else:
+                    path = TTSService().generate_audio(text, language)
+            except BaseException as e:
+                stream.fail(e)
+                raise
+        stream.finish(path)
+        return path
+
+    async def get(self, key: str, language: str, text: str) -> str:
+        """Path of the audio for `key`, synthesizing it off the event loop if needed."""
+        path = TTSService().get_audio_path(key)
+        if os.path.exists(path):
+            metrics.incr("tts.cache.hits")
+            return path
+
+        metrics.incr("tts.cache.misses")
+        # A cancelled request must not cancel the job other requests await
+        return await asyncio.shield(asyncio.wrap_future(self.submit(key, language, text)))
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+audio_synthesizer = AudioSynthesizer()
@@ -0,0 +1,185 @@
+"""
+Compact transcoded audio variants.
+
+Next to each cached clip (the engine's own output: gTTS MP3 or pyttsx3
+WAV) the cache keeps smaller encodings, made with ffmpeg on first
+request:
+
+- `opus`: mono Opus in Ogg at 16 kbps, for clients that accept audio/ogg
+- `mp3-16k`: mono 16 kHz MP3 at 24 kbps, for clients that need MP3
+
+A variant lives beside its blob as `{key}.{variant}.{ext}`, so the audio
+GC keeps it exactly as long as the blob, and is shared through the audio
+storage like the blob. Without ffmpeg (or if a transcode fails) the
+original is served, under the original's validators (see `resolve`).
+"""
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from typing import NamedTuple, Optional
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.services.tts_service import TTSService
+
+ORIGINAL = "original"
+
+
+class Variant(NamedTuple):
+    name: str
+    extension: str
+    media_type: str
+    ffmpeg_args: tuple[str, ...] = ()
+
+
+VARIANTS = {
+    "opus": Variant(
+        "opus", "ogg", "audio/ogg; codecs=opus",
+        ("-ac", "1", "-c:a", "libopus", "-b:a", "16k", "-application", "voip"),
+    ),
+    "mp3-16k": Variant(
+        "mp3-16k", "mp3", "audio/mpeg",
+        ("-ac", "1", "-ar", "16000", "-c:a", "libmp3lame", "-b:a", "24k"),
+    ),
+}
+
+# ?quality= values
+QUALITIES = {"high": ORIGINAL, "medium": "mp3-16k", "low": "opus"}
+
+_OPUS_TYPES = ("audio/ogg", "audio/opus")
+
+
+def original(tts: Optional[TTSService] = None) -> Variant:
+    """What the TTS engine produces."""
+    tts = tts or TTSService()
+    return Variant(ORIGINAL, tts.extension, tts.media_type)
+
+
+def _accepted(accept: str) -> dict[str, float]:
+    """Media ranges of an Accept header with their q-values."""
+    ranges = {}
+    for item in accept.split(","):
+        media_range, *params = [part.strip() for part in item.split(";")]
+        if not media_range:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        ranges[media_range.lower()] = q
+    return ranges
+
+
+def negotiate(accept: Optional[str], quality: Optional[str], tts: Optional[TTSService] = None) -> Variant:
+    """
+    The variant to serve. `quality` wins when given; otherwise Opus is
+    served only to clients that name audio/ogg (wildcards keep the
+    original, so players without Opus support are never sent it), and
+    a WAV engine's output is sent as MP3 to clients that take MP3 but
+    not WAV.
+    """
+    source = original(tts)
+    if quality is not None:
+        name = QUALITIES[quality]
+        return source if name == ORIGINAL else VARIANTS[name]
+    if not accept:
+        return source
+
+    ranges = _accepted(accept)
+    wildcard = max(ranges.get("audio/*", 0.0), ranges.get("*/*", 0.0))
+    source_q = ranges.get(source.media_type, wildcard)
+    opus_q = max(ranges.get(media_type, 0.0) for media_type in _OPUS_TYPES)
+    if opus_q > 0 and opus_q >= source_q:
+        return VARIANTS["opus"]
+    if source_q <= 0 and ranges.get("audio/mpeg", 0.0) > 0:
+        return VARIANTS["mp3-16k"]
+    return source
+
+
+def variant_path(key: str, variant: Variant, tts: Optional[TTSService] = None) -> str:
+    tts = tts or TTSService()
+    if variant.name == ORIGINAL:
+        return tts.get_audio_path(key)
+    return os.path.join(tts.audio_dir, key[:2], f"{key}.{variant.name}.{variant.extension}")
+
+
+def available() -> bool:
+    return shutil.which(settings.ffmpeg_path) is not None
+
+
+# Output paths whose transcode failed -> when: retried after FAILURE_TTL_SECONDS
+FAILURE_TTL_SECONDS = 300.0
+_failed: dict[str, float] = {}
+
+
+def resolve(key: str, variant: Variant, tts: Optional[TTSService] = None) -> Variant:
+    """
+    The variant that will be served for `key`: `variant` if it is cached
+    or can be made, otherwise the original (no ffmpeg, or its transcode
+    failed recently). Validators must be computed from this one.
+    """
+    if variant.name == ORIGINAL:
+        return variant
+    tts = tts or TTSService()
+    path = variant_path(key, variant, tts)
+    if os.path.exists(path):
+        return variant
+    failed = _failed.get(path)
+    if failed is not None and time.monotonic() - failed > FAILURE_TTL_SECONDS:
+        _failed.pop(path, None)
+        failed = None
+    if failed is None and available():
+        return variant
+    return original(tts)
+
+
+# Striped: one transcode per output file at a time, without a lock per key
+_locks = [threading.Lock() for _ in range(64)]
+
+
+def transcode(key: str, variant: Variant, tts: Optional[TTSService] = None) -> Optional[str]:
+    """
+    Path of `variant` of the cached audio for `key`, encoding it first if
+    needed. None when it cannot be made (no ffmpeg, transcode failure):
+    serve the original instead. Blocking.
+    """
+    tts = tts or TTSService()
+    path = variant_path(key, variant, tts)
+    if tts.fetch(path):
+        metrics.incr("audio_variants.hits")
+        return path
+    if not available():
+        metrics.incr("audio_variants.unavailable")
+        return None
+
+    with _locks[hash(path) % len(_locks)]:
+        if os.path.exists(path):
+            return path
+        metrics.incr("audio_variants.transcodes")
+        tmp_path = os.path.join(os.path.dirname(path), f".tmp-{uuid.uuid4().hex}.{variant.extension}")
+        command = [
+            settings.ffmpeg_path, "-nostdin", "-loglevel", "error", "-y",
+            "-i", tts.get_audio_path(key), *variant.ffmpeg_args, tmp_path,
+        ]
+        try:
+            with metrics.timer("audio_variants.transcode"):
+                subprocess.run(command, check=True, capture_output=True, timeout=settings.audio_transcode_timeout)
+            os.replace(tmp_path, path)
+            _failed.pop(path, None)
+            tts.upload(path, variant.media_type)
+        except (OSError, subprocess.SubprocessError) as e:
+            metrics.incr("audio_variants.failed")
+            _failed[path] = time.monotonic()
+            print(f"⚠️  Transcoding {key} to {variant.name} failed: {e}")
+            return None
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return path
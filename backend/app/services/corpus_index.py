@@ -0,0 +1,117 @@
+"""
+In-process index of the whole practice corpus.
+
+Backs practice across all lessons (no `lesson_id`). Sentence ids of every
+active lesson are kept in one flat array, grouped by lesson, with the
+lesson boundaries in a parallel offsets array: 1M sentences cost 8 MB.
+The offsets double as a cumulative-weight array of lesson sizes: a
+uniform pick is one random index plus one primary-key fetch, and a
+size-proportional lesson draw is one bisect. Weighted draws thin those
+by rejection, so per-request work grows with neither corpus nor lesson
+count.
+
+The index is rebuilt when `lesson_pool_index` sees any invalidation, or
+after `lesson_pool_ttl_seconds`.
+"""
+import random
+import threading
+import time
+from array import array
+from bisect import bisect_right
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.models.lesson import Lesson
+from app.models.sentence import Sentence
+from app.services.lesson_pool import lesson_pool_index
+
+
+class Corpus:
+    """Sentence ids of all active lessons, grouped by lesson."""
+
+    __slots__ = ("revision", "built_at", "lesson_ids", "offsets", "sentence_ids")
+
+    def __init__(self, revision: int, rows: Iterable[tuple[int, int]]):
+        self.revision = revision
+        self.built_at = time.monotonic()
+        self.lesson_ids = array("q")
+        self.offsets = array("q")
+        self.sentence_ids = array("q")
+        for sentence_id, lesson_id in rows:
+            if not self.lesson_ids or self.lesson_ids[-1] != lesson_id:
+                self.lesson_ids.append(lesson_id)
+                self.offsets.append(len(self.sentence_ids))
+            self.sentence_ids.append(sentence_id)
+        self.offsets.append(len(self.sentence_ids))
+
+    def __len__(self) -> int:
+        return len(self.sentence_ids)
+
+    def lesson_size(self, index: int) -> int:
+        return self.offsets[index + 1] - self.offsets[index]
+
+    def sample_sentences(self, count: int) -> list[int]:
+        """Up to `count` distinct sentence ids, uniformly over the corpus."""
+        return [self.sentence_ids[i] for i in random.sample(range(len(self)), min(count, len(self)))]
+
+    def propose_lessons(self, count: int) -> list[tuple[int, int]]:
+        """Draw `count` (lesson_id, size) pairs with replacement, proportionally to lesson size."""
+        proposals = []
+        for _ in range(count):
+            index = bisect_right(self.offsets, random.randrange(len(self))) - 1
+            proposals.append((self.lesson_ids[index], self.lesson_size(index)))
+        return proposals
+
+
+class CorpusIndex:
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        self.ttl_seconds = settings.lesson_pool_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._lock = threading.Lock()
+        self._corpus: Optional[Corpus] = None
+
+    def _fresh(self, corpus: Optional[Corpus], revision: int) -> bool:
+        return (
+            corpus is not None
+            and corpus.revision == revision
+            and time.monotonic() - corpus.built_at < self.ttl_seconds
+        )
+
+    def get(self, db: Session) -> Corpus:
+        """Return the corpus, rebuilding it if any lesson changed since it was built."""
+        corpus = self._corpus
+        if self._fresh(corpus, lesson_pool_index.revision):
+            metrics.incr("corpus_index.hits")
+            return corpus
+
+        with self._lock:
+            # Concurrent misses queue here: only the first one rebuilds
+            revision = lesson_pool_index.revision
+            corpus = self._corpus
+            if self._fresh(corpus, revision):
+                metrics.incr("corpus_index.hits")
+                return corpus
+
+            metrics.incr("corpus_index.misses")
+            with metrics.timer("corpus_index.rebuild"):
+                corpus = self._rebuild(db, revision)
+        metrics.set_gauge("corpus_index.sentences", len(corpus))
+        return corpus
+
+    def _rebuild(self, db: Session, revision: int) -> Corpus:
+        # Core rows streamed straight into the arrays: ORM row handling
+        # would dominate the rebuild at a million sentences
+        rows = db.connection().execute(
+            select(Sentence.id, Sentence.lesson_id)
+            .join(Lesson, Lesson.id == Sentence.lesson_id)
+            .where(Lesson.is_active.is_(True))
+            .order_by(Lesson.order_index, Lesson.id, Sentence.order_index, Sentence.id)
+        )
+        self._corpus = Corpus(revision, rows)
+        return self._corpus
+
+
+corpus_index = CorpusIndex()
@@ -0,0 +1,139 @@
+"""
+In-process lesson pool index.
+
+Keeps each lesson's sentences in compact parallel arrays so practice
+selection can pick candidates without reading the `sentences` table.
+Pools are versioned: the sentences/lessons routers call `invalidate()`
+after every write, which bumps the lesson's version, and the pool is
+rebuilt on the next read. A TTL bounds staleness when another worker
+process did the write.
+"""
+import threading
+import time
+from array import array
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.models.sentence import Sentence
+
+
+class PooledSentence(NamedTuple):
+    """Read-only sentence view with the same attribute names as the model."""
+    id: int
+    lesson_id: int
+    vi_text: str
+    en_text: str
+    order_index: int
+    created_at: datetime
+    updated_at: datetime
+
+
+class LessonPool:
+    """Sentences of one lesson, ordered by order_index, as parallel arrays."""
+
+    __slots__ = (
+        "lesson_id", "version", "built_at", "ids", "order_indexes",
+        "vi_texts", "en_texts", "created_ats", "updated_ats", "positions",
+    )
+
+    def __init__(self, lesson_id: int, version: int, rows: list):
+        self.lesson_id = lesson_id
+        self.version = version
+        self.built_at = time.monotonic()
+        self.ids = array("q", (r.id for r in rows))
+        self.order_indexes = array("q", (r.order_index for r in rows))
+        self.vi_texts = tuple(r.vi_text for r in rows)
+        self.en_texts = tuple(r.en_text for r in rows)
+        self.created_ats = tuple(r.created_at for r in rows)
+        self.updated_ats = tuple(r.updated_at for r in rows)
+        self.positions = {sentence_id: i for i, sentence_id in enumerate(self.ids)}
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, sentence_id: int) -> bool:
+        return sentence_id in self.positions
+
+    def sentence(self, position: int) -> PooledSentence:
+        """Materialize the sentence at `position`."""
+        return PooledSentence(
+            id=self.ids[position],
+            lesson_id=self.lesson_id,
+            vi_text=self.vi_texts[position],
+            en_text=self.en_texts[position],
+            order_index=self.order_indexes[position],
+            created_at=self.created_ats[position],
+            updated_at=self.updated_ats[position],
+        )
+
+
+class LessonPoolIndex:
+    def __init__(self, ttl_seconds: Optional[float] = None):
+        self.ttl_seconds = settings.lesson_pool_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self._lock = threading.Lock()
+        self._pools: dict[int, LessonPool] = {}
+        self._versions: dict[int, int] = {}
+        self._generation = 0
+        self.revision = 0  # Bumped on every invalidation; watched by the corpus index
+
+    def _current_version(self, lesson_id: int) -> int:
+        return self._generation + self._versions.get(lesson_id, 0)
+
+    def get(self, db: Session, lesson_id: int) -> LessonPool:
+        """Return the lesson's pool, rebuilding it if it is stale."""
+        with self._lock:
+            version = self._current_version(lesson_id)
+            pool = self._pools.get(lesson_id)
+
+        if (
+            pool is not None
+            and pool.version == version
+            and time.monotonic() - pool.built_at < self.ttl_seconds
+        ):
+            metrics.incr("lesson_pool.hits")
+            return pool
+
+        metrics.incr("lesson_pool.misses")
+        with metrics.timer("lesson_pool.rebuild"):
+            rows = db.execute(
+                select(
+                    Sentence.id,
+                    Sentence.order_index,
+                    Sentence.vi_text,
+                    Sentence.en_text,
+                    Sentence.created_at,
+                    Sentence.updated_at,
+                )
+                .where(Sentence.lesson_id == lesson_id)
+                .order_by(Sentence.order_index, Sentence.id)
+            ).all()
+            pool = LessonPool(lesson_id, version, rows)
+
+        # Empty pools are not kept so unknown lesson ids cannot grow the index
+        if pool:
+            with self._lock:
+                self._pools[lesson_id] = pool
+                metrics.set_gauge("lesson_pool.size", len(self._pools))
+        return pool
+
+    def invalidate(self, *lesson_ids: Optional[int]) -> None:
+        """Mark lessons as changed; with no ids, mark every lesson."""
+        with self._lock:
+            self.revision += 1
+            if not lesson_ids:
+                self._generation += 1
+                self._pools.clear()
+            for lesson_id in lesson_ids:
+                if lesson_id is None:
+                    continue
+                self._versions[lesson_id] = self._versions.get(lesson_id, 0) + 1
+                self._pools.pop(lesson_id, None)
+            metrics.set_gauge("lesson_pool.size", len(self._pools))
+
+
+lesson_pool_index = LessonPoolIndex()
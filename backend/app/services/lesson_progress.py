@@ -0,0 +1,183 @@
+"""
+Per-user, per-lesson progress rollup.
+
+`user_lesson_progress` holds, for each (user, lesson), how many distinct
+sentences were practiced and how many practices were recorded in total.
+`srs.record_reviews` applies deltas in the same transaction as the
+practice upsert, counting a sentence as new when that upsert inserted
+its row; sentence deletes and moves recompute the affected lessons (a
+move also carries the sentence's `user_progress.lesson_id`).
+`rebuild()` backfills everything from user_progress and `find_drift()`
+reports rows that disagree with it.
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import case, delete, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.sql import upsert
+from app.models.progress import UserLessonProgress, UserProgress
+from app.models.sentence import Sentence
+
+_ROLLUP_COLUMNS = ["user_id", "lesson_id", "practiced_count", "total_practice_count", "last_practiced_at"]
+
+
+def lessons_of(db: Session, sentence_ids: Iterable[int]) -> dict[int, int]:
+    """{sentence_id: lesson_id}; deleted sentences are left out."""
+    return dict(db.execute(select(Sentence.id, Sentence.lesson_id).where(Sentence.id.in_(list(sentence_ids)))).all())
+
+
+def record(db: Session, reviews: list, lesson_of: dict[int, int], inserted: set[tuple]) -> None:
+    """
+    Add a batch of `srs.Review`s to the rollup. `inserted` holds the
+    (str(user_id), sentence_id) keys whose progress row the batch's
+    upsert inserted: those sentences count as newly practiced.
+    """
+    deltas: dict[tuple, dict] = {}
+    for review in reviews:
+        lesson_id = lesson_of.get(review.sentence_id)
+        if lesson_id is None:
+            continue  # deleted sentence: the progress upsert rejects it
+        key = (str(review.user_id), lesson_id)
+        delta = deltas.setdefault(key, {
+            "user_id": review.user_id,
+            "lesson_id": lesson_id,
+            "practiced_count": 0,
+            "total_practice_count": 0,
+            "last_practiced_at": review.practiced_at,
+        })
+        if (key[0], review.sentence_id) in inserted:
+            delta["practiced_count"] += 1
+        delta["total_practice_count"] += review.count
+        if review.practiced_at and (delta["last_practiced_at"] is None or review.practiced_at > delta["last_practiced_at"]):
+            delta["last_practiced_at"] = review.practiced_at
+    
+    if deltas:
+        _apply(db, list(deltas.values()))
+
+
+def _apply(db: Session, deltas: list[dict]) -> None:
+    table = UserLessonProgress.__table__
+    stmt = upsert(db, table).values(deltas)
+    proposed = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.lesson_id],
+        set_={
+            "practiced_count": table.c.practiced_count + proposed.practiced_count,
+            "total_practice_count": table.c.total_practice_count + proposed.total_practice_count,
+            "last_practiced_at": case(
+                (or_(
+                    table.c.last_practiced_at.is_(None),
+                    proposed.last_practiced_at > table.c.last_practiced_at,
+                ), proposed.last_practiced_at),
+                else_=table.c.last_practiced_at,
+            ),
+            "updated_at": func.now(),
+        },
+    )
+    db.execute(stmt)
+
+
+def _aggregate(lesson_ids: Optional[Iterable[int]] = None):
+    """user_progress grouped by (user, lesson): what the rollup should hold."""
+    stmt = (
+        select(
+            UserProgress.user_id,
+            Sentence.lesson_id,
+            func.count(UserProgress.id),
+            func.sum(UserProgress.practiced_count),
+            func.max(UserProgress.last_practiced_at),
+        )
+        .join(Sentence, Sentence.id == UserProgress.sentence_id)
+        .group_by(UserProgress.user_id, Sentence.lesson_id)
+    )
+    if lesson_ids is not None:
+        stmt = stmt.where(Sentence.lesson_id.in_(lesson_ids))
+    return stmt
+
+
+def move(db: Session, sentence_ids: Iterable[int], old_lesson_id: int, new_lesson_id: int) -> None:
+    """
+    Move the sentences' progress rows to their new lesson and recompute
+    both lessons' rollups. The caller flushes the move first and commits.
+    """
+    db.execute(
+        update(UserProgress)
+        .where(UserProgress.sentence_id.in_(list(sentence_ids)))
+        .values(lesson_id=new_lesson_id)
+    )
+    refresh(db, [old_lesson_id, new_lesson_id])
+
+
+def refresh(db: Session, lesson_ids: Optional[Iterable[int]] = None) -> None:
+    """
+    Recompute the rollup for `lesson_ids` (every lesson when None) from
+    user_progress. Called after sentences are deleted or moved between
+    lessons; the caller commits.
+    """
+    if lesson_ids is not None:
+        lesson_ids = {lesson_id for lesson_id in lesson_ids if lesson_id is not None}
+        if not lesson_ids:
+            return
+    
+    clear = delete(UserLessonProgress)
+    if lesson_ids is not None:
+        clear = clear.where(UserLessonProgress.lesson_id.in_(lesson_ids))
+    db.execute(clear)
+    db.execute(insert(UserLessonProgress).from_select(_ROLLUP_COLUMNS, _aggregate(lesson_ids)))
+
+
+def rebuild(db: Session) -> int:
+    """Backfill the whole rollup from user_progress. Returns the row count."""
+    refresh(db)
+    db.commit()
+    return db.scalar(select(func.count()).select_from(UserLessonProgress))
+
+
+def find_drift(db: Session) -> list[dict]:
+    """
+    Compare the rollup with user_progress. Returns one entry per
+    (user, lesson) whose counters differ, with `expected` and `actual`
+    as (practiced_count, total_practice_count).
+    """
+    expected = {
+        (str(user_id), lesson_id): (practiced, total)
+        for user_id, lesson_id, practiced, total, _ in db.execute(_aggregate())
+    }
+    actual = {
+        (str(user_id), lesson_id): (practiced, total)
+        for user_id, lesson_id, practiced, total in db.execute(select(
+            UserLessonProgress.user_id,
+            UserLessonProgress.lesson_id,
+            UserLessonProgress.practiced_count,
+            UserLessonProgress.total_practice_count,
+        ))
+    }
+    
+    drift = []
+    for key in sorted(expected.keys() | actual.keys(), key=lambda k: (k[1], k[0])):
+        want = expected.get(key, (0, 0))
+        have = actual.get(key, (0, 0))
+        if want != have:
+            drift.append({"user_id": key[0], "lesson_id": key[1], "expected": want, "actual": have})
+    return drift
+
+
+def get(db: Session, user_id, lesson_id: int) -> tuple[int, int]:
+    """(practiced_count, total_practice_count) for one lesson: a primary-key lookup."""
+    row = db.execute(
+        select(UserLessonProgress.practiced_count, UserLessonProgress.total_practice_count)
+        .where(UserLessonProgress.user_id == user_id, UserLessonProgress.lesson_id == lesson_id)
+    ).first()
+    return tuple(row) if row else (0, 0)
+
+
+def totals(db: Session, user_id) -> tuple[int, int]:
+    """(practiced_count, total_practice_count) across all lessons: a primary-key prefix range."""
+    practiced, total = db.execute(
+        select(
+            func.coalesce(func.sum(UserLessonProgress.practiced_count), 0),
+            func.coalesce(func.sum(UserLessonProgress.total_practice_count), 0),
+        ).where(UserLessonProgress.user_id == user_id)
+    ).one()
+    return int(practiced), int(total)
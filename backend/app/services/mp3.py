@@ -0,0 +1,121 @@
+"""
+Minimal MPEG audio Layer III frame parsing.
+
+Enough to join MP3 files without re-encoding: find the frames, drop ID3
+tags and the Xing/Info/VBRI header frame (it describes one file and would
+make players misjudge the length of the joined stream), and count
+samples for durations.
+"""
+from typing import NamedTuple
+
+# Bitrates (kbps) by bitrate index, Layer III
+_BITRATES = {
+    "1": (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    "2": (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {
+    0b11: ("1", (44100, 48000, 32000)),
+    0b10: ("2", (22050, 24000, 16000)),
+    0b00: ("2.5", (11025, 12000, 8000)),
+}
+_VBR_TAGS = (b"Xing", b"Info", b"VBRI")
+
+
+class FrameHeader(NamedTuple):
+    length: int
+    samples: int
+    sample_rate: int
+    channels: int
+
+
+def parse_header(header: bytes) -> FrameHeader:
+    """Decode a 4-byte frame header. Raises ValueError if it is not a Layer III frame."""
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        raise ValueError("No MPEG frame sync")
+    version_bits = (header[1] >> 3) & 0b11
+    if version_bits not in _SAMPLE_RATES or (header[1] >> 1) & 0b11 != 0b01:
+        raise ValueError("Not an MPEG Layer III frame")
+    version, sample_rates = _SAMPLE_RATES[version_bits]
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0b11
+    if bitrate_index in (0, 15) or rate_index == 3:
+        raise ValueError("Unsupported bitrate or sample rate")
+
+    bitrate = _BITRATES["1" if version == "1" else "2"][bitrate_index] * 1000
+    sample_rate = sample_rates[rate_index]
+    padding = (header[2] >> 1) & 1
+    samples = 1152 if version == "1" else 576
+    length = samples // 8 * bitrate // sample_rate + padding
+    channels = 1 if header[3] >> 6 == 0b11 else 2
+    return FrameHeader(length, samples, sample_rate, channels)
+
+
+def _skip_id3v2(data: bytes) -> int:
+    if data[:3] != b"ID3" or len(data) < 10:
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+class Frames(NamedTuple):
+    """The audio frames of an MP3 file, ready to be concatenated."""
+    data: bytes
+    samples: int
+    sample_rate: int
+
+    @property
+    def duration(self) -> float:
+        return self.samples / self.sample_rate if self.sample_rate else 0.0
+
+
+def extract_frames(data: bytes) -> Frames:
+    """
+    Audio frames of an MP3 file, without tags or a VBR header frame.
+    Raises ValueError if no frames are found.
+    """
+    end = len(data) - 128 if data[-128:-125] == b"TAG" else len(data)
+    position = _skip_id3v2(data)
+    chunks = []
+    samples = 0
+    sample_rate = 0
+    first = True
+
+    while position + 4 <= end:
+        try:
+            frame = parse_header(data[position:position + 4])
+        except ValueError:
+            if chunks:
+                break  # trailing junk after the audio
+            position += 1  # resync: garbage before the first frame
+            continue
+        if position + frame.length > end:
+            break  # truncated last frame
+
+        body = data[position:position + frame.length]
+        if first and any(tag in body[:64] for tag in _VBR_TAGS):
+            first = False
+            position += frame.length
+            continue
+        if sample_rate and frame.sample_rate != sample_rate:
+            raise ValueError("Sample rate changes mid-stream")
+        first = False
+        sample_rate = frame.sample_rate
+        chunks.append(body)
+        samples += frame.samples
+        position += frame.length
+
+    if not chunks:
+        raise ValueError("No MPEG audio frames found")
+    return Frames(b"".join(chunks), samples, sample_rate)
+
+
+# MPEG-2 Layer III, 32 kbps, 24 kHz, mono (what gTTS produces); all-zero
+# side info and main data decode to silence
+_SILENT_FRAME = bytes([0xFF, 0xF3, 0x44, 0xC4]) + bytes(92)
+_SILENT_FRAME_SECONDS = 576 / 24000
+
+
+def silence(seconds: float) -> bytes:
+    """A valid MP3 stream of (at least one frame of) silence lasting about `seconds`."""
+    return _SILENT_FRAME * max(1, round(seconds / _SILENT_FRAME_SECONDS))
@@ -0,0 +1,127 @@
+"""
+Write-behind buffer for practice recording.
+
+When `settings.practice_write_behind` is on, /practice/record only queues
+the review in memory. A background thread flushes the queue every
+`practice_flush_interval_seconds`, or as soon as it holds
+`practice_flush_max_pending` entries, as one multi-row upsert. Pending
+writes are flushed on shutdown from the app lifespan hook.
+"""
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.database import SessionLocal
+from app.core.metrics import metrics
+from app.services import srs
+
+
+class PracticeWriteBuffer:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        flush_interval: Optional[float] = None,
+        max_pending: Optional[int] = None,
+    ):
+        self.session_factory = session_factory
+        self.flush_interval = flush_interval or settings.practice_flush_interval_seconds
+        self.max_pending = max_pending or settings.practice_flush_max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: dict[tuple, srs.Review] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def add(self, user_id, sentence_id: int, grade: int = srs.DEFAULT_GRADE, practiced_at: datetime = None, count: int = 1):
+        """Queue a review. Repeats of a sentence before the next flush are merged."""
+        review = srs.Review(user_id, sentence_id, grade, practiced_at or datetime.utcnow(), count)
+        key = (str(user_id), sentence_id)
+
+        with self._lock:
+            queued = self._pending.get(key)
+            self._pending[key] = srs.merge(queued, review) if queued else review
+            depth = len(self._pending)
+
+        metrics.set_gauge("practice_buffer.depth", depth)
+        if depth >= self.max_pending:
+            self._wake.set()
+
+    def flush(self) -> int:
+        """Write everything queued so far. Returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                reviews = list(self._pending.values())
+                self._pending.clear()
+            metrics.set_gauge("practice_buffer.depth", len(self))
+            if not reviews:
+                return 0
+
+            start = time.perf_counter()
+            db = self.session_factory()
+            try:
+                written = self._write(db, reviews)
+            finally:
+                db.close()
+            metrics.observe("practice_buffer.flush", time.perf_counter() - start)
+            metrics.incr("practice_buffer.flushed_rows", written)
+            return written
+
+    def _write(self, db: Session, reviews: list[srs.Review]) -> int:
+        try:
+            srs.record_reviews(db, reviews)
+            db.commit()
+            return len(reviews)
+        except Exception as e:
+            db.rollback()
+            print(f"⚠️  Practice flush failed ({e}), retrying row by row")
+
+        # One bad row (e.g. a sentence deleted since it was queued) must not
+        # drop the rest of the batch
+        written = 0
+        for review in reviews:
+            try:
+                srs.record_reviews(db, [review])
+                db.commit()
+                written += 1
+            except Exception as e:
+                db.rollback()
+                metrics.incr("practice_buffer.failed_rows")
+                print(f"❌ Dropped practice record {review.user_id}/{review.sentence_id}: {e}")
+        return written
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"❌ Practice flush error: {e}")
+
+    def start(self):
+        """Start the background flusher thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="practice-write-behind", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flusher and write whatever is still queued."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+
+practice_buffer = PracticeWriteBuffer()
@@ -0,0 +1,102 @@
+"""
+Stateless practice walks.
+
+The "ordered" and "shuffled" modes keep no queue on the server. The
+client carries an opaque cursor (lesson id, seed, position) and the
+server maps the position to a sentence: directly for "ordered", through
+a seeded Feistel permutation of the lesson's positions for "shuffled".
+Each lap of a shuffled walk uses a fresh permutation, so a walk never
+repeats a sentence until it has served all of them.
+
+Positions index the lesson pool, so a lesson edited mid-walk may repeat
+or skip a sentence in the current lap.
+"""
+import base64
+import binascii
+import secrets
+import struct
+from typing import NamedTuple
+
+_MASK64 = (1 << 64) - 1
+_CURSOR = struct.Struct(">QQQ")
+# Leaves room to advance: a walk adds at most a lesson's size per call
+MAX_POSITION = 1 << 63
+
+
+def _mix(value: int) -> int:
+    """splitmix64 finalizer: a cheap, well-distributed 64-bit hash."""
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+class FeistelPermutation:
+    """
+    Pseudo-random permutation of range(size), evaluated one index at a
+    time in O(1) expected: a balanced Feistel network over the smallest
+    even-bit domain covering `size`, with cycle-walking back into range.
+    """
+
+    ROUNDS = 4
+
+    def __init__(self, size: int, seed: int):
+        if size < 1:
+            raise ValueError("size must be positive")
+        self.size = size
+        bits = max(2, (size - 1).bit_length())
+        bits += bits & 1
+        self._half_bits = bits // 2
+        self._half_mask = (1 << self._half_bits) - 1
+        self._keys = [_mix(seed ^ _mix(round_)) for round_ in range(self.ROUNDS)]
+
+    def _encrypt(self, value: int) -> int:
+        left, right = value >> self._half_bits, value & self._half_mask
+        for key in self._keys:
+            left, right = right, left ^ (_mix(right ^ key) & self._half_mask)
+        return (left << self._half_bits) | right
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index: int) -> int:
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        # The domain is < 4x size, so this loops fewer than 4 times on average
+        value = self._encrypt(index)
+        while value >= self.size:
+            value = self._encrypt(value)
+        return value
+
+
+class PracticeCursor(NamedTuple):
+    """Where a walk stands: `position` counts sentences served so far."""
+    lesson_id: int
+    seed: int
+    position: int = 0
+
+    @classmethod
+    def start(cls, lesson_id: int) -> "PracticeCursor":
+        return cls(lesson_id, secrets.randbits(63))
+
+    @classmethod
+    def decode(cls, token: str) -> "PracticeCursor":
+        """Parse a cursor from `encode()`. Raises ValueError if it is malformed."""
+        try:
+            raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+            cursor = cls(*_CURSOR.unpack(raw))
+        except (binascii.Error, struct.error, ValueError):
+            raise ValueError("Invalid practice cursor")
+        if cursor.position > MAX_POSITION:
+            raise ValueError("Invalid practice cursor")
+        return cursor
+
+    def encode(self) -> str:
+        return base64.urlsafe_b64encode(_CURSOR.pack(*self)).rstrip(b"=").decode()
+
+    def pool_position(self, mode: str, size: int) -> int:
+        """Lesson pool position of the sentence at this cursor."""
+        lap, offset = divmod(self.position, size)
+        if mode == "ordered":
+            return offset
+        return FeistelPermutation(size, self.seed + lap)[offset]
@@ -1,123 +1,352 @@
-from datetime import datetime, timedelta
+from collections import Counter
+from datetime import datetime, timedelta, timezone
 from typing import Optional
 import random
 from sqlalchemy.orm import Session
-from sqlalchemy import func
+from sqlalchemy import case, func, select
+from app.config import settings
 from app.models.sentence import Sentence
 from app.models.progress import UserProgress
 from app.models.user import User
-from app.core.exceptions import NotFoundException
+from app.core.exceptions import BadRequestException, NotFoundException
+from app.services.corpus_index import corpus_index
+from app.services.lesson_pool import lesson_pool_index, PooledSentence
+from app.services import lesson_progress, srs
+from app.services.practice_buffer import practice_buffer
+from app.services.practice_cursor import PracticeCursor
+from app.services.recent_practice import recent_practice
+
+# Per-sentence weights of the all-lessons weakness draw
+NEW_WEIGHT = 2.0
+DUE_WEIGHT = 4.0
+MAX_SENTENCE_WEIGHT = max(NEW_WEIGHT, DUE_WEIGHT * srs.DEFAULT_EASE / srs.MIN_EASE)
 
 
 class PracticeService:
+    MODES = ("smart", "random", "ordered", "shuffled")
+    WALK_MODES = ("ordered", "shuffled")  # Stateless, resumed with a cursor (see walk())
+    
     @staticmethod
     def get_next_sentence(
         db: Session,
         lesson_id: int,
         mode: str = "random",
-        user: Optional[User] = None
-    ) -> tuple[Sentence, Optional[dict]]:
+        user: Optional[User] = None,
+        recent_seconds: Optional[float] = None
+    ) -> tuple[Sentence | PooledSentence, Optional[dict]]:
         """Get next sentence for practice."""
-        query = db.query(Sentence).filter(Sentence.lesson_id == lesson_id)
+        sentences, progress = PracticeService.get_next_sentences(db, lesson_id, 1, mode, user, recent_seconds)
+        if not sentences:
+            raise NotFoundException("No sentences found in this lesson")
+        return sentences[0], progress
+    
+    @staticmethod
+    def get_next_sentences(
+        db: Session,
+        lesson_id: int,
+        count: int = 1,
+        mode: str = "random",
+        user: Optional[User] = None,
+        recent_seconds: Optional[float] = None
+    ) -> tuple[list[Sentence | PooledSentence], Optional[dict]]:
+        """
+        Get an ordered queue of up to `count` sentences, with progress computed once.
+        Smart mode queues sentences practiced in the last `recent_seconds`
+        (default: settings.recent_practice_window_seconds) last.
+        """
+        if mode in PracticeService.WALK_MODES:
+            sentences, progress, _ = PracticeService.walk(db, lesson_id, mode, count, None, user)
+            return sentences, progress
+        if lesson_id is None:
+            return PracticeService._get_across_lessons(db, count, mode, user, recent_seconds)
         
-        if user:
-            # Filter out recently practiced (< 5 minutes ago)
-            recent_time = datetime.utcnow() - timedelta(minutes=5)
-            recent_ids = db.query(UserProgress.sentence_id).filter(
-                UserProgress.user_id == user.id,
-                UserProgress.last_practiced_at > recent_time
-            ).all()
-            recent_ids = [r[0] for r in recent_ids]
-            
-            if recent_ids:
-                query = query.filter(~Sentence.id.in_(recent_ids))
-            
-            # Prioritize least practiced
-            sentences = query.all()
-            if not sentences:
-                # All practiced recently, just get any
-                sentences = db.query(Sentence).filter(
-                    Sentence.lesson_id == lesson_id
-                ).all()
-            
-            if not sentences:
+        if user and mode == "smart":
+            # Candidates come from the in-process lesson pool
+            pool = lesson_pool_index.get(db, lesson_id)
+            if not pool:
                 raise NotFoundException("No sentences found in this lesson")
             
-            # Get practice counts
-            practice_counts = {}
-            for s in sentences:
-                count = db.query(UserProgress).filter(
-                    UserProgress.user_id == user.id,
-                    UserProgress.sentence_id == s.id
-                ).first()
-                practice_counts[s.id] = count.practiced_count if count else 0
-            
-            # Sort by practice count and pick randomly from least practiced
-            sentences.sort(key=lambda x: practice_counts[x.id])
-            min_count = practice_counts[sentences[0].id]
-            least_practiced = [s for s in sentences if practice_counts[s.id] == min_count]
-            sentence = random.choice(least_practiced)
+            now = datetime.utcnow()
+            if recent_seconds is None:
+                recent_seconds = settings.recent_practice_window_seconds
+            recent = {sid for sid in recent_practice.recent(user.id, recent_seconds) if sid in pool}
             
-            # Get progress info
-            total_in_lesson = db.query(Sentence).filter(
-                Sentence.lesson_id == lesson_id
-            ).count()
+            # Due reviews first, then new sentences, then practice ahead of
+            # schedule; anything practiced within the window goes last
+            due = PracticeService._due(db, user, lesson_id, now, count + len(recent))
+            queue = [sid for sid in due if sid not in recent][:count]
+            practiced_count = PracticeService._rollup_practiced(db, user, lesson_id, len(pool))
+            if len(queue) < count and practiced_count < len(pool):
+                queue += PracticeService._draw_new(db, user, pool, count - len(queue), practiced_count, recent)
+            if len(queue) < count:
+                since = now - timedelta(seconds=recent_seconds)
+                ahead = PracticeService._practice_ahead(db, user, lesson_id, since, count + len(queue) + len(recent))
+                ahead = [sid for sid in ahead if sid not in recent] + [sid for sid in ahead if sid in recent]
+                queue += [sid for sid in ahead if sid not in queue][: count - len(queue)]
+            if len(queue) < count:
+                # Practiced only inside the window and not flushed yet (write-behind):
+                # nothing else is left, so repeat the least recent ones
+                oldest = recent_practice.oldest_first(user.id, recent_seconds)
+                queue += [sid for sid in oldest if sid in pool and sid not in queue][: count - len(queue)]
             
-            # Count unique sentences practiced in this lesson
-            practiced_sentence_ids = db.query(UserProgress.sentence_id).filter(
-                UserProgress.user_id == user.id,
-                UserProgress.sentence_id.in_(
-                    db.query(Sentence.id).filter(Sentence.lesson_id == lesson_id)
-                )
-            ).distinct().all()
-            practiced_count = len(practiced_sentence_ids)
+            if any(sid not in pool for sid in queue):
+                # Written by another worker since the pool was built
+                lesson_pool_index.invalidate(lesson_id)
+                pool = lesson_pool_index.get(db, lesson_id)
+            sentences = [pool.sentence(pool.positions[sid]) for sid in queue if sid in pool]
             
-            progress = {
-                "practiced_count": practiced_count,
-                "total_in_lesson": total_in_lesson,
-                "percentage": round((practiced_count / total_in_lesson) * 100, 2) if total_in_lesson > 0 else 0
-            }
-            
-            return sentence, progress
+            return sentences, PracticeService._progress(practiced_count, len(pool))
         else:
-            # Guest mode - just random
-            sentences = query.all()
-            if not sentences:
+            # Random (and guest) mode: draw positions from the cached pool,
+            # so a warm pick costs no query whatever the lesson size
+            pool = lesson_pool_index.get(db, lesson_id)
+            if not pool:
                 raise NotFoundException("No sentences found in this lesson")
             
-            sentence = random.choice(sentences)
-            
-            # Get total count for guest progress bar
-            total_in_lesson = db.query(Sentence).filter(
-                Sentence.lesson_id == lesson_id
-            ).count()
-            
-            progress = {
-                "practiced_count": 0,
-                "total_in_lesson": total_in_lesson,
-                "percentage": 0
-            }
+            positions = random.sample(range(len(pool)), min(count, len(pool)))
+            sentences = [pool.sentence(position) for position in positions]
             
-            return sentence, progress
+            practiced_count = PracticeService._rollup_practiced(db, user, lesson_id, len(pool))
+            return sentences, PracticeService._progress(practiced_count, len(pool))
+    
+    @staticmethod
+    def walk(
+        db: Session,
+        lesson_id: int,
+        mode: str,
+        count: int = 1,
+        cursor: Optional[str] = None,
+        user: Optional[User] = None
+    ) -> tuple[list[PooledSentence], dict, str]:
+        """
+        Serve the next `count` sentences of an "ordered" or "shuffled" walk
+        and return the cursor to continue from. Without a cursor a new walk
+        starts; nothing is stored on the server.
+        """
+        if lesson_id is None:
+            raise BadRequestException(f"The {mode} mode needs a lesson_id")
+        if cursor:
+            try:
+                state = PracticeCursor.decode(cursor)
+            except ValueError as e:
+                raise BadRequestException(str(e))
+            if state.lesson_id != lesson_id:
+                raise BadRequestException("Practice cursor belongs to another lesson")
+        else:
+            state = PracticeCursor.start(lesson_id)
+        
+        pool = lesson_pool_index.get(db, lesson_id)
+        if not pool:
+            raise NotFoundException("No sentences found in this lesson")
+        
+        size = len(pool)
+        served = min(count, size)
+        sentences = [
+            pool.sentence(state._replace(position=state.position + i).pool_position(mode, size))
+            for i in range(served)
+        ]
+        state = state._replace(position=state.position + served)
+        
+        practiced_count = PracticeService._rollup_practiced(db, user, lesson_id, size)
+        progress = PracticeService._progress(practiced_count, size)
+        progress["position"] = (state.position - 1) % size + 1  # Served so far in this lap
+        return sentences, progress, state.encode()
     
     @staticmethod
-    def record_practice(db: Session, user: User, sentence_id: int):
-        """Record that user practiced a sentence."""
-        progress = db.query(UserProgress).filter(
-            UserProgress.user_id == user.id,
-            UserProgress.sentence_id == sentence_id
-        ).first()
+    def _get_across_lessons(
+        db: Session,
+        count: int,
+        mode: str,
+        user: Optional[User],
+        recent_seconds: Optional[float] = None
+    ) -> tuple[list[Sentence | PooledSentence], dict]:
+        """
+        Practice across every active lesson. Smart mode draws lessons
+        weighted by the user's weakness, then selects inside each drawn
+        lesson as usual; random mode is uniform over all sentences.
+        """
+        corpus = corpus_index.get(db)
+        if not corpus:
+            raise NotFoundException("No sentences available for practice")
         
-        if progress:
-            progress.practiced_count += 1
-            progress.last_practiced_at = datetime.utcnow()
+        if user and mode == "smart":
+            picks = PracticeService._draw_weak_lessons(db, user, corpus, count)
+            queues = {
+                lesson_id: iter(PracticeService.get_next_sentences(db, lesson_id, k, mode, user, recent_seconds)[0])
+                for lesson_id, k in Counter(picks).items()
+            }
+            sentences = [s for s in (next(queues[lesson_id], None) for lesson_id in picks) if s]
+            practiced_count = lesson_progress.totals(db, user.id)[0]
         else:
-            progress = UserProgress(
-                user_id=user.id,
-                sentence_id=sentence_id,
-                practiced_count=1,
-                last_practiced_at=datetime.utcnow()
+            ids = corpus.sample_sentences(count)
+            rows = {s.id: s for s in db.query(Sentence).filter(Sentence.id.in_(ids)).all()}
+            sentences = [rows[sid] for sid in ids if sid in rows]
+            practiced_count = lesson_progress.totals(db, user.id)[0] if user else 0
+        
+        if not sentences:
+            raise NotFoundException("No sentences available for practice")
+        return sentences, PracticeService._progress(min(practiced_count, len(corpus)), len(corpus))
+    
+    @staticmethod
+    def _draw_weak_lessons(db: Session, user: User, corpus, count: int) -> list[int]:
+        """
+        Draw `count` lessons weighted by weakness (see _lesson_weight).
+        Proposals come size-proportional from the corpus and are kept with
+        probability weight / (size * MAX_SENTENCE_WEIGHT).
+        """
+        now = datetime.utcnow()
+        picks: list[int] = []
+        for _ in range(16):
+            proposals = corpus.propose_lessons(4 * (count - len(picks)))
+            reviews = PracticeService._lesson_reviews(db, user, {lesson_id for lesson_id, _ in proposals}, now)
+            for lesson_id, size in proposals:
+                keep = PracticeService._lesson_weight(size, *reviews.get(lesson_id, (0, 0, srs.DEFAULT_EASE)))
+                if len(picks) < count and random.random() < keep / (size * MAX_SENTENCE_WEIGHT):
+                    picks.append(lesson_id)
+            if len(picks) == count:
+                break
+        return picks
+    
+    @staticmethod
+    def _lesson_weight(size: int, practiced: int, due: int, average_ease: float) -> float:
+        """
+        Weakness of a lesson: each new sentence weighs NEW_WEIGHT, each
+        practiced one 1 and each one due for review DUE_WEIGHT. Practiced
+        ones are scaled by DEFAULT_EASE / the lesson's average ease, so a
+        lesson the user keeps failing (low ease, reviews piling up) weighs
+        several times a mastered one.
+        """
+        practiced = min(practiced, size)
+        due = min(due, practiced)
+        difficulty = srs.DEFAULT_EASE / max(average_ease, srs.MIN_EASE)
+        return NEW_WEIGHT * (size - practiced) + difficulty * ((practiced - due) + DUE_WEIGHT * due)
+    
+    @staticmethod
+    def _lesson_reviews(db: Session, user: User, lesson_ids: set[int], now: datetime) -> dict[int, tuple]:
+        """{lesson_id: (practiced, due, average ease)}: ranges on ix_user_progress_user_lesson_due."""
+        return {
+            lesson_id: (practiced, int(due), float(average_ease))
+            for lesson_id, practiced, due, average_ease in db.execute(
+                select(
+                    UserProgress.lesson_id,
+                    func.count(),
+                    func.sum(case((UserProgress.due_at <= now, 1), else_=0)),
+                    func.avg(UserProgress.ease_factor),
+                )
+                .where(UserProgress.user_id == user.id, UserProgress.lesson_id.in_(lesson_ids))
+                .group_by(UserProgress.lesson_id)
+            )
+        }
+    
+    @staticmethod
+    def _rollup_practiced(db: Session, user: Optional[User], lesson_id: int, total: int) -> int:
+        """Distinct sentences practiced in the lesson, from the rollup row."""
+        if not user:
+            return 0
+        return min(lesson_progress.get(db, user.id, lesson_id)[0], total)
+    
+    @staticmethod
+    def _progress(practiced_count: int, total_in_lesson: int) -> dict:
+        return {
+            "practiced_count": practiced_count,
+            "total_in_lesson": total_in_lesson,
+            "percentage": round((practiced_count / total_in_lesson) * 100, 2) if total_in_lesson > 0 else 0
+        }
+    
+    @staticmethod
+    def _draw_new(db: Session, user: User, pool, k: int, practiced_count: int, exclude: set[int]) -> list[int]:
+        """
+        Up to `k` random never-practiced sentences of the pool. While at
+        least a quarter of the lesson is new, a sample of 4k positions is
+        checked with point lookups on uix_user_sentence; otherwise the
+        lesson's practiced ids are read and the rest drawn from.
+        """
+        if 4 * (len(pool) - practiced_count) >= len(pool):
+            positions = random.sample(range(len(pool)), min(len(pool), 4 * k + len(exclude)))
+            candidates = [pool.ids[position] for position in positions if pool.ids[position] not in exclude]
+            practiced = set(db.execute(
+                select(UserProgress.sentence_id).where(
+                    UserProgress.user_id == user.id,
+                    UserProgress.sentence_id.in_(candidates),
+                )
+            ).scalars())
+            new_ids = [sid for sid in candidates if sid not in practiced]
+            if len(new_ids) >= k:
+                return new_ids[:k]
+        
+        practiced = PracticeService._practiced_ids(db, user, pool.lesson_id)
+        new_ids = [sid for sid in pool.ids if sid not in practiced and sid not in exclude]
+        return random.sample(new_ids, min(k, len(new_ids)))
+    
+    @staticmethod
+    def _practiced_ids(db: Session, user: User, lesson_id: int) -> set[int]:
+        """Practiced ids in the lesson: index-only range read on ix_user_progress_user_lesson_due."""
+        return set(db.execute(
+            select(UserProgress.sentence_id).where(
+                UserProgress.user_id == user.id,
+                UserProgress.lesson_id == lesson_id,
+            )
+        ).scalars())
+    
+    @staticmethod
+    def _due(db: Session, user: User, lesson_id: int, now: datetime, limit: int) -> list[int]:
+        """Most overdue sentences in the lesson: a seek on ix_user_progress_user_lesson_due."""
+        return list(db.execute(
+            select(UserProgress.sentence_id)
+            .where(
+                UserProgress.user_id == user.id,
+                UserProgress.lesson_id == lesson_id,
+                UserProgress.due_at <= now,
             )
-            db.add(progress)
+            .order_by(UserProgress.due_at)
+            .limit(limit)
+        ).scalars())
+    
+    @staticmethod
+    def _practice_ahead(db: Session, user: User, lesson_id: int, since: datetime, limit: int) -> list[int]:
+        """
+        Practiced sentences in due order, for practicing ahead of schedule.
+        Those last practiced after `since` go last: the recent window of
+        this process misses practices recorded by other workers.
+        """
+        return list(db.execute(
+            select(UserProgress.sentence_id)
+            .where(UserProgress.user_id == user.id, UserProgress.lesson_id == lesson_id)
+            .order_by(UserProgress.last_practiced_at >= since, UserProgress.due_at)
+            .limit(limit)
+        ).scalars())
+    
+    @staticmethod
+    def record_practice(db: Session, user: User, sentence_id: int, grade: int = srs.DEFAULT_GRADE):
+        """Record that user practiced a sentence and reschedule its next review."""
+        recent_practice.add(user.id, [sentence_id])
+        if settings.practice_write_behind:
+            practice_buffer.add(user.id, sentence_id, grade)
+            return
+        
+        srs.record_review(db, user.id, sentence_id, grade)
+        db.commit()
+    
+    @staticmethod
+    def record_practice_batch(db: Session, user: User, reviews: list[srs.Review]) -> int:
+        """
+        Record many practices (e.g. an offline sync) with one upsert.
+        Returns the number of distinct sentences written.
+        """
+        now = datetime.utcnow()
+        merged: dict[int, srs.Review] = {}
+        for review in reviews:
+            practiced_at = review.practiced_at or now
+            if practiced_at.tzinfo is not None:
+                practiced_at = practiced_at.astimezone(timezone.utc).replace(tzinfo=None)
+            # Clamp client clock skew so nothing is scheduled from the future
+            review = review._replace(user_id=user.id, practiced_at=min(practiced_at, now))
+            queued = merged.get(review.sentence_id)
+            merged[review.sentence_id] = srs.merge(queued, review) if queued else review
         
+        srs.record_reviews(db, list(merged.values()))
         db.commit()
+        for review in merged.values():
+            at = review.practiced_at.replace(tzinfo=timezone.utc).timestamp()
+            recent_practice.add(user.id, [review.sentence_id], at)
+        return len(merged)
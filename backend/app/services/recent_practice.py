@@ -0,0 +1,122 @@
+"""
+Recently practiced sentences, per user.
+
+Smart selection pushes sentences practiced in the last few minutes to the
+back of the queue. `record_practice` notes every practice here, so the
+check needs neither a database round trip nor a NOT IN list.
+
+The default backend is a per-process ring buffer per user: it forgets on
+restart and is not shared between workers. Practices recorded by other
+workers still reach selection through `user_progress.last_practiced_at`
+(see `PracticeService._practice_ahead`), once written. Set
+`RECENT_PRACTICE_BACKEND=redis` (with the `redis` package installed) to
+share one window, unflushed write-behind practices included, between all
+workers.
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Iterable, Optional
+
+from app.config import settings
+
+
+class InMemoryRecentPractice:
+    """A bounded ring buffer of (timestamp, sentence_id) per user, users evicted LRU."""
+
+    def __init__(self, capacity: Optional[int] = None, max_users: Optional[int] = None):
+        self.capacity = capacity or settings.recent_practice_capacity
+        self.max_users = max_users or settings.recent_practice_max_users
+        self._lock = threading.Lock()
+        self._rings: OrderedDict[str, deque] = OrderedDict()
+
+    def add(self, user_id, sentence_ids: Iterable[int], at: Optional[float] = None) -> None:
+        at = time.time() if at is None else at
+        key = str(user_id)
+        with self._lock:
+            ring = self._rings.get(key)
+            if ring is None:
+                ring = self._rings[key] = deque(maxlen=self.capacity)
+                if len(self._rings) > self.max_users:
+                    self._rings.popitem(last=False)
+            else:
+                self._rings.move_to_end(key)
+            ring.extend((at, sentence_id) for sentence_id in sentence_ids)
+
+    def recent(self, user_id, window_seconds: float) -> set[int]:
+        since = time.time() - window_seconds
+        with self._lock:
+            ring = self._rings.get(str(user_id))
+            if not ring:
+                return set()
+            return {sentence_id for at, sentence_id in ring if at >= since}
+
+    def oldest_first(self, user_id, window_seconds: float) -> list[int]:
+        """The window's sentences, least recently practiced first."""
+        since = time.time() - window_seconds
+        with self._lock:
+            last = {}
+            for at, sentence_id in self._rings.get(str(user_id), ()):
+                if at >= since:
+                    last[sentence_id] = max(at, last.get(sentence_id, at))
+        return sorted(last, key=last.get)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._rings.clear()
+
+
+class RedisRecentPractice:
+    """The same window in a Redis sorted set per user (score = timestamp)."""
+
+    def __init__(self, client, capacity: Optional[int] = None, key_ttl_seconds: Optional[int] = None):
+        self.client = client
+        self.capacity = capacity or settings.recent_practice_capacity
+        self.key_ttl_seconds = key_ttl_seconds or int(settings.recent_practice_max_window_seconds)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisRecentPractice":
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RECENT_PRACTICE_BACKEND=redis needs the 'redis' package")
+        return cls(redis.Redis.from_url(url))
+
+    @staticmethod
+    def _key(user_id) -> str:
+        return f"recent_practice:{user_id}"
+
+    def add(self, user_id, sentence_ids: Iterable[int], at: Optional[float] = None) -> None:
+        at = time.time() if at is None else at
+        mapping = {str(sentence_id): at for sentence_id in sentence_ids}
+        if not mapping:
+            return
+        key = self._key(user_id)
+        pipe = self.client.pipeline()
+        pipe.zadd(key, mapping)
+        pipe.zremrangebyrank(key, 0, -self.capacity - 1)  # keep the newest `capacity`
+        pipe.expire(key, self.key_ttl_seconds)
+        pipe.execute()
+
+    def recent(self, user_id, window_seconds: float) -> set[int]:
+        members = self.client.zrangebyscore(self._key(user_id), time.time() - window_seconds, "+inf")
+        return {int(member) for member in members}
+
+    def oldest_first(self, user_id, window_seconds: float) -> list[int]:
+        """The window's sentences, least recently practiced first."""
+        # Sorted sets are ordered by score: the last practice of each sentence
+        members = self.client.zrangebyscore(self._key(user_id), time.time() - window_seconds, "+inf")
+        return [int(member) for member in members]
+
+    def clear(self) -> None:
+        for key in self.client.scan_iter("recent_practice:*"):
+            self.client.delete(key)
+
+
+def create_recent_practice():
+    if settings.recent_practice_backend == "redis":
+        return RedisRecentPractice.from_url(settings.recent_practice_redis_url)
+    return InMemoryRecentPractice()
+
+
+recent_practice = create_recent_practice()
@@ -0,0 +1,150 @@
+"""
+SM-2 spaced-repetition schedule.
+
+The schedule lives on UserProgress (`due_at`, `interval_days`,
+`ease_factor`, `repetitions`). Recording practices is a multi-row
+INSERT ... ON CONFLICT DO NOTHING RETURNING for first practices, then an
+INSERT ... ON CONFLICT DO UPDATE for the rest whose SET clause computes
+the next interval and ease from the row's current values, so no prior
+SELECT is needed.
+"""
+from datetime import datetime, timedelta
+from typing import Any, NamedTuple, Optional
+
+from sqlalchemy import Integer, case, cast, func
+from sqlalchemy.orm import Session
+
+from app.core.sql import add_days, upsert
+from app.models.progress import UserProgress
+from app.services import lesson_progress
+
+MIN_GRADE = 0
+MAX_GRADE = 5
+PASSING_GRADE = 3
+DEFAULT_GRADE = 4  # "correct after hesitation": keeps the ease unchanged
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+
+# Keeps multi-row upserts under SQLite's bound-parameter limit
+MAX_ROWS_PER_STATEMENT = 500
+
+
+def ease_delta(grade: int) -> float:
+    """SM-2 ease adjustment for a 0-5 grade."""
+    miss = MAX_GRADE - grade
+    return 0.1 - miss * (0.08 + miss * 0.02)
+
+
+class Review(NamedTuple):
+    """One or more practices of a sentence to apply to the schedule."""
+    user_id: Any
+    sentence_id: int
+    grade: int = DEFAULT_GRADE
+    practiced_at: Optional[datetime] = None
+    count: int = 1
+
+
+def merge(queued: Review, review: Review) -> Review:
+    """
+    Fold two reviews of the same sentence into one row: counts add up,
+    the latest time wins and the lowest grade is kept.
+    """
+    return queued._replace(
+        grade=min(queued.grade, review.grade),
+        practiced_at=max(queued.practiced_at, review.practiced_at),
+        count=queued.count + review.count,
+    )
+
+
+def _first_schedule(review: Review, lesson_id: Optional[int], now: datetime) -> dict:
+    """Row for a sentence practiced for the first time."""
+    practiced_at = review.practiced_at or now
+    return {
+        "user_id": review.user_id,
+        "sentence_id": review.sentence_id,
+        "lesson_id": lesson_id,
+        "practiced_count": review.count,
+        "last_practiced_at": practiced_at,
+        "repetitions": 1 if review.grade >= PASSING_GRADE else 0,
+        "interval_days": 1,
+        # Never clamped: the worst grade gives 2.5 - 0.8. The conflict
+        # branch relies on this to recover the grade's ease delta.
+        "ease_factor": DEFAULT_EASE + ease_delta(review.grade),
+        "due_at": practiced_at + timedelta(days=1),
+    }
+
+
+def _next_schedule(stmt) -> dict:
+    """
+    SET clause moving an existing row's schedule forward by one review.
+
+    The grade is read back from the proposed (`excluded`) row: its
+    repetitions is 1 for a passing grade, and its ease is the default
+    plus the grade's delta.
+    """
+    table = UserProgress.__table__.c
+    proposed = stmt.excluded
+    passed = proposed.repetitions == 1
+    # Replayed offline practice may be older than what is stored
+    last_practiced_at = case(
+        (proposed.last_practiced_at > table.last_practiced_at, proposed.last_practiced_at),
+        else_=table.last_practiced_at,
+    )
+    raw_ease = table.ease_factor + (proposed.ease_factor - DEFAULT_EASE)
+    ease = case((raw_ease < MIN_EASE, MIN_EASE), else_=raw_ease)
+    interval = case(
+        (~passed, 1),
+        (table.repetitions == 0, 1),
+        (table.repetitions == 1, 6),
+        else_=cast(func.round(table.interval_days * ease), Integer),
+    )
+
+    return {
+        "practiced_count": table.practiced_count + proposed.practiced_count,
+        "last_practiced_at": last_practiced_at,
+        "repetitions": case((passed, table.repetitions + 1), else_=0),
+        "interval_days": interval,
+        "ease_factor": ease,
+        "due_at": add_days(last_practiced_at, interval),
+        "updated_at": func.now(),
+    }
+
+
+def record_reviews(db: Session, reviews: list[Review]) -> None:
+    """
+    Upsert and reschedule many reviews with two multi-row statements per
+    chunk, and add them to the per-lesson rollup. Each (user_id,
+    sentence_id) may appear at most once.
+    """
+    now = datetime.utcnow()
+    table = UserProgress.__table__
+    key = [table.c.user_id, table.c.sentence_id]
+
+    for start in range(0, len(reviews), MAX_ROWS_PER_STATEMENT):
+        chunk = [
+            r if r.practiced_at else r._replace(practiced_at=now)
+            for r in reviews[start:start + MAX_ROWS_PER_STATEMENT]
+        ]
+        lesson_of = lesson_progress.lessons_of(db, {r.sentence_id for r in chunk})
+        rows = [_first_schedule(r, lesson_of.get(r.sentence_id), now) for r in chunk]
+
+        # The rows this inserts are the first practices. A concurrent
+        # first practice of the same sentence waits on uix_user_sentence
+        # and then skips the row, so only one of them counts it as new.
+        inserted = {
+            (str(user_id), sentence_id)
+            for user_id, sentence_id in db.execute(
+                upsert(db, table).values(rows).on_conflict_do_nothing(index_elements=key).returning(*key)
+            )
+        }
+        repeats = [row for row in rows if (str(row["user_id"]), row["sentence_id"]) not in inserted]
+        if repeats:
+            stmt = upsert(db, table).values(repeats)
+            stmt = stmt.on_conflict_do_update(index_elements=key, set_=_next_schedule(stmt))
+            db.execute(stmt)
+        lesson_progress.record(db, chunk, lesson_of, inserted)
+
+
+def record_review(db: Session, user_id, sentence_id: int, grade: int = DEFAULT_GRADE, now: datetime = None):
+    """Upsert one practice of `sentence_id` and reschedule it, in one statement."""
+    record_reviews(db, [Review(user_id, sentence_id, grade, now)])
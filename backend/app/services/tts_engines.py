@@ -0,0 +1,163 @@
+"""
+TTS engine registry.
+
+Engines are looked up by the `tts_engine` setting and created once per
+process, so anything expensive (starting a speech driver, listing its
+voices) happens on first use rather than on every synthesis.
+
+- `gtts`: Google Translate TTS over the network, MP3
+- `pyttsx3`: the platform's offline speech driver, WAV
+- `synthetic`: silent MP3 whose length follows the text; deterministic
+  and network-free, for load tests and benchmarks
+
+Engines that produce their output progressively (`streams`) also yield
+it chunk by chunk, so a first listener can start playing before the
+synthesis ends.
+"""
+import threading
+import time
+from typing import Iterator, Optional
+
+from gtts import gTTS
+
+try:
+    import pyttsx3
+    PYTTSX3_AVAILABLE = True
+except ImportError:
+    PYTTSX3_AVAILABLE = False
+
+from app.config import settings
+from app.core.exceptions import BadRequestException
+from app.services import mp3
+
+
+class TTSEngine:
+    """Writes speech for a text to a file. One instance serves every thread."""
+    name: str
+    extension: str
+    streams = False
+
+    def synthesize(self, text: str, language: str, voice: str, file_path: str) -> None:
+        raise NotImplementedError
+
+    def stream(self, text: str, language: str, voice: str) -> Iterator[bytes]:
+        """The same audio `synthesize` writes, as it is produced. Only if `streams`."""
+        raise NotImplementedError
+
+
+ENGINES: dict[str, type[TTSEngine]] = {}
+
+
+def register(engine: type[TTSEngine]) -> type[TTSEngine]:
+    ENGINES[engine.name] = engine
+    return engine
+
+
+_instances: dict[str, TTSEngine] = {}
+_instances_lock = threading.Lock()
+
+
+def get_engine(name: Optional[str] = None) -> TTSEngine:
+    """The process-wide instance of engine `name` (default: the `tts_engine` setting)."""
+    name = name or settings.tts_engine
+    engine = _instances.get(name)
+    if engine is not None:
+        return engine
+    if name not in ENGINES:
+        raise ValueError(f"Unknown TTS engine: {name}")
+    with _instances_lock:
+        return _instances.setdefault(name, ENGINES[name]())
+
+
+@register
+class GTTSEngine(TTSEngine):
+    name = "gtts"
+    extension = "mp3"
+    streams = True
+
+    def _tts(self, text: str, language: str, voice: str) -> gTTS:
+        # The voice setting picks the accent (Google domain), e.g. "com.au"
+        options = {"tld": voice} if voice else {}
+        return gTTS(text=text, lang=language, slow=False, **options)
+
+    def synthesize(self, text: str, language: str, voice: str, file_path: str) -> None:
+        self._tts(text, language, voice).save(file_path)
+
+    def stream(self, text: str, language: str, voice: str) -> Iterator[bytes]:
+        # One chunk per request gTTS makes (the text is split at ~100 characters)
+        yield from self._tts(text, language, voice).stream()
+
+
+@register
+class Pyttsx3Engine(TTSEngine):
+    """
+    pyttsx3 hands out one driver per process (`pyttsx3.init()` returns the
+    same instance while it is alive) and its event loop is not reentrant,
+    so the driver is initialized once and syntheses take turns on it.
+    """
+    name = "pyttsx3"
+    extension = "wav"
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._driver = None
+        self._voices: dict[tuple[str, str], Optional[str]] = {}
+
+    def _resolve_voice(self, language: str, voice: str) -> Optional[str]:
+        """Voice id for a language (or a configured voice id/name), looked up once."""
+        if (language, voice) not in self._voices:
+            voices = self._driver.getProperty('voices')
+            if voice:
+                match = next((v.id for v in voices if voice in (v.id, v.name)), None)
+            elif language == "vi":
+                match = next((v.id for v in voices if "vietnamese" in v.name.lower()), None)
+            else:
+                # Default to first English voice
+                match = voices[0].id if voices else None
+            self._voices[(language, voice)] = match
+        return self._voices[(language, voice)]
+
+    def synthesize(self, text: str, language: str, voice: str, file_path: str) -> None:
+        if not PYTTSX3_AVAILABLE:
+            raise BadRequestException("pyttsx3 not available, install it with: pip install pyttsx3")
+
+        with self._lock:
+            if self._driver is None:
+                self._driver = pyttsx3.init()
+            try:
+                voice_id = self._resolve_voice(language, voice)
+                if voice_id:
+                    self._driver.setProperty('voice', voice_id)
+                self._driver.save_to_file(text, file_path)
+                self._driver.runAndWait()
+            except Exception:
+                # Start over with a fresh driver rather than reuse a wedged one
+                self._driver = None
+                self._voices.clear()
+                raise
+
+
+@register
+class SyntheticEngine(TTSEngine):
+    """
+    Silence, `tts_synthetic_seconds_per_char` long per character, in the
+    same MP3 format gTTS produces. Sleeps `tts_synthetic_latency_seconds`
+    first to stand in for the network round trip, and streams it in
+    one-second chunks.
+    """
+    name = "synthetic"
+    extension = "mp3"
+    streams = True
+
+    def synthesize(self, text: str, language: str, voice: str, file_path: str) -> None:
+        with open(file_path, "wb") as f:
+            for chunk in self.stream(text, language, voice):
+                f.write(chunk)
+
+    def stream(self, text: str, language: str, voice: str) -> Iterator[bytes]:
+        if settings.tts_synthetic_latency_seconds > 0:
+            time.sleep(settings.tts_synthetic_latency_seconds)
+        data = mp3.silence(len(text) * settings.tts_synthetic_seconds_per_char)
+        step = len(mp3.silence(1.0))
+        for start in range(0, len(data), step):
+            yield data[start:start + step]
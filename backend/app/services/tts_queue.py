@@ -0,0 +1,258 @@
+"""
+Persistent audio pre-generation queue.
+
+When `settings.tts_pregenerate` is on, sentence creates and text edits
+enqueue one `tts_jobs` row per (sentence, language) in the same
+transaction as the change, so audio is usually on disk before anyone
+asks for it. Admins can warm a lesson, or every active lesson, the same
+way. With it off nothing is queued, since nothing would run the jobs.
+
+`tts_pregenerate_workers` threads (0 to only queue, for processes that
+leave the work to others) claim pending jobs with a conditional UPDATE,
+so several processes can share the table, and synthesize through
+`audio_synthesizer`. They share its single-flight dedup and thread pool
+with GET /audio, and hold at most `tts_pregenerate_workers` of its
+slots, leaving the rest for on-demand requests. A claim is a lease:
+a job still running `tts_job_lease_seconds` after it was claimed
+belongs to a process that died, and is claimed again by any worker, so
+jobs survive restarts without one process resetting another's. A failed
+job is retried after `tts_job_retry_seconds`, doubled on each further
+attempt.
+"""
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import and_, func, literal, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.database import SessionLocal
+from app.core.exceptions import ServiceUnavailableException
+from app.core.metrics import metrics
+from app.core.sql import upsert
+from app.models.lesson import Lesson
+from app.models.sentence import Sentence
+from app.models.tts_job import TTSJob
+from app.services import audio_cache
+from app.services.audio_synthesizer import audio_synthesizer
+from app.services.tts_service import TTSService
+
+LANGUAGES = ("vi", "en")
+STATUSES = ("pending", "running", "done", "failed")
+
+
+def _requeue(db: Session, stmt) -> None:
+    """Finish an INSERT into tts_jobs: existing jobs go back to pending."""
+    table = TTSJob.__table__
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.sentence_id, table.c.language],
+        set_={"status": "pending", "attempts": 0, "error": None, "not_before": None, "updated_at": func.now()},
+    ))
+
+
+def enqueue(db: Session, sentence_ids: Iterable[int], languages: Iterable[str] = LANGUAGES) -> int:
+    """
+    Queue audio for `sentence_ids` in `languages`. Jobs that already
+    exist are reset to pending, so edits re-synthesize. The caller
+    commits. Returns the number of jobs queued (none while pre-generation
+    is off).
+    """
+    if not settings.tts_pregenerate:
+        return 0
+    rows = [
+        {"sentence_id": sentence_id, "language": language}
+        for sentence_id in dict.fromkeys(sentence_ids)
+        for language in languages
+    ]
+    if rows:
+        _requeue(db, upsert(db, TTSJob.__table__).values(rows))
+        tts_queue.notify()
+    return len(rows)
+
+
+def enqueue_lessons(db: Session, lesson_id: Optional[int] = None) -> int:
+    """
+    Queue audio for every sentence of a lesson, or of all active lessons
+    when `lesson_id` is None, with one INSERT ... SELECT per language.
+    The caller commits. Returns the number of jobs queued (none while
+    pre-generation is off).
+    """
+    if not settings.tts_pregenerate:
+        return 0
+    sentences = select(Sentence.id)
+    if lesson_id is not None:
+        sentences = sentences.where(Sentence.lesson_id == lesson_id)
+    else:
+        sentences = sentences.join(Lesson, Lesson.id == Sentence.lesson_id).where(Lesson.is_active.is_(True))
+
+    for language in LANGUAGES:
+        _requeue(db, upsert(db, TTSJob.__table__).from_select(
+            ["sentence_id", "language"],
+            sentences.add_columns(literal(language)),
+        ))
+    tts_queue.notify()
+    return db.scalar(select(func.count()).select_from(sentences.subquery())) * len(LANGUAGES)
+
+
+def status(db: Session, lesson_id: Optional[int] = None) -> dict[str, int]:
+    """Job counts by status (and in total), for one lesson or all of them."""
+    stmt = select(TTSJob.status, func.count()).group_by(TTSJob.status)
+    if lesson_id is not None:
+        stmt = stmt.join(Sentence, Sentence.id == TTSJob.sentence_id).where(Sentence.lesson_id == lesson_id)
+    counts = dict.fromkeys(STATUSES, 0)
+    counts.update(db.execute(stmt).all())
+    counts["total"] = sum(counts.values())
+    return counts
+
+
+class TTSJobQueue:
+    """Background workers draining `tts_jobs`."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        workers: Optional[int] = None,
+        max_attempts: Optional[int] = None,
+        poll_interval: Optional[float] = None,
+        retry_seconds: Optional[float] = None,
+        lease_seconds: Optional[float] = None,
+    ):
+        self.session_factory = session_factory
+        self.workers = settings.tts_pregenerate_workers if workers is None else workers
+        self.max_attempts = max_attempts or settings.tts_job_max_attempts
+        self.poll_interval = poll_interval or settings.tts_job_poll_seconds
+        self.retry_seconds = settings.tts_job_retry_seconds if retry_seconds is None else retry_seconds
+        self.lease_seconds = lease_seconds or settings.tts_job_lease_seconds
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def notify(self) -> None:
+        """Wake idle workers: new jobs were queued."""
+        self._wake.set()
+
+    def _claim(self, db: Session) -> Optional[TTSJob]:
+        """
+        Take the oldest pending job whose retry delay is over, or running
+        job whose lease ran out, or None when there is none.
+        """
+        while True:
+            now = datetime.utcnow()
+            claimable = or_(
+                and_(TTSJob.status == "pending", or_(TTSJob.not_before.is_(None), TTSJob.not_before <= now)),
+                and_(TTSJob.status == "running", TTSJob.updated_at <= now - timedelta(seconds=self.lease_seconds)),
+            )
+            job = db.execute(
+                select(TTSJob).where(claimable).order_by(TTSJob.id).limit(1)
+            ).scalar_one_or_none()
+            if job is None:
+                return None
+            # The lease runs from updated_at, set on the same clock it is checked against
+            claimed = db.execute(
+                update(TTSJob)
+                .where(TTSJob.id == job.id, claimable)
+                .values(status="running", attempts=TTSJob.attempts + 1, updated_at=now)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.commit()
+            if claimed:
+                db.refresh(job)
+                return job
+            # Another worker took it first
+
+    def _finish(self, db: Session, job: TTSJob, **values) -> bool:
+        """Close a running job. False if it was re-queued (e.g. by an edit) meanwhile."""
+        finished = db.execute(
+            update(TTSJob)
+            .where(TTSJob.id == job.id, TTSJob.status == "running")
+            .values(updated_at=func.now(), **values)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not finished:
+            db.rollback()
+            return False
+        db.commit()
+        return True
+
+    def run_once(self) -> bool:
+        """Process one pending job. Returns False when there was none."""
+        db = self.session_factory()
+        try:
+            job = self._claim(db)
+            if job is None:
+                return False
+            self._process(db, job)
+            return True
+        finally:
+            db.close()
+
+    def _process(self, db: Session, job: TTSJob) -> None:
+        sentence = db.get(Sentence, job.sentence_id)
+        if sentence is None:
+            db.delete(job)
+            db.commit()
+            return
+
+        text = sentence.vi_text if job.language == "vi" else sentence.en_text
+        tts = TTSService()
+        key = tts.audio_key(text, job.language)
+        path = tts.get_audio_path(key)
+        try:
+            if not os.path.exists(path):  # another sentence may share the phrase
+                path = audio_synthesizer.submit(key, job.language, text).result()
+        except ServiceUnavailableException:
+            # On-demand requests filled the synthesizer: give the slot back
+            self._finish(db, job, status="pending", attempts=TTSJob.attempts - 1)
+            metrics.incr("tts_queue.deferred")
+            self._stop.wait(self.poll_interval)
+            return
+        except Exception as e:
+            failed = job.attempts >= self.max_attempts
+            retry_at = datetime.utcnow() + timedelta(seconds=self.retry_seconds * 2 ** (job.attempts - 1))
+            self._finish(
+                db, job, status="failed" if failed else "pending", error=str(e)[:1000], not_before=retry_at
+            )
+            metrics.incr("tts_queue.failed" if failed else "tts_queue.retried")
+            print(f"⚠️  Audio job {job.sentence_id}/{job.language} failed ({e})")
+            return
+
+        # Recorded only if the job was not re-queued (text edited) meanwhile;
+        # the re-run records the new text's audio
+        audio_cache.record(db, sentence.id, job.language, key, path)
+        if self._finish(db, job, status="done", error=None):
+            metrics.incr("tts_queue.done")
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                print(f"❌ Audio job error: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def start(self) -> None:
+        """Start the workers. Jobs orphaned by a dead process are claimed once their lease runs out."""
+        if not self.workers or any(thread.is_alive() for thread in self._threads):
+            return
+        self._stop.clear()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"tts-pregenerate-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        """Stop the workers; unfinished jobs stay queued for the next start."""
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+
+tts_queue = TTSJobQueue()
@@ -1,85 +1,222 @@
+import glob
+import hashlib
 import os
+import time
+import unicodedata
+import uuid
 from pathlib import Path
-from gtts import gTTS
-
-try:
-    import pyttsx3
-    PYTTSX3_AVAILABLE = True
-except ImportError:
-    PYTTSX3_AVAILABLE = False
+from typing import Callable, Optional
 
 from app.config import settings
 from app.core.exceptions import BadRequestException
+from app.core.metrics import metrics
+from app.services import audio_chunks
+from app.services.audio_storage import get_audio_storage
+from app.services.tts_engines import get_engine
+
+# Bump to re-synthesize everything (e.g. after changing how audio is produced)
+AUDIO_KEY_VERSION = "1"
+
+
+class StoredObjects:
+    """
+    Shared copies this process knows exist (uploaded, fetched or checked).
+    Another node may delete them, so a confirmation is trusted only for
+    `ttl_seconds`, kept below audio_evict_min_idle_seconds.
+    """
+    
+    def __init__(self, ttl_seconds: float = 60.0, capacity: int = 4096):
+        self.ttl_seconds = ttl_seconds
+        self.capacity = capacity
+        self._confirmed: dict[str, float] = {}  # object name -> when
+    
+    def __contains__(self, name: str) -> bool:
+        confirmed = self._confirmed.get(name)
+        return confirmed is not None and time.monotonic() - confirmed < self.ttl_seconds
+    
+    def add(self, name: str) -> None:
+        now = time.monotonic()
+        if len(self._confirmed) >= self.capacity:
+            for stale in [n for n, at in list(self._confirmed.items()) if now - at >= self.ttl_seconds]:
+                self._confirmed.pop(stale, None)
+            if len(self._confirmed) >= self.capacity:
+                self._confirmed.clear()
+        self._confirmed[name] = now
+    
+    def discard_prefix(self, prefix: str) -> None:
+        for name in [name for name in list(self._confirmed) if name.startswith(prefix)]:
+            self._confirmed.pop(name, None)
+    
+    def clear(self) -> None:
+        self._confirmed.clear()
+
+
+stored_objects = StoredObjects()
+
+
+def normalize_text(text: str) -> str:
+    """Text as it is synthesized: NFC, whitespace collapsed."""
+    return " ".join(unicodedata.normalize("NFC", text).split())
+
+
+def audio_key(text: str, language: str, engine: str = None, voice: str = None) -> str:
+    """
+    Content key of the audio for `text`: identical phrases share one
+    file, and any change to the text, language, engine or voice
+    yields a new key.
+    """
+    engine = engine or settings.tts_engine
+    voice = settings.tts_voice if voice is None else voice
+    parts = (AUDIO_KEY_VERSION, engine, voice, language, normalize_text(text))
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def audio_url(sentence_id: int, language: str, text: str) -> str:
+    """Versioned audio URL: it changes with the audio, so clients may cache it forever."""
+    return f"{settings.api_v1_prefix}/audio/{sentence_id}/{language}?v={audio_key(text, language)}"
 
 
 class TTSService:
-    def __init__(self, audio_dir: str = None, engine: str = None):
+    def __init__(self, audio_dir: str = None, engine: str = None, voice: str = None, storage=None):
         self.audio_dir = audio_dir or settings.audio_dir
         self.engine = engine or settings.tts_engine
+        self.voice = settings.tts_voice if voice is None else voice
+        # Shared store behind audio_dir (see audio_storage)
+        self.storage = storage or get_audio_storage()
         
         # Create audio directory if not exists
         Path(self.audio_dir).mkdir(parents=True, exist_ok=True)
     
-    def get_audio_path(self, sentence_id: int, language: str) -> str:
-        """Get audio file path for sentence and language."""
-        extension = "mp3" if self.engine == "gtts" else "wav"
-        return os.path.join(self.audio_dir, f"{sentence_id}_{language}.{extension}")
+    @property
+    def extension(self) -> str:
+        return get_engine(self.engine).extension
+    
+    @property
+    def streams(self) -> bool:
+        return get_engine(self.engine).streams
     
-    def generate_audio(self, text: str, language: str, sentence_id: int) -> str:
-        """Generate audio file for text."""
-        file_path = self.get_audio_path(sentence_id, language)
+    @property
+    def media_type(self) -> str:
+        return "audio/mpeg" if self.extension == "mp3" else "audio/wav"
+    
+    def audio_key(self, text: str, language: str) -> str:
+        """Content key of the audio for `text` with this service's engine and voice."""
+        return audio_key(text, language, self.engine, self.voice)
+    
+    def get_audio_path(self, key: str) -> str:
+        """Get audio file path for a content key (sharded by its first two hex digits)."""
+        return os.path.join(self.audio_dir, key[:2], f"{key}.{self.extension}")
+    
+    def storage_name(self, file_path: str) -> str:
+        """Object name in the shared storage of a file under audio_dir."""
+        return os.path.relpath(file_path, self.audio_dir).replace(os.sep, "/")
+    
+    def fetch(self, file_path: str) -> bool:
+        """Make sure a file under audio_dir is present, downloading it from the shared storage if needed."""
+        if os.path.exists(file_path):
+            return True
+        directory, name = os.path.split(file_path)
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        tmp_path = os.path.join(directory, f".tmp-{uuid.uuid4().hex}-{name}")
+        try:
+            if not self.storage.fetch(self.storage_name(file_path), tmp_path):
+                return False
+            os.replace(tmp_path, file_path)
+            metrics.incr("tts.storage.fetches")
+            stored_objects.add(self.storage_name(file_path))
+            return True
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def upload(self, file_path: str, media_type: str) -> None:
+        """Publish a new file under audio_dir to the shared storage. Best effort: the local copy serves regardless."""
+        try:
+            self.storage.put(self.storage_name(file_path), file_path, media_type)
+            metrics.incr("tts.storage.uploads")
+            stored_objects.add(self.storage_name(file_path))
+        except Exception as e:
+            metrics.incr("tts.storage.upload_failures")
+            print(f"⚠️  Uploading {self.storage_name(file_path)} failed: {e}")
+    
+    def stored(self, file_path: str) -> bool:
+        """Whether the shared storage has a copy of a file under audio_dir: confirmed recently, or by asking it."""
+        name = self.storage_name(file_path)
+        if name in stored_objects:
+            return True
+        try:
+            exists = self.storage.exists(name)
+        except Exception as e:
+            print(f"⚠️  Checking {name} in the storage failed: {e}")
+            return False
+        if exists:
+            stored_objects.add(name)
+        return exists
+    
+    def presigned_url(self, file_path: str) -> Optional[str]:
+        """
+        URL of a file's shared copy clients may fetch directly, if the storage
+        offers one and the copy is there (a failed upload leaves only the local file).
+        """
+        url = self.storage.presigned_url(self.storage_name(file_path))
+        if url is None or not self.stored(file_path):
+            return None
+        return url
+    
+    def generate_audio(self, text: str, language: str, on_chunk: Callable[[bytes], None] = None) -> str:
+        """
+        Generate audio file for text (or fetch it, if another node already has).
+        Long text is assembled from cached clauses (see audio_chunks).
+        With a streaming engine, `on_chunk` gets each piece of the new audio as it is written.
+        """
+        file_path = self.get_audio_path(self.audio_key(text, language))
         
         # Skip if already exists
-        if os.path.exists(file_path):
+        if self.fetch(file_path):
             return file_path
         
+        # Write under a temporary name so readers never see a partial file
+        directory, name = os.path.split(file_path)
+        tmp_path = os.path.join(directory, f".tmp-{uuid.uuid4().hex}-{name}")
+        engine = get_engine(self.engine)
         try:
-            if self.engine == "gtts":
-                self._generate_gtts(text, language, file_path)
+            text = normalize_text(text)
+            if audio_chunks.synthesize(self, text, language, tmp_path, on_chunk):
+                pass  # joined from cached clauses
+            elif on_chunk is not None and engine.streams:
+                with open(tmp_path, "wb") as f:
+                    for chunk in engine.stream(text, language, self.voice):
+                        f.write(chunk)
+                        on_chunk(chunk)
             else:
-                self._generate_pyttsx3(text, language, file_path)
-            
+                engine.synthesize(text, language, self.voice, tmp_path)
+            os.replace(tmp_path, file_path)
+            self.upload(file_path, self.media_type)
             return file_path
         except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
             raise BadRequestException(f"Failed to generate audio: {str(e)}")
     
-    def _generate_gtts(self, text: str, language: str, file_path: str):
-        """Generate audio using gTTS."""
-        tts = gTTS(text=text, lang=language, slow=False)
-        tts.save(file_path)
+    def delete_blob(self, key: str):
+        """Delete the audio file for a content key, with its transcoded variants."""
+        self.delete_local(key)
+        prefix = f"{key[:2]}/{key}."
+        stored_objects.discard_prefix(prefix)
+        self.storage.delete_prefix(prefix)
     
-    def _generate_pyttsx3(self, text: str, language: str, file_path: str):
-        """Generate audio using pyttsx3 (offline)."""
-        if not PYTTSX3_AVAILABLE:
-            raise BadRequestException("pyttsx3 not available, install it with: pip install pyttsx3")
-        
-        engine = pyttsx3.init()
-        
-        # Set voice based on language
-        voices = engine.getProperty('voices')
-        if language == "vi":
-            # Try to find Vietnamese voice
-            for voice in voices:
-                if "vietnamese" in voice.name.lower():
-                    engine.setProperty('voice', voice.id)
-                    break
-        else:
-            # Default to first English voice
-            engine.setProperty('voice', voices[0].id)
-        
-        engine.save_to_file(text, file_path)
-        engine.runAndWait()
-    
-    def delete_audio(self, sentence_id: int, language: str = None):
-        """Delete audio file(s) for sentence."""
-        if language:
-            file_path = self.get_audio_path(sentence_id, language)
-            if os.path.exists(file_path):
-                os.remove(file_path)
-        else:
-            # Delete both languages
-            for lang in ["vi", "en"]:
-                self.delete_audio(sentence_id, lang)
+    def delete_local(self, key: str) -> int:
+        """Delete this node's copy of a content key's audio and variants, not the shared one. Returns the bytes freed."""
+        file_path = self.get_audio_path(key)
+        directory = glob.escape(os.path.dirname(file_path))
+        freed = 0
+        for path in [file_path, *glob.glob(os.path.join(directory, f"{key}.*.*"))]:
+            try:
+                freed += os.path.getsize(path)
+                os.remove(path)
+            except FileNotFoundError:
+                pass  # not here, or another worker got to it first
+        return freed
     
     def get_file_size(self, file_path: str) -> int:
         """Get file size in bytes."""
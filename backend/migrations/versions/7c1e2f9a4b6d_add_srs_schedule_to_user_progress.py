@@ -0,0 +1,37 @@
+"""Add SM-2 schedule to user_progress
+
+Revision ID: 7c1e2f9a4b6d
+Revises: 4a3a48417bdb
+Create Date: 2026-10-16 09:12:40.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1e2f9a4b6d'
+down_revision: Union[str, None] = '4a3a48417bdb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user_progress', sa.Column('due_at', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('user_progress', sa.Column('interval_days', sa.Integer(), server_default='1', nullable=False))
+    op.add_column('user_progress', sa.Column('ease_factor', sa.Float(), server_default='2.5', nullable=False))
+    op.add_column('user_progress', sa.Column('repetitions', sa.Integer(), server_default='1', nullable=False))
+    # Existing history: first review one day after the last practice
+    op.execute("UPDATE user_progress SET due_at = last_practiced_at + INTERVAL '1 day'")
+    op.alter_column('user_progress', 'due_at', nullable=False)
+    op.create_index('ix_user_progress_user_due', 'user_progress', ['user_id', 'due_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_user_progress_user_due', table_name='user_progress')
+    op.drop_column('user_progress', 'repetitions')
+    op.drop_column('user_progress', 'ease_factor')
+    op.drop_column('user_progress', 'interval_days')
+    op.drop_column('user_progress', 'due_at')
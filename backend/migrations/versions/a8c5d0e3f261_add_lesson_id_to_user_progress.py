@@ -0,0 +1,37 @@
+"""Add lesson_id to user_progress
+
+Revision ID: a8c5d0e3f261
+Revises: f3b9c2d7e1a4
+Create Date: 2026-10-17 15:20:44.902376
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c5d0e3f261'
+down_revision: Union[str, None] = 'f3b9c2d7e1a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('user_progress', sa.Column('lesson_id', sa.Integer(), nullable=True))
+    op.execute("UPDATE user_progress up SET lesson_id = s.lesson_id FROM sentences s WHERE s.id = up.sentence_id")
+    op.alter_column('user_progress', 'lesson_id', nullable=False)
+    op.create_foreign_key(
+        'user_progress_lesson_id_fkey', 'user_progress', 'lessons', ['lesson_id'], ['id'], ondelete='CASCADE'
+    )
+    # Per-lesson due queue: supersedes the per-user one
+    op.create_index('ix_user_progress_user_lesson_due', 'user_progress', ['user_id', 'lesson_id', 'due_at'], unique=False)
+    op.drop_index('ix_user_progress_user_due', table_name='user_progress')
+
+
+def downgrade() -> None:
+    op.create_index('ix_user_progress_user_due', 'user_progress', ['user_id', 'due_at'], unique=False)
+    op.drop_index('ix_user_progress_user_lesson_due', table_name='user_progress')
+    op.drop_constraint('user_progress_lesson_id_fkey', 'user_progress', type_='foreignkey')
+    op.drop_column('user_progress', 'lesson_id')
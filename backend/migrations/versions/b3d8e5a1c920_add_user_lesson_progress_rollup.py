@@ -0,0 +1,43 @@
+"""Add user_lesson_progress rollup
+
+Revision ID: b3d8e5a1c920
+Revises: 7c1e2f9a4b6d
+Create Date: 2026-10-16 11:02:17.540961
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3d8e5a1c920'
+down_revision: Union[str, None] = '7c1e2f9a4b6d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('user_lesson_progress',
+    sa.Column('user_id', sa.UUID(), nullable=False),
+    sa.Column('lesson_id', sa.Integer(), nullable=False),
+    sa.Column('practiced_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('total_practice_count', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('last_practiced_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['lesson_id'], ['lessons.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'lesson_id')
+    )
+    # Backfill from existing history (same query as scripts/lesson_progress.py rebuild)
+    op.execute("""
+        INSERT INTO user_lesson_progress (user_id, lesson_id, practiced_count, total_practice_count, last_practiced_at)
+        SELECT up.user_id, s.lesson_id, count(up.id), sum(up.practiced_count), max(up.last_practiced_at)
+        FROM user_progress up JOIN sentences s ON s.id = up.sentence_id
+        GROUP BY up.user_id, s.lesson_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('user_lesson_progress')
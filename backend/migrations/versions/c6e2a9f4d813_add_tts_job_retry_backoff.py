@@ -0,0 +1,26 @@
+"""Add retry backoff to tts_jobs
+
+Revision ID: c6e2a9f4d813
+Revises: a8c5d0e3f261
+Create Date: 2026-10-17 16:05:12.417530
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c6e2a9f4d813'
+down_revision: Union[str, None] = 'a8c5d0e3f261'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tts_jobs', sa.Column('not_before', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('tts_jobs', 'not_before')
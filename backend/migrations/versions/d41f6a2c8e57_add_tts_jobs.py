@@ -0,0 +1,42 @@
+"""Add tts_jobs pre-generation queue
+
+Revision ID: d41f6a2c8e57
+Revises: b3d8e5a1c920
+Create Date: 2026-10-16 14:20:43.118207
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd41f6a2c8e57'
+down_revision: Union[str, None] = 'b3d8e5a1c920'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('tts_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('sentence_id', sa.Integer(), nullable=False),
+    sa.Column('language', sa.String(length=2), nullable=False),
+    sa.Column('status', sa.String(length=16), server_default='pending', nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.ForeignKeyConstraint(['sentence_id'], ['sentences.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('sentence_id', 'language', name='uix_tts_job_sentence_language')
+    )
+    op.create_index(op.f('ix_tts_jobs_id'), 'tts_jobs', ['id'], unique=False)
+    op.create_index('ix_tts_jobs_status_id', 'tts_jobs', ['status', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tts_jobs_status_id', table_name='tts_jobs')
+    op.drop_index(op.f('ix_tts_jobs_id'), table_name='tts_jobs')
+    op.drop_table('tts_jobs')
@@ -0,0 +1,45 @@
+"""Content-addressed audio cache
+
+Revision ID: e7a94c3b15d2
+Revises: d41f6a2c8e57
+Create Date: 2026-10-16 16:05:12.402881
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7a94c3b15d2'
+down_revision: Union[str, None] = 'd41f6a2c8e57'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('audio_blobs',
+    sa.Column('key', sa.String(length=64), nullable=False),
+    sa.Column('language', sa.String(length=2), nullable=False),
+    sa.Column('file_size', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('key')
+    )
+    # Rows for the old `{sentence_id}_{language}` files cannot be mapped to
+    # content keys: drop them, audio is re-created on demand (or warmed) and
+    # scripts/audio_gc.py sweeps the old files
+    op.execute("DELETE FROM audio_files")
+    op.drop_constraint('audio_files_file_path_key', 'audio_files', type_='unique')
+    op.add_column('audio_files', sa.Column('audio_key', sa.String(length=64), nullable=False))
+    op.create_index(op.f('ix_audio_files_audio_key'), 'audio_files', ['audio_key'], unique=False)
+    op.create_foreign_key('audio_files_audio_key_fkey', 'audio_files', 'audio_blobs', ['audio_key'], ['key'], ondelete='CASCADE')
+
+
+def downgrade() -> None:
+    op.execute("DELETE FROM audio_files")
+    op.drop_constraint('audio_files_audio_key_fkey', 'audio_files', type_='foreignkey')
+    op.drop_index(op.f('ix_audio_files_audio_key'), table_name='audio_files')
+    op.drop_column('audio_files', 'audio_key')
+    op.create_unique_constraint('audio_files_file_path_key', 'audio_files', ['file_path'])
+    op.drop_table('audio_blobs')
@@ -0,0 +1,28 @@
+"""Add audio access tracking
+
+Revision ID: f3b9c2d7e1a4
+Revises: e7a94c3b15d2
+Create Date: 2026-10-17 09:41:27.118305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b9c2d7e1a4'
+down_revision: Union[str, None] = 'e7a94c3b15d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('audio_files', sa.Column('hit_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('audio_files', sa.Column('last_served_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('audio_files', 'last_served_at')
+    op.drop_column('audio_files', 'hit_count')
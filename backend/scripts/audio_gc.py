@@ -0,0 +1,55 @@
+"""
+Garbage-collect the audio cache
+
+Deletes audio no sentence plays any more (after edits, deletes or cache
+clears), stray files without a blob record and clause audio of long
+sentences unused for AUDIO_CHUNK_MAX_AGE_DAYS. Audio younger than the
+grace period (AUDIO_GC_GRACE_SECONDS) is kept, so it is safe to run
+while the API is serving. With --evict it then also evicts the least
+recently served clips down to MAX_AUDIO_SIZE_MB, as the API does in the
+background.
+
+Usage:
+    python scripts/audio_gc.py
+    python scripts/audio_gc.py --dry-run
+    python scripts/audio_gc.py --grace-seconds 0
+    python scripts/audio_gc.py --evict
+"""
+import argparse
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services import audio_cache, audio_eviction
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would be deleted")
+    parser.add_argument("--grace-seconds", type=float, help="Keep audio younger than this")
+    parser.add_argument("--evict", action="store_true", help="Then evict clips down to MAX_AUDIO_SIZE_MB")
+    args = parser.parse_args()
+    
+    db = SessionLocal()
+    try:
+        result = audio_cache.collect_garbage(db, grace_seconds=args.grace_seconds, dry_run=args.dry_run)
+        evicted = audio_eviction.evict(db) if args.evict and not args.dry_run else None
+    finally:
+        db.close()
+    
+    verb = "Would free" if args.dry_run else "Freed"
+    print(
+        f"✅ {verb} {result['bytes'] / 1024 / 1024:.1f} MB: "
+        f"{result['blobs']} unreferenced blobs, {result['orphan_files']} orphan files, "
+        f"{result['chunk_files']} unused clause files"
+    )
+    if evicted is not None:
+        print(f"✅ Evicted {evicted['blobs']} clips ({evicted['bytes'] / 1024 / 1024:.1f} MB) to fit the cache budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Audio Serving Benchmark
+
+Measures /audio on cache hits, where every clip is already synthesized,
+with the in-process audio index off (each request loads the sentence and
+its audio record) and on (served from memory). Runs against a scratch
+SQLite database with the offline `synthetic` engine.
+
+Usage:
+    python scripts/benchmark_audio.py
+    python scripts/benchmark_audio.py --sentences 500 --requests 5000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+
+from app.config import settings
+from app.core.database import Base, get_db
+from app.main import app
+from app.models.lesson import Lesson
+from app.models.sentence import Sentence
+from app.services.audio_index import audio_index
+
+
+@compiles(UUID, "sqlite")
+def compile_uuid_sqlite(type_, compiler, **kw):
+    """Let the Postgres UUID column render on the SQLite scratch db."""
+    return "CHAR(32)"
+
+
+def seed(session_factory, sentences: int) -> list[int]:
+    db = session_factory()
+    try:
+        lesson = Lesson(title="Benchmark", order_index=1)
+        db.add(lesson)
+        db.flush()
+        rows = [
+            Sentence(lesson_id=lesson.id, vi_text=f"Câu số {i}", en_text=f"Sentence number {i}", order_index=i)
+            for i in range(sentences)
+        ]
+        db.add_all(rows)
+        db.commit()
+        return [row.id for row in rows]
+    finally:
+        db.close()
+
+
+def run(client: TestClient, urls: list[str], statements: list) -> tuple[list[float], int]:
+    timings = []
+    statements.clear()
+    for url in urls:
+        start = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - start) * 1000)
+        assert response.status_code == 200, response.text
+    return sorted(timings), len(statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sentences", type=int, default=200, help="Distinct clips")
+    parser.add_argument("--requests", type=int, default=2000, help="Requests per round")
+    parser.add_argument("--ttl", type=float, default=60.0, help="Index TTL for the indexed round")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        settings.audio_dir = os.path.join(scratch, "audio")
+        settings.tts_engine = "synthetic"
+        settings.tts_synthetic_latency_seconds = 0
+        engine = create_engine(f"sqlite:///{os.path.join(scratch, 'bench.db')}", connect_args={"check_same_thread": False})
+        session_factory = sessionmaker(bind=engine, autoflush=False)
+        Base.metadata.create_all(bind=engine)
+        statements = []
+        event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+
+        def override_get_db():
+            db = session_factory()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        ids = seed(session_factory, args.sentences)
+        urls = [f"/api/v1/audio/{sentence_id}/en" for sentence_id in ids]
+        rounds = [random.choice(urls) for _ in range(args.requests)]
+
+        client = TestClient(app)
+        audio_index.ttl_seconds = 0
+        run(client, urls, statements)  # synthesize and record every clip
+
+        print(f"{'index':>8} {'requests':>9} {'req/s':>10} {'median ms':>10} {'p95 ms':>10} {'SQL/req':>8}")
+        for label, ttl in (("off", 0), ("on", args.ttl)):
+            audio_index.clear()
+            audio_index.ttl_seconds = ttl
+            run(client, urls, statements)  # fill the index
+            start = time.perf_counter()
+            timings, queries = run(client, rounds, statements)
+            elapsed = time.perf_counter() - start
+            p95 = timings[int(len(timings) * 0.95) - 1]
+            print(
+                f"{label:>8} {len(rounds):>9} {len(rounds) / elapsed:>10.1f} "
+                f"{statistics.median(timings):>10.2f} {p95:>10.2f} {queries / len(rounds):>8.1f}"
+            )
+        app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    main()
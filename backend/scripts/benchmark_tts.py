@@ -0,0 +1,85 @@
+"""
+Audio Synthesis Benchmark
+
+Drives the audio path (AudioSynthesizer -> TTSService -> engine -> cache
+file) with the offline `synthetic` engine, so it runs anywhere, CI
+included, without gTTS or the network. Each round requests a batch of
+clips concurrently, with a share of repeated phrases that single-flight
+dedup should absorb, and reports throughput and latency.
+
+--latency stands in for the gTTS round trip: with it, throughput shows
+how well the worker pool overlaps syntheses.
+
+Usage:
+    python scripts/benchmark_tts.py
+    python scripts/benchmark_tts.py --clips 500 --latency 0.2 --workers 4 8 16
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.services.audio_synthesizer import AudioSynthesizer
+from app.services.tts_service import TTSService
+
+
+async def request_all(synthesizer: AudioSynthesizer, texts: list[str]) -> list[float]:
+    tts = TTSService()
+
+    async def request(text: str) -> float:
+        start = time.perf_counter()
+        await synthesizer.get(tts.audio_key(text, "en"), "en", text)
+        return (time.perf_counter() - start) * 1000
+
+    return await asyncio.gather(*(request(text) for text in texts))
+
+
+def run(clips: int, duplicates: float, workers: int) -> None:
+    distinct = max(1, int(clips * (1 - duplicates)))
+    texts = [f"Benchmark sentence number {i % distinct}" for i in range(clips)]
+
+    with tempfile.TemporaryDirectory() as audio_dir:
+        settings.audio_dir = audio_dir
+        metrics.reset()
+        synthesizer = AudioSynthesizer(max_workers=workers, max_pending=clips)
+        try:
+            start = time.perf_counter()
+            timings = sorted(asyncio.run(request_all(synthesizer, texts)))
+            elapsed = time.perf_counter() - start
+        finally:
+            synthesizer.shutdown()
+
+    synthesized = metrics.snapshot()["timers"].get("tts.synthesis", {}).get("count", 0)
+    p95 = timings[int(len(timings) * 0.95) - 1]
+    print(
+        f"{workers:>8} {clips:>6} {synthesized:>12} {clips / elapsed:>10.1f} "
+        f"{statistics.median(timings):>10.2f} {p95:>10.2f}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clips", type=int, default=200, help="Requests per round")
+    parser.add_argument("--duplicates", type=float, default=0.25, help="Share of requests repeating a phrase")
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds each synthesis waits, like a network call")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+
+    settings.tts_engine = "synthetic"
+    settings.tts_synthetic_latency_seconds = args.latency
+
+    print(f"{'workers':>8} {'clips':>6} {'synthesized':>12} {'clips/s':>10} {'median ms':>10} {'p95 ms':>10}")
+    for workers in args.workers:
+        run(args.clips, args.duplicates, workers)
+
+
+if __name__ == "__main__":
+    main()
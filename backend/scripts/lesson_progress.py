@@ -0,0 +1,52 @@
+"""
+Maintain the user_lesson_progress rollup
+
+Usage:
+    python scripts/lesson_progress.py check      # report rows that disagree with user_progress
+    python scripts/lesson_progress.py rebuild    # recompute every row from user_progress
+"""
+import argparse
+import sys
+import os
+
+# Add parent directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.services import lesson_progress
+
+
+def check(db) -> int:
+    drift = lesson_progress.find_drift(db)
+    for row in drift:
+        print(
+            f"❌ user {row['user_id']} lesson {row['lesson_id']}: "
+            f"expected {row['expected']}, found {row['actual']}"
+        )
+    if drift:
+        print(f"⚠️  {len(drift)} rollup rows out of date - run 'rebuild' to fix")
+        return 1
+    print("✅ user_lesson_progress is consistent with user_progress")
+    return 0
+
+
+def rebuild(db) -> int:
+    rows = lesson_progress.rebuild(db)
+    print(f"✅ Rebuilt user_lesson_progress: {rows} rows")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["check", "rebuild"])
+    args = parser.parse_args()
+    
+    db = SessionLocal()
+    try:
+        return check(db) if args.command == "check" else rebuild(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,14 +8,22 @@ from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 from sqlalchemy.types import TypeDecorator, CHAR
 from sqlalchemy.dialects.postgresql import UUID
+import subprocess
 import uuid
 
 from app.main import app
+from app.config import settings
 from app.core.database import Base, get_db
 from app.models.user import User
 from app.models.lesson import Lesson
 from app.models.sentence import Sentence
 from app.core.security import get_password_hash
+from app.core.metrics import metrics
+from app.services.lesson_pool import lesson_pool_index
+from app.services.recent_practice import recent_practice
+from app.services.audio_eviction import audio_access
+from app.services.audio_index import audio_index
+from app.services.tts_service import TTSService, stored_objects
 
 
 # Create in-memory SQLite database for testing
@@ -65,12 +73,46 @@ app.dependency_overrides[get_db] = override_get_db
 def db() -> Session:
     """Create fresh database session for each test"""
     Base.metadata.create_all(bind=engine)
+    lesson_pool_index.invalidate()
+    recent_practice.clear()
+    audio_access.clear()
+    audio_index.clear()
+    metrics.reset()
     session = TestingSessionLocal()
     yield session
     session.close()
     Base.metadata.drop_all(bind=engine)
 
 
+@pytest.fixture
+def pregenerate(monkeypatch):
+    """Turn audio pre-generation on: sentence writes queue tts_jobs"""
+    monkeypatch.setattr(settings, "tts_pregenerate", True)
+
+
+@pytest.fixture
+def audio_dir(tmp_path, monkeypatch):
+    """Cache audio under tmp_path, with the gTTS engine (MP3) unless a test picks another"""
+    monkeypatch.setattr(settings, "audio_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "tts_engine", "gtts")
+    stored_objects.clear()
+    metrics.reset()
+    return tmp_path
+
+
+@pytest.fixture
+def tts(audio_dir) -> TTSService:
+    """A gTTS service caching under tmp_path"""
+    return TTSService(audio_dir=str(audio_dir), engine="gtts", voice="")
+
+
+@pytest.fixture
+def synthetic(audio_dir, monkeypatch) -> TTSService:
+    """The offline engine, caching under tmp_path"""
+    monkeypatch.setattr(settings, "tts_engine", "synthetic")
+    return TTSService(voice="")
+
+
 @pytest.fixture
 def client(db) -> TestClient:
     """Create test client"""
@@ -185,3 +227,24 @@ def test_sentences(db: Session, test_lesson: Lesson) -> list[Sentence]:
     for s in sentences:
         db.refresh(s)
     return sentences
+
+
+def make_mp3(frames: int, fill: int = 0, id3: bool = False, xing: bool = False) -> bytes:
+    """A valid MPEG-2 Layer III stream (24 kHz, 32 kbps, mono: 96-byte, 24 ms frames)"""
+    header = bytes([0xFF, 0xF3, 0x44, 0xC4])
+    frame = header + bytes([fill]) * 92
+    data = frame * frames
+    if xing:
+        data = header + b"\x00" * 13 + b"Xing" + b"\x00" * 75 + data
+    if id3:
+        data = b"ID3\x03\x00\x00\x00\x00\x00\x0a" + b"\x00" * 10 + data
+    return data
+
+
+def fake_ffmpeg(command, **kwargs):
+    """subprocess.run stand-in: 'encodes' the input by prefixing the codec name"""
+    source, output = command[command.index("-i") + 1], command[-1]
+    codec = command[command.index("-c:a") + 1]
+    with open(source, "rb") as f, open(output, "wb") as out:
+        out.write(codec.encode() + f.read())
+    return subprocess.CompletedProcess(command, 0)
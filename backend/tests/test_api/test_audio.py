@@ -1,13 +1,18 @@
 """
 Audio API endpoint tests
 """
+import os
+import time
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import ANY, patch, MagicMock
+from sqlalchemy import event
 from fastapi.testclient import TestClient
 from sqlalchemy.orm import Session
 from app.models.sentence import Sentence
 from app.models.lesson import Lesson
-from app.models.audio_file import AudioFile
+from app.models.audio_file import AudioBlob, AudioFile
+from app.services.audio_index import audio_index
+from tests.conftest import TestingSessionLocal, fake_ffmpeg, make_mp3
 
 
 class TestAudioAPI:
@@ -42,7 +47,7 @@ class TestAudioAPI:
             
             assert response.status_code == 200
             assert mock_generate.called
-            mock_generate.assert_called_with("Xin chào", "vi", sentence.id)
+            mock_generate.assert_called_with("Xin chào", "vi", on_chunk=ANY)
         finally:
             # Cleanup temp file
             os.unlink(temp_file.name)
@@ -73,10 +78,19 @@ class TestAudioAPI:
             response = client.get(f"/api/v1/audio/{sentence.id}/en")
             
             assert response.status_code == 200
-            mock_generate.assert_called_with("Hello", "en", sentence.id)
+            mock_generate.assert_called_with("Hello", "en", on_chunk=ANY)
         finally:
             os.unlink(temp_file.name)
     
+    def test_get_audio_busy(self, client: TestClient, test_sentence: Sentence, monkeypatch):
+        """Test a full generation queue answers 503 with Retry-After"""
+        from app.services.audio_synthesizer import audio_synthesizer
+        monkeypatch.setattr(audio_synthesizer, "max_pending", 0)
+        
+        response = client.get(f"/api/v1/audio/{test_sentence.id}/en")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+    
     def test_get_audio_sentence_not_found(self, client: TestClient):
         """Test getting audio for non-existent sentence"""
         response = client.get("/api/v1/audio/99999/vi")
@@ -140,33 +154,36 @@ class TestAudioAPI:
         finally:
             os.unlink(temp_file.name)
     
-    @patch('app.services.tts_service.TTSService.delete_audio')
+    @patch('app.services.tts_service.TTSService.delete_blob')
     def test_delete_audio_cache(self, mock_delete, client: TestClient, db: Session, test_lesson: Lesson):
-        """Test deleting audio cache"""
+        """Test deleting audio cache removes records and unshared blobs"""
         sentence = Sentence(
             lesson_id=test_lesson.id,
             vi_text="Test",
             en_text="Test",
             order_index=1
         )
-        db.add(sentence)
+        other = Sentence(
+            lesson_id=test_lesson.id,
+            vi_text="Khác",
+            en_text="Test",
+            order_index=2
+        )
+        db.add_all([sentence, other])
         db.commit()
         db.refresh(sentence)
         
-        # Create audio file records
-        audio_vi = AudioFile(
-            sentence_id=sentence.id,
-            language="vi",
-            file_path="/tmp/test_vi.mp3",
-            file_size=1024
-        )
-        audio_en = AudioFile(
-            sentence_id=sentence.id,
-            language="en",
-            file_path="/tmp/test_en.mp3",
-            file_size=2048
-        )
-        db.add_all([audio_vi, audio_en])
+        # Create audio file records; the English blob is shared with another sentence
+        vi_key, en_key = "a" * 64, "b" * 64
+        db.add_all([
+            AudioBlob(key=vi_key, language="vi", file_size=1024),
+            AudioBlob(key=en_key, language="en", file_size=2048),
+        ])
+        db.add_all([
+            AudioFile(sentence_id=sentence.id, language="vi", audio_key=vi_key, file_path="/tmp/test_vi.mp3", file_size=1024),
+            AudioFile(sentence_id=sentence.id, language="en", audio_key=en_key, file_path="/tmp/test_en.mp3", file_size=2048),
+            AudioFile(sentence_id=other.id, language="en", audio_key=en_key, file_path="/tmp/test_en.mp3", file_size=2048),
+        ])
         db.commit()
         
         response = client.delete(f"/api/v1/audio/{sentence.id}")
@@ -175,13 +192,46 @@ class TestAudioAPI:
         data = response.json()
         message = data.get("message", data.get("detail", "")).lower()
         assert "delete" in message or "success" in message
-        mock_delete.assert_called_with(sentence.id)
+        mock_delete.assert_called_once_with(vi_key)
         
         # Check records were deleted
         audio_count = db.query(AudioFile).filter(
             AudioFile.sentence_id == sentence.id
         ).count()
         assert audio_count == 0
+        assert {blob.key for blob in db.query(AudioBlob)} == {en_key}
+    
+    @patch('app.services.tts_service.TTSService.generate_audio')
+    def test_get_audio_shares_identical_text(self, mock_generate, client: TestClient, db: Session, test_lesson: Lesson):
+        """Test sentences with the same phrase share one blob and an edit resolves to a new one"""
+        first = Sentence(lesson_id=test_lesson.id, vi_text="Cảm ơn", en_text="Thank you", order_index=1)
+        second = Sentence(lesson_id=test_lesson.id, vi_text="Cảm  ơn ", en_text="Thanks", order_index=2)
+        db.add_all([first, second])
+        db.commit()
+        
+        import tempfile
+        import os
+        temp_file = tempfile.NamedTemporaryFile(mode='wb', suffix='.mp3', delete=False)
+        temp_file.write(b'fake audio content')
+        temp_file.close()
+        mock_generate.return_value = temp_file.name
+        
+        try:
+            assert client.get(f"/api/v1/audio/{first.id}/vi").status_code == 200
+            assert client.get(f"/api/v1/audio/{second.id}/vi").status_code == 200
+            keys = {a.sentence_id: a.audio_key for a in db.query(AudioFile).populate_existing()}
+            assert keys[first.id] == keys[second.id]
+            assert db.query(AudioBlob).count() == 1
+            
+            second.vi_text = "Cám ơn bạn"
+            db.commit()
+            audio_index.discard(second.id)  # as PUT /sentences does
+            assert client.get(f"/api/v1/audio/{second.id}/vi").status_code == 200
+            keys = {a.sentence_id: a.audio_key for a in db.query(AudioFile).populate_existing()}
+            assert keys[first.id] != keys[second.id]
+            assert db.query(AudioBlob).count() == 2
+        finally:
+            os.unlink(temp_file.name)
     
     def test_delete_audio_cache_sentence_not_found(self, client: TestClient):
         """Test deleting audio cache for non-existent sentence"""
@@ -190,3 +240,602 @@ class TestAudioAPI:
         assert response.status_code == 404
         data = response.json()
         assert "detail" in data or "message" in data
+    
+    def test_warm_lesson(self, client: TestClient, admin_token: str, test_sentences: list[Sentence], pregenerate):
+        """Test warming a lesson queues both languages and reports job status"""
+        lesson_id = test_sentences[0].lesson_id
+        response = client.post(
+            f"/api/v1/audio/warm?lesson_id={lesson_id}",
+            headers={"Authorization": f"Bearer {admin_token}"},
+        )
+        
+        assert response.status_code == 200
+        data = response.json()
+        assert data["lesson_id"] == lesson_id
+        assert data["enqueued"] == 6
+        assert data["jobs"] == {"pending": 6, "running": 0, "done": 0, "failed": 0, "total": 6}
+        
+        status_response = client.get(
+            "/api/v1/audio/warm",
+            headers={"Authorization": f"Bearer {admin_token}"},
+        )
+        assert status_response.status_code == 200
+        assert status_response.json()["pending"] == 6
+    
+    def test_warm_all(self, client: TestClient, admin_token: str, test_sentences: list[Sentence], pregenerate):
+        """Test warming without a lesson covers every active lesson"""
+        response = client.post(
+            "/api/v1/audio/warm",
+            headers={"Authorization": f"Bearer {admin_token}"},
+        )
+        
+        assert response.status_code == 200
+        assert response.json()["lesson_id"] is None
+        assert response.json()["jobs"]["total"] == 6
+    
+    def test_warm_unknown_lesson(self, client: TestClient, admin_token: str, pregenerate):
+        """Test warming a missing lesson returns 404"""
+        response = client.post(
+            "/api/v1/audio/warm?lesson_id=99999",
+            headers={"Authorization": f"Bearer {admin_token}"},
+        )
+        
+        assert response.status_code == 404
+    
+    def test_warm_needs_pregeneration(self, client: TestClient, admin_token: str, test_sentences: list[Sentence]):
+        """Test warming is refused while nothing would run the jobs"""
+        response = client.post(
+            "/api/v1/audio/warm",
+            headers={"Authorization": f"Bearer {admin_token}"},
+        )
+        
+        assert response.status_code == 400
+    
+    def test_warm_requires_admin(self, client: TestClient, user_token: str, test_sentence: Sentence):
+        """Test regular users cannot warm or inspect the audio queue"""
+        headers = {"Authorization": f"Bearer {user_token}"}
+        
+        assert client.post("/api/v1/audio/warm", headers=headers).status_code == 403
+        assert client.get("/api/v1/audio/warm", headers=headers).status_code == 403
+
+
+class TestAudioHTTPCaching:
+    """Test validators, conditional requests and ranges on /audio"""
+    
+    @pytest.fixture
+    def cached_audio(self, tts, test_sentence: Sentence):
+        """The English audio of test_sentence already on disk: (key, content)"""
+        key = tts.audio_key(test_sentence.en_text, "en")
+        path = tts.get_audio_path(key)
+        os.makedirs(os.path.dirname(path))
+        content = bytes(range(100))
+        with open(path, "wb") as f:
+            f.write(content)
+        return key, content
+    
+    @pytest.fixture
+    def statements(self, db: Session):
+        """SQL statements executed while the fixture is active"""
+        executed = []
+        bind = db.get_bind()
+        
+        def record(conn, cursor, statement, parameters, context, executemany):
+            executed.append(statement)
+        
+        event.listen(bind, "before_cursor_execute", record)
+        yield executed
+        event.remove(bind, "before_cursor_execute", record)
+    
+    def test_sentence_urls_are_versioned(self, client: TestClient, test_sentence: Sentence, cached_audio):
+        """Test sentence responses link to the current audio version"""
+        key, _ = cached_audio
+        data = client.get(f"/api/v1/sentences/{test_sentence.id}").json()
+        
+        assert data["en_audio_url"] == f"/api/v1/audio/{test_sentence.id}/en?v={key}"
+    
+    def test_unversioned_url_revalidates(self, client: TestClient, test_sentence: Sentence, cached_audio):
+        """Test the plain URL carries a strong ETag and answers 304 when it matches"""
+        key, content = cached_audio
+        response = client.get(f"/api/v1/audio/{test_sentence.id}/en")
+        
+        assert response.status_code == 200
+        assert response.content == content
+        assert response.headers["etag"] == f'"{key}"'
+        assert response.headers["cache-control"] == "public, no-cache"
+        assert response.headers["accept-ranges"] == "bytes"
+        assert "last-modified" in response.headers
+        
+        again = client.get(f"/api/v1/audio/{test_sentence.id}/en", headers={"If-None-Match": f'"{key}"'})
+        assert again.status_code == 304
+        assert again.content == b""
+        assert again.headers["etag"] == f'"{key}"'
+        
+        since = client.get(
+            f"/api/v1/audio/{test_sentence.id}/en",
+            headers={"If-Modified-Since": response.headers["last-modified"]},
+        )
+        assert since.status_code == 304
+    
+    def test_edit_changes_etag(self, client: TestClient, db: Session, test_sentence: Sentence, cached_audio):
+        """Test a client holding the old ETag gets the new audio after an edit"""
+        key, _ = cached_audio
+        test_sentence.en_text = "Hi"
+        db.commit()
+        
+        with patch('app.services.tts_service.TTSService.generate_audio', return_value=_temp_mp3()) as generate:
+            response = client.get(f"/api/v1/audio/{test_sentence.id}/en", headers={"If-None-Match": f'"{key}"'})
+            os.unlink(generate.return_value)
+        
+        assert response.status_code == 200
+        assert response.headers["etag"] != f'"{key}"'
+    
+    def test_versioned_url_is_immutable(self, client: TestClient, test_sentence: Sentence, cached_audio, statements):
+        """Test versioned URLs are cached forever and revalidate with no database query"""
+        key, content = cached_audio
+        url = f"/api/v1/audio/{test_sentence.id}/en?v={key}"
+        
+        response = client.get(url)
+        assert response.status_code == 200
+        assert response.content == content
+        assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+        
+        again = client.get(url, headers={"If-None-Match": response.headers["etag"]})
+        assert again.status_code == 304
+        assert statements == []
+    
+    def test_versioned_url_not_cached_falls_back(self, client: TestClient, test_sentence: Sentence, cached_audio):
+        """Test an unknown version serves the sentence's current audio, revalidating"""
+        key, content = cached_audio
+        response = client.get(f"/api/v1/audio/{test_sentence.id}/en?v={'0' * 64}")
+        
+        assert response.status_code == 200
+        assert response.content == content
+        assert response.headers["etag"] == f'"{key}"'
+        assert response.headers["cache-control"] == "public, no-cache"
+    
+    def test_invalid_version(self, client: TestClient, test_sentence: Sentence):
+        """Test a malformed version is rejected"""
+        response = client.get(f"/api/v1/audio/{test_sentence.id}/en?v=../../etc/passwd")
+        
+        assert response.status_code == 422
+    
+    @pytest.mark.parametrize("range_header, status, body, content_range", [
+        ("bytes=10-19", 206, bytes(range(10, 20)), "bytes 10-19/100"),
+        ("bytes=90-", 206, bytes(range(90, 100)), "bytes 90-99/100"),
+        ("bytes=-5", 206, bytes(range(95, 100)), "bytes 95-99/100"),
+        ("bytes=95-200", 206, bytes(range(95, 100)), "bytes 95-99/100"),
+        ("bytes=100-", 416, b"", "bytes */100"),
+        ("bytes=0-1,5-6", 200, bytes(range(100)), None),
+        ("items=0-1", 200, bytes(range(100)), None),
+    ])
+    def test_range(self, client: TestClient, test_sentence: Sentence, cached_audio, range_header, status, body, content_range):
+        """Test single byte ranges are served as 206; others fall back or fail"""
+        key, _ = cached_audio
+        response = client.get(f"/api/v1/audio/{test_sentence.id}/en?v={key}", headers={"Range": range_header})
+        
+        assert response.status_code == status
+        if status != 416:
+            assert response.content == body
+        assert response.headers.get("content-range") == content_range
+    
+    def test_if_range(self, client: TestClient, test_sentence: Sentence, cached_audio):
+        """Test a stale If-Range validator gets the whole file"""
+        key, _ = cached_audio
+        url = f"/api/v1/audio/{test_sentence.id}/en?v={key}"
+        
+        current = client.get(url, headers={"Range": "bytes=0-9", "If-Range": f'"{key}"'})
+        stale = client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"other"'})
+        
+        assert current.status_code == 206
+        assert len(current.content) == 10
+        assert stale.status_code == 200
+        assert len(stale.content) == 100
+
+    
+    def test_serving_is_tracked(self, client: TestClient, db: Session, test_sentence: Sentence, cached_audio, monkeypatch):
+        """Test served clips are counted for eviction; revalidations are not"""
+        from app.core.metrics import metrics
+        from app.services.audio_eviction import audio_access
+        key, _ = cached_audio
+        url = f"/api/v1/audio/{test_sentence.id}/en?v={key}"
+        
+        client.get(f"/api/v1/audio/{test_sentence.id}/en")
+        client.get(url)
+        client.get(url, headers={"If-None-Match": f'"{key}"'})
+        monkeypatch.setattr(audio_access, "session_factory", TestingSessionLocal)
+        audio_access.flush()
+        
+        db.expire_all()
+        audio_file = db.query(AudioFile).one()
+        assert audio_file.hit_count == 2
+        assert audio_file.last_served_at is not None
+        assert metrics.snapshot()["counters"]["tts.cache.hits"] == 2
+    
+    @pytest.fixture
+    def signed_storage(self, tmp_path, monkeypatch):
+        """A shared directory whose objects have (fake) presigned URLs, with redirects on"""
+        from app.config import settings
+        from app.services import audio_storage
+        
+        class SignedStorage(audio_storage.LocalAudioStorage):
+            def presigned_url(self, name):
+                return f"https://bucket.example/{name}?X-Amz-Signature=abc"
+        
+        storage = SignedStorage(str(tmp_path / "shared"))
+        monkeypatch.setattr(audio_storage, "_storage", storage)
+        monkeypatch.setattr(settings, "audio_redirect", True)
+        return storage
+    
+    def test_redirect_to_storage(self, client: TestClient, test_sentence: Sentence, cached_audio, signed_storage):
+        """Test nodes can send clients to the shared storage instead of proxying"""
+        from app.config import settings
+        from app.services.tts_service import TTSService
+        key, _ = cached_audio
+        tts = TTSService()
+        tts.upload(tts.get_audio_path(key), "audio/mpeg")
+        
+        response = client.get(f"/api/v1/audio/{test_sentence.id}/en?v={key}", follow_redirects=False)
+        
+        assert response.status_code == 307
+        assert response.headers["location"] == f"https://bucket.example/{key[:2]}/{key}.mp3?X-Amz-Signature=abc"
+        assert response.headers["etag"] == f'"{key}"'
+        assert response.headers["cache-control"] == f"private, max-age={settings.audio_presign_seconds // 2}"
+    
+    def test_failed_upload_served_locally(self, client: TestClient, test_sentence: Sentence, synthetic, signed_storage, monkeypatch):
+        """Test audio whose upload just failed is served from the node, not redirected to a missing object"""
+        from app.config import settings
+        monkeypatch.setattr(settings, "tts_stream", False)
+        path = synthetic.get_audio_path(synthetic.audio_key(test_sentence.en_text, "en"))
+        url = f"/api/v1/audio/{test_sentence.id}/en"
+        
+        with patch.object(signed_storage, "put", side_effect=OSError("bucket unreachable")):
+            response = client.get(url, follow_redirects=False)
+        
+        assert response.status_code == 200
+        assert response.content == open(path, "rb").read()
+        
+        synthetic.upload(path, "audio/mpeg")
+        assert client.get(url, follow_redirects=False).status_code == 307
+    
+    def test_quality_variant(self, client: TestClient, test_sentence: Sentence, cached_audio):
+        """Test ?quality=low serves the cached Opus variant with its own ETag"""
+        key, content = cached_audio
+        url = f"/api/v1/audio/{test_sentence.id}/en?v={key}&quality=low"
+        with patch("app.services.audio_variants.available", return_value=True), \
+                patch("subprocess.run", side_effect=fake_ffmpeg) as run:
+            response = client.get(url)
+            again = client.get(url)
+        
+        assert response.status_code == 200
+        assert response.content == b"libopus" + content
+        assert response.headers["content-type"] == "audio/ogg; codecs=opus"
+        assert response.headers["etag"] == f'"{key}.opus"'
+        assert "vary" not in response.headers
+        assert again.content == response.content
+        assert run.call_count == 1
+        assert client.get(url, headers={"If-None-Match": f'"{key}.opus"'}).status_code == 304
+    
+    def test_accept_negotiates_variant(self, client: TestClient, test_sentence: Sentence, cached_audio):
+        """Test clients naming audio/ogg get Opus, others the original, with Vary: Accept"""
+        key, content = cached_audio
+        url = f"/api/v1/audio/{test_sentence.id}/en"
+        with patch("app.services.audio_variants.available", return_value=True), \
+                patch("subprocess.run", side_effect=fake_ffmpeg):
+            opus = client.get(url, headers={"Accept": "audio/ogg, audio/*;q=0.8"})
+            default = client.get(url, headers={"Accept": "*/*"})
+        
+        assert opus.headers["content-type"] == "audio/ogg; codecs=opus"
+        assert opus.headers["vary"] == "Accept"
+        assert default.content == content
+        assert default.headers["content-type"] == "audio/mpeg"
+        assert default.headers["vary"] == "Accept"
+    
+    def test_variant_falls_back_without_ffmpeg(self, client: TestClient, test_sentence: Sentence, cached_audio, monkeypatch):
+        """Test the original is served when no variant can be made"""
+        from app.config import settings
+        monkeypatch.setattr(settings, "ffmpeg_path", "/nonexistent/ffmpeg")
+        key, content = cached_audio
+        response = client.get(f"/api/v1/audio/{test_sentence.id}/en?quality=medium")
+        
+        assert response.status_code == 200
+        assert response.content == content
+        assert response.headers["content-type"] == "audio/mpeg"
+        assert response.headers["etag"] == f'"{key}"'
+    
+    def test_fallback_revalidates(self, client: TestClient, test_sentence: Sentence, cached_audio, monkeypatch):
+        """Test the original's ETag, served in place of a variant, revalidates before any transcode"""
+        from app.config import settings
+        from app.core.metrics import metrics
+        monkeypatch.setattr(settings, "ffmpeg_path", "/nonexistent/ffmpeg")
+        key, content = cached_audio
+        
+        for url in (f"/api/v1/audio/{test_sentence.id}/en?quality=low", f"/api/v1/audio/{test_sentence.id}/en?v={key}&quality=low"):
+            etag = client.get(url).headers["etag"]
+            again = client.get(url, headers={"If-None-Match": etag})
+            
+            assert etag == f'"{key}"'
+            assert again.status_code == 304
+        assert "audio_variants.unavailable" not in metrics.snapshot()["counters"]
+    
+    def test_failed_transcode_revalidates(self, client: TestClient, test_sentence: Sentence, cached_audio):
+        """Test after a failed transcode the original's ETag revalidates without another attempt"""
+        import subprocess
+        key, content = cached_audio
+        url = f"/api/v1/audio/{test_sentence.id}/en?quality=medium"
+        error = subprocess.CalledProcessError(1, "ffmpeg", stderr=b"Unknown encoder")
+        with patch("app.services.audio_variants.available", return_value=True), \
+                patch("subprocess.run", side_effect=error) as run:
+            response = client.get(url)
+            again = client.get(url, headers={"If-None-Match": response.headers["etag"]})
+        
+        assert response.content == content
+        assert response.headers["etag"] == f'"{key}"'
+        assert again.status_code == 304
+        assert run.call_count == 1
+    
+    def test_wav_engine_media_type(self, client: TestClient, test_sentence: Sentence, tmp_path, monkeypatch):
+        """Test pyttsx3 audio is labelled as WAV"""
+        from app.config import settings
+        from app.services.tts_service import TTSService
+        monkeypatch.setattr(settings, "audio_dir", str(tmp_path))
+        monkeypatch.setattr(settings, "tts_engine", "pyttsx3")
+        tts = TTSService()
+        path = tts.get_audio_path(tts.audio_key(test_sentence.en_text, "en"))
+        os.makedirs(os.path.dirname(path))
+        with open(path, "wb") as f:
+            f.write(b"RIFF")
+        
+        response = client.get(f"/api/v1/audio/{test_sentence.id}/en")
+        
+        assert response.headers["content-type"] == "audio/wav"
+        assert response.headers["content-disposition"].endswith('.wav"')
+    
+    def test_invalid_quality(self, client: TestClient, test_sentence: Sentence):
+        """Test unknown quality levels are rejected"""
+        assert client.get(f"/api/v1/audio/{test_sentence.id}/en?quality=best").status_code == 422
+    
+    def test_indexed_audio_skips_database(self, client: TestClient, test_sentence: Sentence, cached_audio, statements):
+        """Test audio served once is served again reading only the sentence's text, or nothing when versioned"""
+        key, content = cached_audio
+        client.get(f"/api/v1/audio/{test_sentence.id}/en")
+        statements.clear()
+        
+        plain = client.get(f"/api/v1/audio/{test_sentence.id}/en")
+        versioned = client.get(f"/api/v1/audio/{test_sentence.id}/en?v={key}")
+        revalidated = client.get(f"/api/v1/audio/{test_sentence.id}/en", headers={"If-None-Match": f'"{key}"'})
+        
+        assert plain.content == versioned.content == content
+        assert plain.headers["cache-control"] == "public, no-cache"
+        assert revalidated.status_code == 304
+        assert len(statements) == 2
+        assert all("FROM sentences" in statement and "audio_files" not in statement for statement in statements)
+        
+        statements.clear()
+        client.get(f"/api/v1/audio/{test_sentence.id}/en?v={key}")
+        assert statements == []
+    
+    def test_edit_elsewhere_bypasses_index(self, client: TestClient, db: Session, test_sentence: Sentence, cached_audio):
+        """Test an edit this worker's index never heard of is answered with the new audio"""
+        key, _ = cached_audio
+        client.get(f"/api/v1/audio/{test_sentence.id}/en")
+        # As another worker would: straight to the database, no index invalidation
+        test_sentence.en_text = "Hi"
+        db.commit()
+        
+        with patch('app.services.tts_service.TTSService.generate_audio', return_value=_temp_mp3()) as generate:
+            response = client.get(f"/api/v1/audio/{test_sentence.id}/en", headers={"Accept": "audio/mpeg"})
+            os.unlink(generate.return_value)
+        
+        assert response.status_code == 200
+        assert generate.called
+        assert response.headers["etag"] != f'"{key}"'
+        assert audio_index.get(test_sentence.id, "en").key != key
+    
+    def test_edit_discards_indexed_audio(self, client: TestClient, admin_token: str, test_sentence: Sentence, cached_audio):
+        """Test an edit through the API is not answered with the old audio"""
+        key, _ = cached_audio
+        client.get(f"/api/v1/audio/{test_sentence.id}/en")
+        client.put(
+            f"/api/v1/sentences/{test_sentence.id}",
+            json={"en_text": "Hi"},
+            headers={"Authorization": f"Bearer {admin_token}"},
+        )
+        
+        with patch('app.services.tts_service.TTSService.generate_audio', return_value=_temp_mp3()) as generate:
+            response = client.get(f"/api/v1/audio/{test_sentence.id}/en")
+            os.unlink(generate.return_value)
+        
+        assert response.status_code == 200
+        assert response.headers["etag"] != f'"{key}"'
+
+
+class TestAudioStreaming:
+    """Test cache misses are streamed while they are synthesized"""
+    
+    def test_miss_is_streamed_and_cached(self, client: TestClient, db: Session, test_sentence: Sentence, synthetic):
+        """Test a miss answers as it is synthesized, then is recorded and served from the cache"""
+        key = synthetic.audio_key(test_sentence.en_text, "en")
+        url = f"/api/v1/audio/{test_sentence.id}/en"
+        
+        response = client.get(url)
+        
+        assert response.status_code == 200
+        assert "content-length" not in response.headers
+        assert response.headers["content-type"] == "audio/mpeg"
+        assert response.headers["etag"] == f'"{key}"'
+        with open(synthetic.get_audio_path(key), "rb") as f:
+            assert response.content == f.read()
+        audio_file = db.query(AudioFile).one()
+        assert (audio_file.audio_key, audio_file.file_size) == (key, len(response.content))
+        assert audio_index.get(test_sentence.id, "en").key == key
+        
+        again = client.get(url)
+        assert again.headers["content-length"] == str(len(response.content))
+        assert again.content == response.content
+    
+    def test_range_miss_is_not_streamed(self, client: TestClient, test_sentence: Sentence, synthetic):
+        """Test a range request on a miss waits for the file to answer 206"""
+        response = client.get(f"/api/v1/audio/{test_sentence.id}/en", headers={"Range": "bytes=0-9"})
+        
+        assert response.status_code == 206
+        assert len(response.content) == 10
+    
+    def test_streaming_disabled(self, client: TestClient, test_sentence: Sentence, synthetic, monkeypatch):
+        """Test TTS_STREAM=false answers misses once the file is complete"""
+        from app.config import settings
+        monkeypatch.setattr(settings, "tts_stream", False)
+        
+        response = client.get(f"/api/v1/audio/{test_sentence.id}/en")
+        
+        assert response.status_code == 200
+        assert response.headers["content-length"] == str(len(response.content))
+    
+    def test_failure_before_first_chunk(self, client: TestClient, test_sentence: Sentence, synthetic, monkeypatch):
+        """Test a synthesis failing outright still gets an error status"""
+        from app.services.tts_engines import SyntheticEngine
+        
+        def offline(self, text, language, voice):
+            raise RuntimeError("offline")
+            yield
+        
+        monkeypatch.setattr(SyntheticEngine, "stream", offline)
+        
+        response = client.get(f"/api/v1/audio/{test_sentence.id}/en")
+        
+        assert response.status_code == 400
+
+
+class TestAudioSprites:
+    """Test per-lesson sprites and their manifests"""
+    
+    @staticmethod
+    def _synthesize(frames: int):
+        """generate_audio stand-in writing `frames` MP3 frames to the key path"""
+        from app.services.tts_service import TTSService
+        
+        def generate(text, language):
+            path = TTSService().get_audio_path(TTSService().audio_key(text, language))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(make_mp3(frames, id3=True))
+            return path
+        return generate
+    
+    def test_manifest_and_sprite(self, client: TestClient, test_sentences: list[Sentence], audio_dir):
+        """Test the manifest's offsets index into the sprite, synthesizing missing audio"""
+        lesson_id = test_sentences[0].lesson_id
+        with patch('app.services.tts_service.TTSService.generate_audio', side_effect=self._synthesize(4)) as generate:
+            response = client.get(f"/api/v1/audio/lessons/{lesson_id}/vi/manifest")
+        
+        assert response.status_code == 200
+        assert generate.call_count == 3
+        manifest = response.json()
+        assert manifest["url"] == f"/api/v1/audio/lessons/{lesson_id}/vi/sprite?v={manifest['version']}"
+        assert response.headers["etag"] == f'"{manifest["version"]}"'
+        assert [s["sentence_id"] for s in manifest["segments"]] == [s.id for s in test_sentences]
+        assert [s["offset"] for s in manifest["segments"]] == [0, 384, 768]
+        assert manifest["duration"] == pytest.approx(0.288)
+        
+        sprite = client.get(manifest["url"])
+        assert sprite.status_code == 200
+        assert sprite.headers["content-type"] == "audio/mpeg"
+        assert sprite.headers["cache-control"] == "public, max-age=31536000, immutable"
+        assert sprite.content == make_mp3(12)
+        
+        segment = manifest["segments"][1]
+        end = segment["offset"] + segment["length"] - 1
+        part = client.get(manifest["url"], headers={"Range": f"bytes={segment['offset']}-{end}"})
+        assert part.status_code == 206
+        assert part.content == make_mp3(4)
+    
+    def test_manifest_not_modified(self, client: TestClient, test_sentences: list[Sentence], audio_dir):
+        """Test the manifest revalidates with its version as ETag"""
+        lesson_id = test_sentences[0].lesson_id
+        with patch('app.services.tts_service.TTSService.generate_audio', side_effect=self._synthesize(1)):
+            etag = client.get(f"/api/v1/audio/lessons/{lesson_id}/en/manifest").headers["etag"]
+        
+        with patch('app.services.tts_service.TTSService.generate_audio') as generate:
+            again = client.get(f"/api/v1/audio/lessons/{lesson_id}/en/manifest", headers={"If-None-Match": etag})
+        
+        assert again.status_code == 304
+        generate.assert_not_called()
+    
+    def test_edit_invalidates_sprite(self, client: TestClient, db: Session, test_sentences: list[Sentence], audio_dir):
+        """Test an edit gives a new version and the old sprite URL answers 404"""
+        lesson_id = test_sentences[0].lesson_id
+        with patch('app.services.tts_service.TTSService.generate_audio', side_effect=self._synthesize(1)):
+            old = client.get(f"/api/v1/audio/lessons/{lesson_id}/en/manifest").json()
+            test_sentences[2].en_text = "Thanks"
+            db.commit()
+            new = client.get(f"/api/v1/audio/lessons/{lesson_id}/en/manifest").json()
+        
+        assert new["version"] != old["version"]
+        assert client.get(old["url"]).status_code == 404
+        assert client.get(new["url"]).status_code == 200
+    
+    def test_unversioned_sprite(self, client: TestClient, test_sentences: list[Sentence], audio_dir):
+        """Test the plain sprite URL builds the sprite and revalidates"""
+        lesson_id = test_sentences[0].lesson_id
+        with patch('app.services.tts_service.TTSService.generate_audio', side_effect=self._synthesize(2)):
+            response = client.get(f"/api/v1/audio/lessons/{lesson_id}/en/sprite")
+        
+        assert response.status_code == 200
+        assert response.content == make_mp3(6)
+        assert response.headers["cache-control"] == "public, no-cache"
+    
+    def test_sprite_audio_is_recorded(self, client: TestClient, db: Session, test_sentences: list[Sentence], audio_dir):
+        """Test audio synthesized for a sprite belongs to its sentences and survives the GC"""
+        from app.services import audio_cache
+        from app.services.tts_service import TTSService
+        
+        lesson_id = test_sentences[0].lesson_id
+        with patch('app.services.tts_service.TTSService.generate_audio', side_effect=self._synthesize(1)):
+            client.get(f"/api/v1/audio/lessons/{lesson_id}/en/manifest")
+        
+        db.expire_all()
+        keys = {row.sentence_id: row.audio_key for row in db.query(AudioFile).filter(AudioFile.language == "en")}
+        assert keys == {s.id: TTSService().audio_key(s.en_text, "en") for s in test_sentences}
+        
+        assert audio_cache.collect_garbage(db, grace_seconds=0)["blobs"] == 0
+        assert all(os.path.exists(TTSService().get_audio_path(key)) for key in keys.values())
+    
+    def test_cold_sprite_within_queue_limit(self, client: TestClient, test_sentences: list[Sentence], audio_dir, monkeypatch):
+        """Test a lesson with more missing audio than the synthesizer queue holds is still built"""
+        from app.services.audio_synthesizer import audio_synthesizer
+        monkeypatch.setattr(audio_synthesizer, "max_pending", 2)
+        
+        synthesize = self._synthesize(1)
+        
+        def slow(text, language):
+            time.sleep(0.05)
+            return synthesize(text, language)
+        
+        lesson_id = test_sentences[0].lesson_id
+        with patch('app.services.tts_service.TTSService.generate_audio', side_effect=slow) as generate:
+            response = client.get(f"/api/v1/audio/lessons/{lesson_id}/en/manifest")
+        
+        assert response.status_code == 200
+        assert generate.call_count == 3
+    
+    def test_sprite_unknown_lesson(self, client: TestClient, test_lesson: Lesson):
+        """Test unknown or empty lessons have no sprite"""
+        assert client.get("/api/v1/audio/lessons/99999/en/manifest").status_code == 404
+        assert client.get(f"/api/v1/audio/lessons/{test_lesson.id}/en/manifest").status_code == 404
+        assert client.get(f"/api/v1/audio/lessons/{test_lesson.id}/en/sprite").status_code == 404
+    
+    def test_sprite_requires_mp3_engine(self, client: TestClient, test_sentences: list[Sentence], audio_dir, monkeypatch):
+        """Test WAV engines cannot be joined into a sprite"""
+        from app.config import settings
+        monkeypatch.setattr(settings, "tts_engine", "pyttsx3")
+        
+        response = client.get(f"/api/v1/audio/lessons/{test_sentences[0].lesson_id}/en/manifest")
+        
+        assert response.status_code == 400
+
+
+def _temp_mp3() -> str:
+    import tempfile
+    temp_file = tempfile.NamedTemporaryFile(mode='wb', suffix='.mp3', delete=False)
+    temp_file.write(b'fake audio content')
+    temp_file.close()
+    return temp_file.name
@@ -7,6 +7,8 @@ from datetime import datetime, timedelta
 from app.models.sentence import Sentence
 from app.models.lesson import Lesson
 from app.models.progress import UserProgress
+from app.services.practice_cursor import PracticeCursor
+from app.services.tts_service import audio_key
 
 
 class TestPractice:
@@ -18,6 +20,14 @@ class TestPractice:
         assert response.status_code == 404
         assert "no sentences" in response.json()["message"].lower()
     
+    def test_get_next_sentence_all_lessons(self, client: TestClient, user_token: str, test_sentences: list[Sentence]):
+        """Test omitting lesson_id practices across all lessons"""
+        for headers in ({}, {"Authorization": f"Bearer {user_token}"}):
+            response = client.get("/api/v1/practice/next", headers=headers)
+            assert response.status_code == 200
+            assert response.json()["sentence"]["id"] in [s.id for s in test_sentences]
+            assert response.json()["progress"]["total_in_lesson"] == 3
+    
     def test_get_next_sentence_guest(self, client: TestClient, test_lesson: Lesson, test_sentences: list[Sentence]):
         """Test get next sentence as guest (random)"""
         response = client.get(f"/api/v1/practice/next?lesson_id={test_lesson.id}")
@@ -77,6 +87,83 @@ class TestPractice:
             # Should not return recently practiced sentence
             assert response.json()["sentence"]["id"] != test_sentences[0].id
     
+    def test_get_next_sentence_sees_new_sentence(
+        self,
+        client: TestClient,
+        user_token: str,
+        admin_token: str,
+        test_user,
+        test_lesson: Lesson,
+        test_sentences: list[Sentence],
+        db: Session
+    ):
+        """Test sentences added through the API reach the cached lesson pool"""
+        headers = {"Authorization": f"Bearer {user_token}"}
+        response = client.get(f"/api/v1/practice/next?lesson_id={test_lesson.id}", headers=headers)
+        assert response.status_code == 200
+        
+        # Mark all existing sentences as practiced
+        for sentence in test_sentences:
+            db.add(UserProgress(
+                user_id=test_user.id,
+                sentence_id=sentence.id,
+                practiced_count=1,
+                last_practiced_at=datetime.utcnow() - timedelta(hours=1),
+            ))
+        db.commit()
+        
+        response = client.post(
+            "/api/v1/sentences",
+            json={"lesson_id": test_lesson.id, "vi_text": "Mới", "en_text": "New"},
+            headers={"Authorization": f"Bearer {admin_token}"},
+        )
+        assert response.status_code == 201
+        new_id = response.json()["id"]
+        
+        response = client.get(f"/api/v1/practice/next?lesson_id={test_lesson.id}", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["sentence"]["id"] == new_id
+        assert response.json()["progress"]["total_in_lesson"] == 4
+    
+    def test_get_sentence_batch_authenticated(
+        self,
+        client: TestClient,
+        user_token: str,
+        test_lesson: Lesson,
+        test_sentences: list[Sentence]
+    ):
+        """Test batch returns an ordered queue with audio URLs"""
+        response = client.get(
+            f"/api/v1/practice/batch?lesson_id={test_lesson.id}&count=2",
+            headers={"Authorization": f"Bearer {user_token}"},
+        )
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["sentences"]) == 2
+        for item in data["sentences"]:
+            assert item["vi_audio_url"] == f"/api/v1/audio/{item['id']}/vi?v={audio_key(item['vi_text'], 'vi')}"
+            assert item["en_audio_url"] == f"/api/v1/audio/{item['id']}/en?v={audio_key(item['en_text'], 'en')}"
+        assert data["progress"]["total_in_lesson"] == 3
+    
+    def test_get_sentence_batch_guest_capped_by_lesson(
+        self,
+        client: TestClient,
+        test_lesson: Lesson,
+        test_sentences: list[Sentence]
+    ):
+        """Test batch returns the whole lesson when count exceeds it"""
+        response = client.get(f"/api/v1/practice/batch?lesson_id={test_lesson.id}&count=50")
+        assert response.status_code == 200
+        ids = [item["id"] for item in response.json()["sentences"]]
+        assert sorted(ids) == sorted(s.id for s in test_sentences)
+    
+    def test_get_sentence_batch_invalid_count(self, client: TestClient, test_lesson: Lesson):
+        """Test count is bounded"""
+        response = client.get(f"/api/v1/practice/batch?lesson_id={test_lesson.id}&count=0")
+        assert response.status_code == 422
+        response = client.get(f"/api/v1/practice/batch?lesson_id={test_lesson.id}&count=51")
+        assert response.status_code == 422
+    
     def test_record_practice_guest(
         self, 
         client: TestClient, 
@@ -141,6 +228,148 @@ class TestPractice:
         )
         assert response.status_code == 404
     
+    def test_record_practice_with_grade(
+        self,
+        client: TestClient,
+        user_token: str,
+        test_user,
+        test_sentence: Sentence,
+        db: Session
+    ):
+        """Test record practice applies the SM-2 grade"""
+        response = client.post(
+            "/api/v1/practice/record",
+            json={"sentence_id": test_sentence.id, "grade": 2},
+            headers={"Authorization": f"Bearer {user_token}"},
+        )
+        assert response.status_code == 201
+        
+        progress = db.query(UserProgress).filter(
+            UserProgress.sentence_id == test_sentence.id
+        ).one()
+        assert progress.repetitions == 0
+        assert progress.ease_factor < 2.5
+    
+    def test_record_practice_invalid_grade(
+        self,
+        client: TestClient,
+        user_token: str,
+        test_sentence: Sentence
+    ):
+        """Test grade must be between 0 and 5"""
+        response = client.post(
+            "/api/v1/practice/record",
+            json={"sentence_id": test_sentence.id, "grade": 6},
+            headers={"Authorization": f"Bearer {user_token}"},
+        )
+        assert response.status_code == 422
+    
+    def test_get_next_sentence_shuffled_cursor(
+        self,
+        client: TestClient,
+        test_lesson: Lesson,
+        test_sentences: list[Sentence]
+    ):
+        """Test guests can walk a lesson without repeats by passing the cursor back"""
+        url = f"/api/v1/practice/next?lesson_id={test_lesson.id}&mode=shuffled"
+        cursor = None
+        served = []
+        for _ in range(3):
+            response = client.get(url + (f"&cursor={cursor}" if cursor else ""))
+            assert response.status_code == 200
+            cursor = response.json()["cursor"]
+            served.append(response.json()["sentence"]["id"])
+        
+        assert sorted(served) == sorted(s.id for s in test_sentences)
+    
+    def test_get_sentence_batch_ordered(
+        self,
+        client: TestClient,
+        test_lesson: Lesson,
+        test_sentences: list[Sentence]
+    ):
+        """Test ordered batches come in lesson order"""
+        response = client.get(f"/api/v1/practice/batch?lesson_id={test_lesson.id}&mode=ordered&count=3")
+        assert response.status_code == 200
+        ordered = [s.id for s in sorted(test_sentences, key=lambda s: s.order_index)]
+        assert [s["id"] for s in response.json()["sentences"]] == ordered
+        assert response.json()["cursor"]
+    
+    def test_get_next_sentence_invalid_mode_or_cursor(self, client: TestClient, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test unknown modes and forged cursors are rejected"""
+        response = client.get(f"/api/v1/practice/next?lesson_id={test_lesson.id}&mode=backwards")
+        assert response.status_code == 422
+        response = client.get(f"/api/v1/practice/next?lesson_id={test_lesson.id}&mode=ordered&cursor=nope")
+        assert response.status_code == 400
+        forged = PracticeCursor(test_lesson.id, 1, 2**64 - 1).encode()
+        response = client.get(f"/api/v1/practice/next?lesson_id={test_lesson.id}&mode=shuffled&cursor={forged}")
+        assert response.status_code == 400
+        response = client.get(f"/api/v1/practice/next?lesson_id={test_lesson.id}&recent_minutes=-1")
+        assert response.status_code == 422
+    
+    def test_record_practice_batch(
+        self,
+        client: TestClient,
+        user_token: str,
+        test_sentences: list[Sentence],
+        db: Session
+    ):
+        """Test batch record applies counts and merges repeats"""
+        response = client.post(
+            "/api/v1/practice/record/batch",
+            json={"records": [
+                {"sentence_id": test_sentences[0].id, "count": 3},
+                {"sentence_id": test_sentences[1].id, "practiced_at": "2026-01-02T08:00:00Z"},
+                {"sentence_id": test_sentences[0].id, "count": 2},
+            ]},
+            headers={"Authorization": f"Bearer {user_token}"},
+        )
+        assert response.status_code == 201
+        data = response.json()
+        assert data["recorded"] == 2
+        
+        counts = {
+            p.sentence_id: p.practiced_count
+            for p in db.query(UserProgress).all()
+        }
+        assert counts == {test_sentences[0].id: 5, test_sentences[1].id: 1}
+    
+    def test_record_practice_batch_unknown_sentence(
+        self,
+        client: TestClient,
+        user_token: str,
+        test_sentence: Sentence,
+        db: Session
+    ):
+        """Test batch is rejected as a whole when any id is unknown"""
+        response = client.post(
+            "/api/v1/practice/record/batch",
+            json={"records": [{"sentence_id": test_sentence.id}, {"sentence_id": 9999}]},
+            headers={"Authorization": f"Bearer {user_token}"},
+        )
+        assert response.status_code == 404
+        assert "9999" in response.json()["message"]
+        assert db.query(UserProgress).count() == 0
+    
+    def test_record_practice_batch_guest(self, client: TestClient, test_sentence: Sentence, db: Session):
+        """Test batch record is a no-op for guests"""
+        response = client.post(
+            "/api/v1/practice/record/batch",
+            json={"records": [{"sentence_id": test_sentence.id}]},
+        )
+        assert response.status_code == 201
+        assert response.json()["recorded"] == 0
+        assert db.query(UserProgress).count() == 0
+    
+    def test_record_practice_batch_empty(self, client: TestClient, user_token: str):
+        """Test batch needs at least one record"""
+        response = client.post(
+            "/api/v1/practice/record/batch",
+            json={"records": []},
+            headers={"Authorization": f"Bearer {user_token}"},
+        )
+        assert response.status_code == 422
+    
     def test_get_practice_stats_unauthorized(self, client: TestClient):
         """Test get stats without authentication"""
         response = client.get("/api/v1/practice/stats")
@@ -187,6 +416,34 @@ class TestPractice:
             pytest.skip("Stats endpoint not implemented")
         assert response.status_code == 200
     
+    def test_get_practice_stats_follows_sentence_delete(
+        self,
+        client: TestClient,
+        user_token: str,
+        admin_token: str,
+        test_lesson: Lesson,
+        test_sentences: list[Sentence]
+    ):
+        """Test stats come from the lesson rollup and drop a deleted sentence's history"""
+        headers = {"Authorization": f"Bearer {user_token}"}
+        for sentence in [test_sentences[0], test_sentences[0], test_sentences[1]]:
+            client.post("/api/v1/practice/record", json={"sentence_id": sentence.id}, headers=headers)
+        
+        stats = client.get(f"/api/v1/practice/stats?lesson_id={test_lesson.id}", headers=headers).json()
+        assert (stats["total_practiced"], stats["total_practice_count"]) == (2, 3)
+        assert stats["recent_practiced_count"] == 2
+        
+        response = client.delete(
+            f"/api/v1/sentences/{test_sentences[0].id}",
+            headers={"Authorization": f"Bearer {admin_token}"},
+        )
+        assert response.status_code == 204
+        
+        stats = client.get(f"/api/v1/practice/stats?lesson_id={test_lesson.id}", headers=headers).json()
+        assert (stats["total_practiced"], stats["total_practice_count"]) == (1, 1)
+        stats = client.get("/api/v1/practice/stats", headers=headers).json()
+        assert (stats["total_practiced"], stats["total_practice_count"]) == (1, 1)
+    
     def test_practice_flow_complete(
         self,
         client: TestClient,
@@ -5,6 +5,8 @@ from sqlalchemy.orm import Session
 
 from app.models.lesson import Lesson
 from app.models.sentence import Sentence
+from app.models.tts_job import TTSJob
+from app.models.audio_file import AudioBlob, AudioFile
 
 
 class TestSentences:
@@ -186,3 +188,50 @@ class TestSentences:
         assert data["pagination"]["total_items"] >= 25
         assert len(data["items"]) == 10
         assert data["pagination"]["total_pages"] == 3
+    
+    def test_create_sentences_queue_audio(self, client: TestClient, admin_token: str, test_lesson: Lesson, db: Session, pregenerate):
+        """Test creates and bulk creates queue audio jobs for both languages"""
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        single = client.post(
+            "/api/v1/sentences",
+            json={"lesson_id": test_lesson.id, "vi_text": "Một", "en_text": "One"},
+            headers=headers,
+        ).json()
+        bulk = client.post(
+            "/api/v1/sentences/bulk",
+            json={"lesson_id": test_lesson.id, "sentences": [{"vi": "Hai", "en": "Two"}, {"vi": "Ba", "en": "Three"}]},
+            headers=headers,
+        ).json()
+        
+        queued = {(job.sentence_id, job.language, job.status) for job in db.query(TTSJob)}
+        assert queued == {
+            (sentence_id, language, "pending")
+            for sentence_id in [single["id"]] + [s["id"] for s in bulk]
+            for language in ("vi", "en")
+        }
+    
+    def test_update_sentence_requeues_changed_text(self, client: TestClient, admin_token: str, test_sentence: Sentence, db: Session, pregenerate):
+        """Test a text edit re-queues audio for the changed language only"""
+        db.add_all([
+            TTSJob(sentence_id=test_sentence.id, language="vi", status="done", attempts=1),
+            TTSJob(sentence_id=test_sentence.id, language="en", status="done", attempts=1),
+            AudioBlob(key="a" * 64, language="vi", file_size=1),
+            AudioBlob(key="b" * 64, language="en", file_size=1),
+        ])
+        db.add_all([
+            AudioFile(sentence_id=test_sentence.id, language="vi", audio_key="a" * 64, file_path="vi.mp3", file_size=1),
+            AudioFile(sentence_id=test_sentence.id, language="en", audio_key="b" * 64, file_path="en.mp3", file_size=1),
+        ])
+        db.commit()
+        
+        response = client.put(
+            f"/api/v1/sentences/{test_sentence.id}",
+            json={"vi_text": test_sentence.vi_text, "en_text": "Hi there"},
+            headers={"Authorization": f"Bearer {admin_token}"},
+        )
+        assert response.status_code == 200
+        
+        statuses = {job.language: job.status for job in db.query(TTSJob).populate_existing()}
+        assert statuses == {"vi": "done", "en": "pending"}
+        # The old English audio no longer belongs to the sentence
+        assert [a.language for a in db.query(AudioFile).populate_existing()] == ["vi"]
@@ -8,6 +8,7 @@ from app.core.exceptions import (
     ForbiddenException,
     BadRequestException,
     ConflictException,
+    ServiceUnavailableException,
 )
 
 
@@ -50,6 +51,12 @@ class TestCustomExceptions:
         assert exc.status_code == status.HTTP_409_CONFLICT
         assert exc.detail == "Already exists"
     
+    def test_service_unavailable_exception(self):
+        """Test ServiceUnavailableException carries Retry-After"""
+        exc = ServiceUnavailableException("Busy", retry_after=5)
+        assert exc.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert exc.headers == {"Retry-After": "5"}
+    
     def test_exception_can_be_raised(self):
         """Test exceptions can be raised and caught"""
         with pytest.raises(NotFoundException) as exc_info:
@@ -0,0 +1,42 @@
+"""Test conditional and range request helpers"""
+import pytest
+
+from app.core.http_cache import _etag_listed, _parse_range
+
+
+class TestHTTPCache:
+    """Test header parsing"""
+    
+    @pytest.mark.parametrize("header, expected", [
+        ("bytes=0-0", (0, 0)),
+        ("bytes=0-", (0, 99)),
+        ("bytes=-100", (0, 99)),
+        ("bytes=-500", (0, 99)),
+        ("bytes=99-99", (99, 99)),
+        ("bytes=100-200", (100, 100)),
+        ("bytes=-0", (100, 100)),
+        ("bytes=5-2", None),
+        ("bytes=a-b", None),
+        ("bytes=5", None),
+        ("bytes=0-1,3-4", None),
+    ])
+    def test_parse_range(self, header, expected):
+        """Test ranges against a 100-byte file; (size, size) means unsatisfiable"""
+        assert _parse_range(header, 100) == expected
+    
+    def test_parse_range_empty_file(self):
+        """Test no range can be satisfied on an empty file"""
+        assert _parse_range("bytes=0-", 0) == (0, 0)
+        assert _parse_range("bytes=-1", 0) == (0, 0)
+    
+    @pytest.mark.parametrize("header, expected", [
+        ('"abc"', True),
+        ('W/"abc"', True),
+        ('"x", "abc"', True),
+        ("*", True),
+        ('"abcd"', False),
+        ("abc", False),
+    ])
+    def test_etag_listed(self, header, expected):
+        """Test If-None-Match matching"""
+        assert _etag_listed(header, '"abc"') is expected
@@ -33,3 +33,16 @@ class TestHealthCheck:
         response = client.get("/docs")
         assert response.status_code == 200
         assert "text/html" in response.headers["content-type"]
+    
+    def test_metrics(self, client: TestClient, admin_token: str):
+        """Test metrics snapshot available to admins"""
+        response = client.get("/metrics", headers={"Authorization": f"Bearer {admin_token}"})
+        assert response.status_code == 200
+        data = response.json()
+        assert set(data) == {"counters", "gauges", "timers", "ratios"}
+    
+    def test_metrics_requires_admin(self, client: TestClient, user_token: str):
+        """Test metrics are hidden from guests and regular users"""
+        assert client.get("/metrics").status_code == 401
+        response = client.get("/metrics", headers={"Authorization": f"Bearer {user_token}"})
+        assert response.status_code == 403
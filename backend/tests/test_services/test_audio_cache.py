@@ -0,0 +1,107 @@
+"""
+Tests for the content-addressed audio cache
+"""
+import os
+import time
+from pathlib import Path
+
+from sqlalchemy.orm import Session
+
+from app.models.audio_file import AudioBlob, AudioFile
+from app.models.sentence import Sentence
+from app.services import audio_cache, audio_chunks
+from app.services.tts_service import TTSService
+
+
+def write_blob(tts: TTSService, text: str, language: str = "en") -> tuple[str, str]:
+    key = tts.audio_key(text, language)
+    path = Path(tts.get_audio_path(key))
+    path.parent.mkdir(exist_ok=True)
+    path.write_bytes(text.encode())
+    return key, str(path)
+
+
+def age(path: str, seconds: float = 7200) -> None:
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+class TestAudioCache:
+    """Test recording and garbage-collecting blobs"""
+    
+    def test_record_repoints_on_new_key(self, db: Session, test_sentence: Sentence, tts: TTSService):
+        """Test recording a new key for the same sentence replaces the mapping"""
+        old_key, old_path = write_blob(tts, "Hello")
+        new_key, new_path = write_blob(tts, "Hi")
+        
+        audio_cache.record(db, test_sentence.id, "en", old_key, old_path)
+        audio_cache.record(db, test_sentence.id, "en", new_key, new_path)
+        db.commit()
+        
+        audio_file = db.query(AudioFile).one()
+        assert (audio_file.audio_key, audio_file.file_path, audio_file.file_size) == (new_key, new_path, 2)
+        assert {blob.key for blob in db.query(AudioBlob)} == {old_key, new_key}
+    
+    def test_collect_garbage(self, db: Session, test_sentences: list[Sentence], tts: TTSService):
+        """Test unreferenced blobs and stray files go, referenced ones stay"""
+        used_key, used_path = write_blob(tts, "Hello")
+        stale_key, stale_path = write_blob(tts, "Helo")
+        for sentence in test_sentences[:2]:
+            audio_cache.record(db, sentence.id, "en", used_key, used_path)
+        audio_cache.record(db, test_sentences[2].id, "en", stale_key, stale_path)
+        db.commit()
+        # The typo is fixed: the sentence now plays another blob
+        db.query(AudioFile).filter(AudioFile.audio_key == stale_key).delete()
+        db.commit()
+        
+        legacy = os.path.join(tts.audio_dir, "12_vi.mp3")
+        partial = os.path.join(os.path.dirname(used_path), f".tmp-abc-{used_key}.mp3")
+        for path in (legacy, partial):
+            Path(path).write_bytes(b"xx")
+        for path in (used_path, stale_path, legacy, partial):
+            age(path)
+        
+        preview = audio_cache.collect_garbage(db, grace_seconds=0, dry_run=True, tts=tts)
+        assert preview == {"blobs": 1, "orphan_files": 2, "chunk_files": 0, "bytes": 8}
+        assert os.path.exists(stale_path)
+        
+        assert audio_cache.collect_garbage(db, grace_seconds=0, tts=tts) == preview
+        assert not any(os.path.exists(p) for p in (stale_path, legacy, partial))
+        assert os.path.exists(used_path)
+        assert {blob.key for blob in db.query(AudioBlob)} == {used_key}
+    
+    def test_collect_garbage_keeps_recent_audio(self, db: Session, test_sentence: Sentence, tts: TTSService):
+        """Test audio younger than the grace period is left alone"""
+        key, path = write_blob(tts, "Hello")
+        audio_cache.record(db, test_sentence.id, "en", key, path)
+        db.query(AudioFile).delete()
+        db.commit()
+        Path(tts.audio_dir, "new.mp3").write_bytes(b"x")
+        
+        assert audio_cache.collect_garbage(db, grace_seconds=3600, tts=tts) == {"blobs": 0, "orphan_files": 0, "chunk_files": 0, "bytes": 0}
+        assert os.path.exists(path)
+    
+    def test_collect_garbage_leaves_recent_clauses(self, db: Session, tts: TTSService):
+        """Test clause audio has no blob row but is only collected by age"""
+        clause = Path(audio_chunks.chunk_path(tts, "ab" * 32))
+        clause.parent.mkdir(parents=True)
+        clause.write_bytes(b"xx")
+        age(str(clause))
+        
+        assert audio_cache.collect_garbage(db, grace_seconds=0, tts=tts) == {"blobs": 0, "orphan_files": 0, "chunk_files": 0, "bytes": 0}
+        assert clause.exists()
+    
+    def test_release_keeps_shared_blobs(self, db: Session, test_sentences: list[Sentence], tts: TTSService):
+        """Test releasing keys removes only blobs no sentence references"""
+        shared_key, shared_path = write_blob(tts, "Thank you")
+        own_key, own_path = write_blob(tts, "Cảm ơn", "vi")
+        audio_cache.record(db, test_sentences[0].id, "en", shared_key, shared_path)
+        audio_cache.record(db, test_sentences[1].id, "en", shared_key, shared_path)
+        audio_cache.record(db, test_sentences[0].id, "vi", own_key, own_path)
+        db.commit()
+        db.query(AudioFile).filter(AudioFile.sentence_id == test_sentences[0].id).delete()
+        db.commit()
+        
+        assert audio_cache.release(db, [shared_key, own_key], tts=tts) == 1
+        assert os.path.exists(shared_path)
+        assert not os.path.exists(own_path)
@@ -0,0 +1,129 @@
+"""
+Tests for clause-level audio of long sentences
+"""
+import os
+import time
+from pathlib import Path
+
+import pytest
+
+from app.core.metrics import metrics
+from app.services import audio_chunks, mp3
+from app.services.tts_engines import SyntheticEngine
+from app.services.tts_service import TTSService
+
+LONG = (
+    "Tội quá em ơi, đi làm rồi mà còn dùng crack file gì nữa, "
+    "Công ty mua bản quyền cho các phần mềm hết rồi. Để anh đưa key cho em"
+)
+
+
+@pytest.fixture
+def synthesized(monkeypatch) -> list[str]:
+    """Texts the synthetic engine is asked for"""
+    texts = []
+    synthesize = SyntheticEngine.synthesize
+    
+    def record(self, text, language, voice, file_path):
+        texts.append(text)
+        synthesize(self, text, language, voice, file_path)
+    
+    monkeypatch.setattr(SyntheticEngine, "synthesize", record)
+    metrics.reset()
+    return texts
+
+
+class TestSplitClauses:
+    """Test where long text is cut"""
+    
+    def test_short_text_is_whole(self):
+        """Test text under twice the minimum is one chunk"""
+        assert audio_chunks.split_clauses("Anh ơi, cho em nhận laptop ạ", 40) == ["Anh ơi, cho em nhận laptop ạ"]
+    
+    def test_clauses_are_merged_to_the_minimum(self):
+        """Test short clauses join their neighbours, the last one included"""
+        assert audio_chunks.split_clauses(LONG, 40) == [
+            "Tội quá em ơi, đi làm rồi mà còn dùng crack file gì nữa,",
+            "Công ty mua bản quyền cho các phần mềm hết rồi. Để anh đưa key cho em",
+        ]
+    
+    def test_disabled(self):
+        """Test a minimum of 0 turns chunking off"""
+        assert audio_chunks.split_clauses(LONG, 0) == [LONG]
+
+
+class TestChunkedSynthesis:
+    """Test long sentences are assembled from cached clauses"""
+    
+    def test_joins_clauses(self, synthetic: TTSService, synthesized: list[str]):
+        """Test the sentence is its clauses' frames, one after the other"""
+        path = synthetic.generate_audio(LONG, "vi")
+        
+        clauses = audio_chunks.split_clauses(LONG)
+        assert synthesized == clauses
+        joined = b""
+        for clause in clauses:
+            chunk = Path(audio_chunks.chunk_path(synthetic, synthetic.audio_key(clause, "vi"))).read_bytes()
+            joined += mp3.extract_frames(chunk).data
+        assert Path(path).read_bytes() == joined
+        assert mp3.extract_frames(joined).data == joined
+    
+    def test_edit_resynthesizes_changed_clause(self, synthetic: TTSService, synthesized: list[str]):
+        """Test an edit to one clause leaves the others cached"""
+        synthetic.generate_audio(LONG, "vi")
+        synthesized.clear()
+        
+        synthetic.generate_audio(LONG.replace("key cho em", "license cho em"), "vi")
+        
+        assert synthesized == ["Công ty mua bản quyền cho các phần mềm hết rồi. Để anh đưa license cho em"]
+        counters = metrics.snapshot()["counters"]
+        assert counters["tts.chunks.hits"] == 1
+        assert counters["tts.chunks.misses"] == 3
+    
+    def test_reuses_sentence_audio(self, synthetic: TTSService, synthesized: list[str]):
+        """Test a clause that is a cached sentence is not synthesized again"""
+        clause = "Tội quá em ơi, đi làm rồi mà còn dùng crack file gì nữa,"
+        synthetic.generate_audio(clause, "vi")
+        synthesized.clear()
+        
+        synthetic.generate_audio(LONG, "vi")
+        
+        assert clause not in synthesized
+        assert not os.path.exists(audio_chunks.chunk_path(synthetic, synthetic.audio_key(clause, "vi")))
+    
+    def test_streams_clause_by_clause(self, synthetic: TTSService, synthesized: list[str]):
+        """Test a streaming listener gets each clause's frames as it is ready"""
+        chunks = []
+        
+        path = synthetic.generate_audio(LONG, "vi", on_chunk=chunks.append)
+        
+        assert len(chunks) == 2
+        assert b"".join(chunks) == Path(path).read_bytes()
+    
+    def test_short_sentence_is_whole(self, synthetic: TTSService, synthesized: list[str]):
+        """Test short sentences skip the clause cache"""
+        synthetic.generate_audio("Anh ơi, cho em nhận laptop ạ", "vi")
+        
+        assert synthesized == ["Anh ơi, cho em nhận laptop ạ"]
+        assert not os.path.exists(os.path.join(synthetic.audio_dir, audio_chunks.CHUNK_DIR))
+
+
+class TestChunkGarbage:
+    """Test unused clause audio is collected by age"""
+    
+    def test_collect_garbage(self, synthetic: TTSService, synthesized: list[str]):
+        """Test clauses unused past the maximum age go; recently used ones stay"""
+        synthetic.generate_audio(LONG, "vi")
+        old, recent = (
+            audio_chunks.chunk_path(synthetic, synthetic.audio_key(clause, "vi"))
+            for clause in audio_chunks.split_clauses(LONG)
+        )
+        long_ago = time.time() - 31 * 86400
+        os.utime(old, (long_ago, long_ago))
+        
+        assert audio_chunks.collect_garbage(synthetic.audio_dir, dry_run=True) == (1, os.path.getsize(old))
+        assert os.path.exists(old)
+        audio_chunks.collect_garbage(synthetic.audio_dir)
+        
+        assert not os.path.exists(old)
+        assert os.path.exists(recent)
@@ -0,0 +1,185 @@
+"""
+Tests for audio access tracking and LRU eviction
+"""
+import os
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.metrics import metrics
+from app.models.audio_file import AudioBlob, AudioFile
+from app.models.sentence import Sentence
+from app.services import audio_cache
+from app.services.audio_eviction import AudioAccessLog, AudioEvictor, cache_size, evict, evict_local
+from app.services.audio_storage import LocalAudioStorage
+from app.services.tts_service import TTSService
+from tests.conftest import TestingSessionLocal
+
+
+@pytest.fixture
+def clips(db: Session, test_sentences: list[Sentence], tts: TTSService) -> list[str]:
+    """A 100-byte English clip per sentence, served an hour, two hours and never ago"""
+    keys = []
+    now = datetime.utcnow()
+    for sentence, served in zip(test_sentences, (timedelta(hours=1), timedelta(hours=2), None)):
+        key = tts.audio_key(sentence.en_text, "en")
+        path = Path(tts.get_audio_path(key))
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(bytes(100))
+        audio_cache.record(db, sentence.id, "en", key, str(path))
+        if served:
+            db.query(AudioFile).filter(AudioFile.audio_key == key).update({"last_served_at": now - served})
+        keys.append(key)
+    # Never served: falls back to when it was made, a day ago
+    db.query(AudioBlob).filter(AudioBlob.key == keys[2]).update({"created_at": now - timedelta(days=1)})
+    db.commit()
+    return keys
+
+
+def _remaining(db: Session) -> set[str]:
+    return {key for (key,) in db.query(AudioBlob.key)}
+
+
+class TestAudioAccessLog:
+    """Test batched access tracking"""
+    
+    def test_flush_merges_accesses(self, db: Session, clips: list[str], test_sentences: list[Sentence]):
+        """Test repeated servings become one row update with a hit count"""
+        log = AudioAccessLog(session_factory=TestingSessionLocal)
+        served_at = datetime(2026, 10, 17, 12, 0, 0)
+        for seconds in (0, 30, 10):
+            log.add(test_sentences[0].id, "en", served_at + timedelta(seconds=seconds))
+        log.add(test_sentences[1].id, "en", served_at)
+        log.add(test_sentences[1].id, "vi", served_at)  # no clip yet: nothing to update
+        
+        assert len(log) == 3
+        assert log.flush() == 3
+        assert len(log) == 0
+        
+        db.expire_all()
+        first, second = (
+            db.query(AudioFile).filter(AudioFile.sentence_id == s.id, AudioFile.language == "en").one()
+            for s in test_sentences[:2]
+        )
+        assert first.hit_count == 3
+        assert first.last_served_at.replace(tzinfo=None) == served_at + timedelta(seconds=30)
+        assert second.hit_count == 1
+        assert log.flush() == 0
+    
+    def test_stop_flushes(self, db: Session, clips: list[str], test_sentences: list[Sentence]):
+        """Test pending counts are written on shutdown"""
+        log = AudioAccessLog(session_factory=TestingSessionLocal, flush_interval=3600)
+        log.start()
+        log.add(test_sentences[0].id, "en")
+        log.stop()
+        
+        db.expire_all()
+        assert db.query(AudioFile).filter(AudioFile.sentence_id == test_sentences[0].id).one().hit_count == 1
+
+
+class TestEvict:
+    """Test keeping the cache within its budget"""
+    
+    def test_evicts_least_recently_served(self, db: Session, clips: list[str], tts: TTSService):
+        """Test the oldest clips go first, rows before files, until the cache fits"""
+        result = evict(db, max_bytes=150, min_idle_seconds=0, tts=tts)
+        
+        assert result == {"blobs": 2, "bytes": 200}
+        assert _remaining(db) == {clips[0]}
+        assert {f.audio_key for f in db.query(AudioFile)} == {clips[0]}
+        assert os.path.exists(tts.get_audio_path(clips[0]))
+        assert not os.path.exists(tts.get_audio_path(clips[1]))
+        assert not os.path.exists(tts.get_audio_path(clips[2]))
+        assert cache_size(db) == 100
+        
+        counters = metrics.snapshot()["counters"]
+        assert counters["tts.cache.evictions"] == 2
+        assert counters["tts.cache.evicted_bytes"] == 200
+        assert metrics.snapshot()["gauges"]["tts.cache.bytes"] == 100
+    
+    def test_within_budget(self, db: Session, clips: list[str], tts: TTSService):
+        """Test nothing is evicted while the cache fits or without a budget"""
+        assert evict(db, max_bytes=300, min_idle_seconds=0, tts=tts) == {"blobs": 0, "bytes": 0}
+        assert evict(db, max_bytes=0, min_idle_seconds=0, tts=tts) == {"blobs": 0, "bytes": 0}
+        assert len(_remaining(db)) == 3
+    
+    def test_recently_served_are_kept(self, db: Session, clips: list[str], tts: TTSService):
+        """Test clips served within the idle window survive even over budget"""
+        result = evict(db, max_bytes=1, min_idle_seconds=90 * 60, tts=tts)
+        
+        assert result == {"blobs": 2, "bytes": 200}
+        assert _remaining(db) == {clips[0]}
+    
+    def test_evicted_clip_is_recreated(self, client, db: Session, clips: list[str], test_sentences: list[Sentence], tts: TTSService, monkeypatch):
+        """Test the next request for an evicted clip synthesizes it again"""
+        from app.config import settings
+        monkeypatch.setattr(settings, "audio_dir", tts.audio_dir)
+        monkeypatch.setattr(settings, "tts_engine", "synthetic")
+        evict(db, max_bytes=1, min_idle_seconds=0, tts=tts)
+        
+        response = client.get(f"/api/v1/audio/{test_sentences[0].id}/en")
+        
+        assert response.status_code == 200
+        assert db.query(AudioFile).filter(AudioFile.sentence_id == test_sentences[0].id).count() == 1
+
+
+class TestEvictLocal:
+    """Test keeping a node's copies of shared audio within its own budget"""
+    
+    @pytest.fixture
+    def node(self, clips: list[str], tts: TTSService, tmp_path_factory) -> TTSService:
+        """The node holding `clips`, with every clip uploaded to a shared directory"""
+        storage = LocalAudioStorage(str(tmp_path_factory.mktemp("shared")))
+        node = TTSService(audio_dir=tts.audio_dir, engine="gtts", voice="", storage=storage)
+        for key in clips:
+            node.upload(node.get_audio_path(key), "audio/mpeg")
+        return node
+    
+    def test_drops_least_recently_served_copies(self, db: Session, clips: list[str], node: TTSService):
+        """Test the oldest local copies go until the node fits, keeping rows and shared copies"""
+        result = evict_local(db, max_bytes=150, min_idle_seconds=0, tts=node)
+        
+        assert result == {"blobs": 2, "bytes": 200}
+        assert os.path.exists(node.get_audio_path(clips[0]))
+        assert not os.path.exists(node.get_audio_path(clips[1]))
+        assert not os.path.exists(node.get_audio_path(clips[2]))
+        assert _remaining(db) == set(clips)
+        assert node.fetch(node.get_audio_path(clips[2]))
+        assert metrics.snapshot()["counters"]["tts.cache.local_evictions"] == 2
+    
+    def test_copies_of_removed_blobs_go_first(self, db: Session, clips: list[str], node: TTSService):
+        """Test a copy of a blob another node evicted is dropped before any live one"""
+        orphan = Path(node.get_audio_path("f" * 64))
+        orphan.parent.mkdir(exist_ok=True)
+        orphan.write_bytes(bytes(100))
+        
+        assert evict_local(db, max_bytes=300, min_idle_seconds=0, tts=node) == {"blobs": 1, "bytes": 100}
+        assert not orphan.exists()
+        assert all(os.path.exists(node.get_audio_path(key)) for key in clips)
+    
+    def test_recent_and_unshared_copies_kept(self, db: Session, clips: list[str], node: TTSService, tts: TTSService):
+        """Test just-written copies, and a node without shared storage, are left alone"""
+        assert evict_local(db, max_bytes=1, min_idle_seconds=3600, tts=node) == {"blobs": 0, "bytes": 0}
+        assert evict_local(db, max_bytes=1, min_idle_seconds=0, tts=tts) == {"blobs": 0, "bytes": 0}
+        assert all(os.path.exists(node.get_audio_path(key)) for key in clips)
+
+
+class TestAudioEvictor:
+    """Test the background evictor"""
+    
+    def test_run_once_uses_fresh_access_times(self, db: Session, clips: list[str], test_sentences: list[Sentence], monkeypatch):
+        """Test pending accesses are flushed before ranking, saving the just-served clip"""
+        from app.config import settings
+        monkeypatch.setattr(settings, "max_audio_size_mb", 1)
+        monkeypatch.setattr(settings, "audio_evict_min_idle_seconds", 0)
+        db.query(AudioBlob).update({"file_size": 512 * 1024})
+        db.commit()
+        log = AudioAccessLog(session_factory=TestingSessionLocal)
+        log.add(test_sentences[2].id, "en")
+        
+        result = AudioEvictor(session_factory=TestingSessionLocal, access_log=log).run_once()
+        
+        assert result["blobs"] == 1
+        assert _remaining(db) == {clips[0], clips[2]}
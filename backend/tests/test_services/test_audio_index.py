@@ -0,0 +1,122 @@
+"""
+Tests for the in-process audio lookup index
+"""
+from pathlib import Path
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.metrics import metrics
+from app.models.sentence import Sentence
+from app.services import audio_cache
+from app.services.audio_eviction import evict
+from app.services.audio_index import AudioIndex
+from app.services.tts_service import TTSService
+
+
+@pytest.fixture
+def clips(db: Session, test_sentences: list[Sentence], tts: TTSService) -> list[str]:
+    """A recorded 100-byte English clip per sentence"""
+    keys = []
+    for sentence in test_sentences:
+        key = tts.audio_key(sentence.en_text, "en")
+        path = Path(tts.get_audio_path(key))
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(bytes(100))
+        audio_cache.record(db, sentence.id, "en", key, str(path))
+        keys.append(key)
+    db.commit()
+    return keys
+
+
+class TestAudioIndex:
+    """Test lookups, expiry and invalidation"""
+    
+    def test_put_and_get(self, tts: TTSService, clips: list[str]):
+        """Test an indexed clip is found with its path and size"""
+        index = AudioIndex(ttl_seconds=60)
+        path = tts.get_audio_path(clips[0])
+        
+        assert index.put(1, "en", clips[0], path)
+        entry = index.get(1, "en")
+        
+        assert entry.key == clips[0]
+        assert entry.path == path
+        assert entry.size == 100
+        assert index.get(1, "vi") is None
+        counters = metrics.snapshot()["counters"]
+        assert counters["audio_index.hits"] == 1
+        assert counters["audio_index.misses"] == 1
+    
+    def test_missing_file_not_indexed(self, tts: TTSService):
+        """Test a clip that is not on disk is left to the slow path"""
+        index = AudioIndex(ttl_seconds=60)
+        
+        assert not index.put(1, "en", "0" * 64, tts.get_audio_path("0" * 64))
+        assert index.get(1, "en") is None
+    
+    def test_entries_expire(self, tts: TTSService, clips: list[str], monkeypatch):
+        """Test entries older than the TTL are looked up again"""
+        import app.services.audio_index as module
+        index = AudioIndex(ttl_seconds=60)
+        index.put(1, "en", clips[0], tts.get_audio_path(clips[0]))
+        
+        now = module.time.monotonic()
+        monkeypatch.setattr(module.time, "monotonic", lambda: now + 61)
+        
+        assert index.get(1, "en") is None
+    
+    def test_disabled(self, tts: TTSService, clips: list[str]):
+        """Test a TTL of 0 turns the index off"""
+        index = AudioIndex(ttl_seconds=0)
+        
+        assert not index.put(1, "en", clips[0], tts.get_audio_path(clips[0]))
+        assert index.get(1, "en") is None
+    
+    def test_discard(self, tts: TTSService, clips: list[str]):
+        """Test a sentence's entries are dropped by language or all at once"""
+        index = AudioIndex(ttl_seconds=60)
+        path = tts.get_audio_path(clips[0])
+        for language in ("vi", "en"):
+            index.put(1, language, clips[0], path)
+        
+        index.discard(1, "vi")
+        assert index.get(1, "vi") is None
+        assert index.get(1, "en") is not None
+        
+        index.discard(1)
+        assert len(index) == 0
+    
+    def test_discard_keys(self, tts: TTSService, clips: list[str]):
+        """Test dropping a blob forgets every sentence sharing it"""
+        index = AudioIndex(ttl_seconds=60)
+        index.put(1, "en", clips[0], tts.get_audio_path(clips[0]))
+        index.put(2, "en", clips[0], tts.get_audio_path(clips[0]))
+        index.put(3, "en", clips[1], tts.get_audio_path(clips[1]))
+        
+        index.discard_keys([clips[0]])
+        
+        assert index.get(1, "en") is None
+        assert index.get(2, "en") is None
+        assert index.get(3, "en").key == clips[1]
+    
+    def test_warm(self, db: Session, tts: TTSService, clips: list[str], test_sentences: list[Sentence]):
+        """Test warming indexes current clips and skips those of edited sentences"""
+        test_sentences[1].en_text = "Edited since"
+        db.commit()
+        index = AudioIndex(ttl_seconds=60)
+        
+        assert index.warm(db, tts) == 2
+        assert index.get(test_sentences[0].id, "en").key == clips[0]
+        assert index.get(test_sentences[1].id, "en") is None
+        assert index.get(test_sentences[2].id, "en").key == clips[2]
+    
+    def test_eviction_discards(self, db: Session, tts: TTSService, clips: list[str], test_sentences: list[Sentence], monkeypatch):
+        """Test evicted blobs leave the process-wide index"""
+        from app.services.audio_index import audio_index
+        monkeypatch.setattr(audio_index, "ttl_seconds", 60)
+        audio_index.warm(db, tts)
+        
+        evict(db, max_bytes=250, min_idle_seconds=0, tts=tts)
+        
+        assert len(audio_index) == 2
@@ -0,0 +1,117 @@
+"""
+Tests for per-lesson audio sprites
+"""
+import os
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core.metrics import metrics
+from app.models.sentence import Sentence
+from app.services import audio_sprite
+from app.services.tts_service import TTSService
+from tests.conftest import make_mp3
+
+
+def _cache(parts: list[audio_sprite.Segment], frames: dict[int, int]) -> None:
+    """Write each segment's blob: `frames[sentence_id]` frames filled with the sentence id"""
+    tts = TTSService()
+    for part in parts:
+        path = tts.get_audio_path(part.key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(make_mp3(frames[part.sentence_id], fill=part.sentence_id, id3=True, xing=True))
+
+
+def _counter(name: str) -> float:
+    return metrics.snapshot()["counters"].get(f"audio_sprite.{name}", 0)
+
+
+class TestAudioSprite:
+    """Test building and incrementally rebuilding sprites"""
+    
+    def test_build(self, db: Session, audio_dir, test_sentences: list[Sentence]):
+        """Test segments are joined in lesson order with byte and time offsets"""
+        lesson_id = test_sentences[0].lesson_id
+        parts = audio_sprite.segments(db, lesson_id, "en")
+        frames = {s.id: n for s, n in zip(test_sentences, (10, 20, 5))}
+        _cache(parts, frames)
+        
+        manifest = audio_sprite.build(lesson_id, "en", parts)
+        
+        assert [s["sentence_id"] for s in manifest["segments"]] == [s.id for s in test_sentences]
+        assert [(s["offset"], s["length"]) for s in manifest["segments"]] == [(0, 960), (960, 1920), (2880, 480)]
+        assert [s["start"] for s in manifest["segments"]] == pytest.approx([0.0, 0.24, 0.72])
+        assert manifest["duration"] == pytest.approx(0.84)
+        assert manifest["size"] == 3360
+        
+        with open(audio_sprite.sprite_path(lesson_id, "en", manifest["version"]), "rb") as f:
+            data = f.read()
+        assert data == b"".join(make_mp3(frames[s.id], fill=s.id) for s in test_sentences)
+        assert audio_sprite.load_manifest(lesson_id, "en") == manifest
+    
+    def test_build_is_cached(self, db: Session, audio_dir, test_sentences: list[Sentence]):
+        """Test an unchanged lesson reuses its sprite"""
+        lesson_id = test_sentences[0].lesson_id
+        parts = audio_sprite.segments(db, lesson_id, "en")
+        _cache(parts, {s.id: 3 for s in test_sentences})
+        
+        first = audio_sprite.build(lesson_id, "en", parts)
+        second = audio_sprite.build(lesson_id, "en", parts)
+        
+        assert second == first
+        assert _counter("builds") == 1
+        assert _counter("hits") == 1
+    
+    def test_rebuild_is_incremental(self, db: Session, audio_dir, test_sentences: list[Sentence]):
+        """Test an edit re-reads only the edited sentence and drops the old sprite"""
+        lesson_id = test_sentences[0].lesson_id
+        parts = audio_sprite.segments(db, lesson_id, "en")
+        _cache(parts, {s.id: 3 for s in test_sentences})
+        first = audio_sprite.build(lesson_id, "en", parts)
+        
+        test_sentences[1].en_text = "Bye"
+        db.commit()
+        parts = audio_sprite.segments(db, lesson_id, "en")
+        assert audio_sprite.missing_audio(lesson_id, "en", parts) == [parts[1]]
+        _cache([parts[1]], {test_sentences[1].id: 7})
+        # The unchanged blobs are not needed any more
+        for part in (parts[0], parts[2]):
+            os.remove(TTSService().get_audio_path(part.key))
+        
+        second = audio_sprite.build(lesson_id, "en", parts)
+        
+        assert second["version"] != first["version"]
+        assert _counter("segments_parsed") == 4
+        assert _counter("segments_reused") == 2
+        assert [s["length"] for s in second["segments"]] == [288, 672, 288]
+        assert not os.path.exists(audio_sprite.sprite_path(lesson_id, "en", first["version"]))
+        with open(audio_sprite.sprite_path(lesson_id, "en", second["version"]), "rb") as f:
+            assert f.read() == b"".join(
+                make_mp3(n, fill=s.id) for s, n in zip(test_sentences, (3, 7, 3))
+            )
+    
+    def test_version_follows_order(self, db: Session, audio_dir, test_sentences: list[Sentence]):
+        """Test reordering sentences changes the version"""
+        lesson_id = test_sentences[0].lesson_id
+        before = audio_sprite.version(audio_sprite.segments(db, lesson_id, "en"))
+        
+        test_sentences[0].order_index = 10
+        db.commit()
+        
+        after = audio_sprite.segments(db, lesson_id, "en")
+        assert after[-1].sentence_id == test_sentences[0].id
+        assert audio_sprite.version(after) != before
+    
+    def test_missing_sprite_file_rebuilds(self, db: Session, audio_dir, test_sentences: list[Sentence]):
+        """Test a manifest whose sprite was deleted is ignored"""
+        lesson_id = test_sentences[0].lesson_id
+        parts = audio_sprite.segments(db, lesson_id, "en")
+        _cache(parts, {s.id: 3 for s in test_sentences})
+        manifest = audio_sprite.build(lesson_id, "en", parts)
+        
+        os.remove(audio_sprite.sprite_path(lesson_id, "en", manifest["version"]))
+        
+        assert audio_sprite.load_manifest(lesson_id, "en") is None
+        assert audio_sprite.build(lesson_id, "en", parts) == manifest
+        assert _counter("builds") == 2
@@ -0,0 +1,154 @@
+"""
+Tests for shared audio storage backends
+"""
+import os
+from unittest.mock import patch
+
+import pytest
+
+from app.core.metrics import metrics
+from app.services.audio_storage import LocalAudioStorage, S3AudioStorage
+from app.services.tts_service import TTSService
+
+
+pytestmark = pytest.mark.usefixtures("audio_dir")
+
+
+def _nodes(tmp_path, storage) -> tuple[TTSService, TTSService]:
+    """Two backend nodes, each with its own audio_dir, sharing `storage`"""
+    return (
+        TTSService(audio_dir=str(tmp_path / "node-a"), engine="synthetic", storage=storage),
+        TTSService(audio_dir=str(tmp_path / "node-b"), engine="synthetic", storage=storage),
+    )
+
+
+class TestLocalAudioStorage:
+    """Test a shared directory as storage"""
+    
+    def test_one_synthesis_serves_every_node(self, tmp_path):
+        """Test the second node downloads what the first synthesized"""
+        node_a, node_b = _nodes(tmp_path, LocalAudioStorage(str(tmp_path / "shared")))
+        path_a = node_a.generate_audio("Xin chào", "vi")
+        
+        with patch("app.services.tts_engines.SyntheticEngine.synthesize") as synthesize:
+            path_b = node_b.generate_audio("Xin chào", "vi")
+        
+        synthesize.assert_not_called()
+        assert open(path_a, "rb").read() == open(path_b, "rb").read()
+        assert os.path.exists(tmp_path / "shared" / node_a.storage_name(path_a))
+        counters = metrics.snapshot()["counters"]
+        assert counters["tts.storage.uploads"] == 1
+        assert counters["tts.storage.fetches"] == 1
+    
+    def test_delete_blob_deletes_shared_copies(self, tmp_path):
+        """Test deleting a blob removes it, and its variants, from the storage"""
+        storage = LocalAudioStorage(str(tmp_path / "shared"))
+        node_a, _ = _nodes(tmp_path, storage)
+        key = node_a.audio_key("Hello", "en")
+        path = node_a.generate_audio("Hello", "en")
+        variant = os.path.join(os.path.dirname(path), f"{key}.opus.ogg")
+        open(variant, "wb").close()
+        node_a.upload(variant, "audio/ogg")
+        
+        node_a.delete_blob(key)
+        
+        assert os.listdir(tmp_path / "shared" / key[:2]) == []
+        assert not node_a.fetch(path)
+    
+    def test_node_local_default(self, tmp_path):
+        """Test without a shared directory nothing is copied anywhere"""
+        storage = LocalAudioStorage()
+        tts = TTSService(audio_dir=str(tmp_path), engine="synthetic", storage=storage)
+        
+        path = tts.generate_audio("Hello", "en")
+        
+        assert os.listdir(tmp_path) == [tts.audio_key("Hello", "en")[:2]]
+        assert tts.fetch(path)
+        assert storage.presigned_url(tts.storage_name(path)) is None
+    
+    def test_upload_failure_keeps_local_copy(self, tmp_path):
+        """Test a storage outage does not fail synthesis"""
+        storage = LocalAudioStorage(str(tmp_path / "shared"))
+        tts = TTSService(audio_dir=str(tmp_path / "node"), engine="synthetic", storage=storage)
+        
+        with patch.object(storage, "put", side_effect=OSError("read-only file system")):
+            path = tts.generate_audio("Hello", "en")
+        
+        assert os.path.exists(path)
+        assert metrics.snapshot()["counters"]["tts.storage.upload_failures"] == 1
+
+
+    def test_stored(self, tmp_path):
+        """Test only copies the storage has count as stored, and confirmations are remembered"""
+        storage = LocalAudioStorage(str(tmp_path / "shared"))
+        tts = TTSService(audio_dir=str(tmp_path / "node"), engine="synthetic", storage=storage)
+        with patch.object(storage, "put", side_effect=OSError("read-only file system")):
+            path = tts.generate_audio("Hello", "en")
+        
+        assert not tts.stored(path)
+        tts.upload(path, "audio/mpeg")
+        with patch.object(storage, "exists") as exists:
+            assert tts.stored(path)
+        exists.assert_not_called()
+        
+        tts.delete_blob(tts.audio_key("Hello", "en"))
+        assert not tts.stored(path)
+
+
+class TestS3AudioStorage:
+    """Test the S3 backend against moto's in-memory S3"""
+    
+    @pytest.fixture
+    def s3(self):
+        boto3 = pytest.importorskip("boto3")
+        moto = pytest.importorskip("moto")
+        mock = getattr(moto, "mock_aws", None) or moto.mock_s3
+        with mock():
+            client = boto3.client("s3", region_name="us-east-1")
+            client.create_bucket(Bucket="audio")
+            yield S3AudioStorage(client, "audio", prefix="cache/", presign_seconds=600)
+    
+    def test_one_synthesis_serves_every_node(self, tmp_path, s3):
+        """Test the second node downloads what the first uploaded"""
+        node_a, node_b = _nodes(tmp_path, s3)
+        path_a = node_a.generate_audio("Hello", "en")
+        
+        with patch("app.services.tts_engines.SyntheticEngine.synthesize") as synthesize:
+            path_b = node_b.generate_audio("Hello", "en")
+        
+        synthesize.assert_not_called()
+        assert open(path_a, "rb").read() == open(path_b, "rb").read()
+        head = s3.client.head_object(Bucket="audio", Key="cache/" + node_a.storage_name(path_a))
+        assert head["ContentType"] == "audio/mpeg"
+    
+    def test_fetch_missing(self, tmp_path, s3):
+        """Test a missing object is a miss, not an error"""
+        assert not s3.fetch("ab/missing.mp3", str(tmp_path / "missing.mp3"))
+        assert not s3.exists("ab/missing.mp3")
+    
+    def test_exists(self, tmp_path, s3):
+        """Test an uploaded object exists"""
+        source = tmp_path / "clip"
+        source.write_bytes(b"audio")
+        s3.put("ab/abc.mp3", str(source), "audio/mpeg")
+        
+        assert s3.exists("ab/abc.mp3")
+    
+    def test_delete_prefix(self, tmp_path, s3):
+        """Test a blob and its variants are deleted together"""
+        source = tmp_path / "clip"
+        source.write_bytes(b"audio")
+        for name in ("ab/abc.mp3", "ab/abc.opus.ogg", "ab/abd.mp3"):
+            s3.put(name, str(source), "audio/mpeg")
+        
+        s3.delete_prefix("ab/abc.")
+        
+        listed = s3.client.list_objects_v2(Bucket="audio")["Contents"]
+        assert [item["Key"] for item in listed] == ["cache/ab/abd.mp3"]
+    
+    def test_presigned_url(self, s3):
+        """Test clients get a signed, expiring URL for the object"""
+        url = s3.presigned_url("ab/abc.mp3")
+        
+        assert "cache/ab/abc.mp3" in url
+        assert "Expires=" in url or "X-Amz-Expires=600" in url
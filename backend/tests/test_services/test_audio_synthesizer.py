@@ -0,0 +1,147 @@
+"""
+Tests for off-loop audio synthesis
+"""
+import asyncio
+import os
+import threading
+import pytest
+
+from app.core.exceptions import BadRequestException, ServiceUnavailableException
+from app.core.metrics import metrics
+from app.services.audio_synthesizer import AudioSynthesizer
+from app.services.tts_service import TTSService
+
+
+class TestAudioSynthesizer:
+    """Test the bounded, single-flight synthesizer"""
+    
+    def test_concurrent_requests_share_one_job(self, audio_dir, monkeypatch):
+        """Test ten requests for the same audio synthesize it once, off the event loop"""
+        release = threading.Event()
+        calls = []
+        
+        def slow_generate(self, text, language):
+            calls.append((text, language))
+            release.wait(timeout=5)
+            return f"{audio_dir}/{language}.mp3"
+        
+        monkeypatch.setattr("app.services.tts_service.TTSService.generate_audio", slow_generate)
+        synthesizer = AudioSynthesizer(max_workers=2, max_pending=8)
+        
+        async def scenario():
+            tasks = [asyncio.create_task(synthesizer.get("k1", "en", "Hello")) for _ in range(10)]
+            # The loop keeps running while the job blocks in its thread
+            await asyncio.sleep(0.05)
+            assert not any(task.done() for task in tasks)
+            release.set()
+            return await asyncio.gather(*tasks)
+        
+        try:
+            paths = asyncio.run(scenario())
+        finally:
+            synthesizer.shutdown()
+        
+        assert calls == [("Hello", "en")]
+        assert set(paths) == {f"{audio_dir}/en.mp3"}
+        snapshot = metrics.snapshot()
+        assert snapshot["counters"]["tts.deduplicated"] == 9
+        assert snapshot["timers"]["tts.synthesis"]["count"] == 1
+        assert snapshot["timers"]["tts.queue_wait"]["count"] == 1
+        assert snapshot["gauges"]["tts.pending"] == 0
+    
+    def test_cached_audio_skips_executor(self, audio_dir, monkeypatch):
+        """Test an existing file is served without submitting a job"""
+        key = TTSService().audio_key("Xin chào", "vi")
+        path = TTSService().get_audio_path(key)
+        os.makedirs(os.path.dirname(path))
+        with open(path, "wb") as f:
+            f.write(b"mp3")
+        synthesizer = AudioSynthesizer()
+        monkeypatch.setattr(synthesizer, "submit", lambda *args: pytest.fail("should not synthesize"))
+        
+        assert asyncio.run(synthesizer.get(key, "vi", "Xin chào")) == path
+        assert metrics.snapshot()["counters"]["tts.cache.hits"] == 1
+    
+    def test_rejects_when_full(self, audio_dir, monkeypatch):
+        """Test misses beyond max_pending are refused instead of queued"""
+        release = threading.Event()
+        monkeypatch.setattr(
+            "app.services.tts_service.TTSService.generate_audio",
+            lambda self, text, language: release.wait(timeout=5) and "done",
+        )
+        synthesizer = AudioSynthesizer(max_workers=1, max_pending=1)
+        try:
+            first = synthesizer.submit("k1", "en", "Hello")
+            assert synthesizer.submit("k1", "en", "Hello") is first
+            with pytest.raises(ServiceUnavailableException):
+                synthesizer.submit("k2", "en", "Bye")
+            release.set()
+            assert first.result(timeout=5) == "done"
+        finally:
+            synthesizer.shutdown()
+        assert metrics.snapshot()["counters"]["tts.rejected"] == 1
+    
+    def test_stream_shares_chunks_as_produced(self, audio_dir, monkeypatch):
+        """Test readers of a streamed job get every chunk, early ones included, before it ends"""
+        release = threading.Event()
+        
+        def streaming_generate(self, text, language, on_chunk=None):
+            on_chunk(b"ab")
+            release.wait(timeout=5)
+            on_chunk(b"cd")
+            return f"{audio_dir}/{language}.mp3"
+        
+        monkeypatch.setattr("app.services.tts_service.TTSService.generate_audio", streaming_generate)
+        synthesizer = AudioSynthesizer(max_workers=1, max_pending=4)
+        try:
+            first = synthesizer.stream("k1", "en", "Hello")
+            first.ready.result(timeout=5)
+            reader = iter(first)
+            assert next(reader) == b"ab"  # before the synthesis ends
+            
+            late = synthesizer.stream("k1", "en", "Hello")
+            assert late is first
+            release.set()
+            assert next(reader) == b"cd"
+            assert list(reader) == []
+            assert b"".join(late) == b"abcd"
+        finally:
+            synthesizer.shutdown()
+        
+        assert first.path == f"{audio_dir}/en.mp3"
+        snapshot = metrics.snapshot()
+        assert snapshot["counters"]["tts.deduplicated"] == 1
+        assert snapshot["timers"]["tts.first_chunk"]["count"] == 1
+    
+    def test_stream_of_whole_file(self, audio_dir, monkeypatch):
+        """Test a job that produces no chunks (fetched, or a non-streaming engine) streams its file"""
+        path = audio_dir / "en.mp3"
+        path.write_bytes(b"mp3 audio")
+        monkeypatch.setattr(
+            "app.services.tts_service.TTSService.generate_audio",
+            lambda self, text, language, on_chunk=None: str(path),
+        )
+        synthesizer = AudioSynthesizer()
+        try:
+            stream = synthesizer.stream("k1", "en", "Hello")
+            
+            assert b"".join(stream) == b"mp3 audio"
+        finally:
+            synthesizer.shutdown()
+    
+    def test_stream_failure(self, audio_dir, monkeypatch):
+        """Test a failure before the first chunk surfaces on `ready` and for readers"""
+        def broken(self, text, language, on_chunk=None):
+            raise BadRequestException("Failed to generate audio: offline")
+        
+        monkeypatch.setattr("app.services.tts_service.TTSService.generate_audio", broken)
+        synthesizer = AudioSynthesizer()
+        try:
+            stream = synthesizer.stream("k1", "en", "Hello")
+            
+            with pytest.raises(BadRequestException):
+                stream.ready.result(timeout=5)
+            with pytest.raises(BadRequestException):
+                list(stream)
+        finally:
+            synthesizer.shutdown()
@@ -0,0 +1,136 @@
+"""
+Tests for transcoded audio variants
+"""
+import os
+import subprocess
+from unittest.mock import patch
+
+import pytest
+
+from app.config import settings
+from app.core.metrics import metrics
+from app.services import audio_variants
+from app.services.tts_service import TTSService
+from tests.conftest import fake_ffmpeg
+
+
+@pytest.fixture
+def cached(tts: TTSService):
+    """A cached gTTS clip: (tts, key)"""
+    key = tts.audio_key("Hello", "en")
+    path = tts.get_audio_path(key)
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as f:
+        f.write(b"mp3")
+    return tts, key
+
+
+class TestNegotiate:
+    """Test variant selection"""
+    
+    @pytest.mark.parametrize("accept, quality, expected", [
+        (None, None, "original"),
+        ("*/*", None, "original"),
+        ("audio/mpeg", None, "original"),
+        ("audio/ogg", None, "opus"),
+        ("audio/ogg; codecs=opus, audio/mpeg;q=0.5", None, "opus"),
+        ("audio/webm,audio/ogg,audio/wav,audio/*;q=0.9,*/*;q=0.5", None, "opus"),
+        ("audio/mpeg, audio/ogg;q=0.3", None, "original"),
+        ("audio/ogg;q=0", None, "original"),
+        ("audio/ogg", "high", "original"),
+        ("*/*", "medium", "mp3-16k"),
+        (None, "low", "opus"),
+    ])
+    def test_mp3_engine(self, monkeypatch, accept, quality, expected):
+        """Test Opus needs to be asked for by name; quality overrides Accept"""
+        monkeypatch.setattr(settings, "tts_engine", "gtts")
+        
+        assert audio_variants.negotiate(accept, quality).name == expected
+    
+    @pytest.mark.parametrize("accept, expected", [
+        ("*/*", ("original", "audio/wav")),
+        ("audio/mpeg", ("mp3-16k", "audio/mpeg")),
+        ("audio/wav, audio/mpeg", ("original", "audio/wav")),
+    ])
+    def test_wav_engine(self, monkeypatch, tmp_path, accept, expected):
+        """Test WAV is labelled as such and converted for MP3-only clients"""
+        monkeypatch.setattr(settings, "tts_engine", "pyttsx3")
+        variant = audio_variants.negotiate(accept, None, TTSService(audio_dir=str(tmp_path)))
+        
+        assert (variant.name, variant.media_type) == expected
+
+
+class TestTranscode:
+    """Test producing and caching variants"""
+    
+    def test_transcode(self, cached):
+        """Test a variant is encoded once and stored beside its blob"""
+        tts, key = cached
+        opus = audio_variants.VARIANTS["opus"]
+        with patch("app.services.audio_variants.available", return_value=True), \
+                patch("subprocess.run", side_effect=fake_ffmpeg) as run:
+            first = audio_variants.transcode(key, opus, tts)
+            second = audio_variants.transcode(key, opus, tts)
+        
+        assert first == second == os.path.join(tts.audio_dir, key[:2], f"{key}.opus.ogg")
+        assert run.call_count == 1
+        with open(first, "rb") as f:
+            assert f.read() == b"libopusmp3"
+        assert sorted(os.listdir(os.path.dirname(first))) == [f"{key}.mp3", f"{key}.opus.ogg"]
+        assert metrics.snapshot()["counters"]["audio_variants.transcodes"] == 1
+    
+    def test_transcode_without_ffmpeg(self, cached, monkeypatch):
+        """Test a missing ffmpeg means no variant"""
+        tts, key = cached
+        monkeypatch.setattr(settings, "ffmpeg_path", "/nonexistent/ffmpeg")
+        
+        assert audio_variants.transcode(key, audio_variants.VARIANTS["opus"], tts) is None
+        assert metrics.snapshot()["counters"]["audio_variants.unavailable"] == 1
+    
+    def test_transcode_failure(self, cached):
+        """Test a failed encode leaves nothing behind"""
+        tts, key = cached
+        error = subprocess.CalledProcessError(1, "ffmpeg", stderr=b"Unknown encoder")
+        with patch("app.services.audio_variants.available", return_value=True), \
+                patch("subprocess.run", side_effect=error):
+            assert audio_variants.transcode(key, audio_variants.VARIANTS["mp3-16k"], tts) is None
+        
+        assert os.listdir(os.path.dirname(tts.get_audio_path(key))) == [f"{key}.mp3"]
+        assert metrics.snapshot()["counters"]["audio_variants.failed"] == 1
+    
+    def test_resolve(self, cached, monkeypatch):
+        """Test a variant resolves to the original when it is not cached and cannot be made"""
+        tts, key = cached
+        opus = audio_variants.VARIANTS["opus"]
+        with patch("app.services.audio_variants.available", return_value=True):
+            assert audio_variants.resolve(key, opus, tts) == opus
+        
+        with patch("app.services.audio_variants.available", return_value=False):
+            assert audio_variants.resolve(key, opus, tts).name == audio_variants.ORIGINAL
+            open(audio_variants.variant_path(key, opus, tts), "wb").close()
+            assert audio_variants.resolve(key, opus, tts) == opus
+    
+    def test_failed_transcode_retried_later(self, cached, monkeypatch):
+        """Test a failed variant resolves to the original until the failure expires"""
+        tts, key = cached
+        variant = audio_variants.VARIANTS["mp3-16k"]
+        error = subprocess.CalledProcessError(1, "ffmpeg", stderr=b"Unknown encoder")
+        with patch("app.services.audio_variants.available", return_value=True):
+            with patch("subprocess.run", side_effect=error):
+                audio_variants.transcode(key, variant, tts)
+            assert audio_variants.resolve(key, variant, tts).name == audio_variants.ORIGINAL
+            
+            monkeypatch.setattr(audio_variants, "FAILURE_TTL_SECONDS", 0)
+            assert audio_variants.resolve(key, variant, tts) == variant
+    
+    def test_delete_blob_removes_variants(self, cached):
+        """Test variants go with their blob"""
+        tts, key = cached
+        with patch("app.services.audio_variants.available", return_value=True), \
+                patch("subprocess.run", side_effect=fake_ffmpeg):
+            audio_variants.transcode(key, audio_variants.VARIANTS["opus"], tts)
+            audio_variants.transcode(key, audio_variants.VARIANTS["mp3-16k"], tts)
+        
+        tts.delete_blob(key)
+        
+        assert os.listdir(os.path.dirname(tts.get_audio_path(key))) == []
@@ -0,0 +1,82 @@
+"""
+Tests for the all-lessons corpus index
+"""
+import threading
+
+from sqlalchemy.orm import Session
+
+from app.models.lesson import Lesson
+from app.models.sentence import Sentence
+from app.services.corpus_index import Corpus, CorpusIndex
+from app.services.lesson_pool import lesson_pool_index
+
+
+def add_lesson(db: Session, title: str, order_index: int, size: int, is_active: bool = True) -> Lesson:
+    lesson = Lesson(title=title, order_index=order_index, is_active=is_active)
+    db.add(lesson)
+    db.flush()
+    db.add_all([
+        Sentence(lesson_id=lesson.id, vi_text=f"{title} {i}", en_text=f"{title} {i}", order_index=i)
+        for i in range(size)
+    ])
+    db.commit()
+    return lesson
+
+
+class TestCorpusIndex:
+    """Test corpus building, sampling and invalidation"""
+    
+    def test_groups_active_lessons(self, db: Session):
+        """Test sentence ids are grouped by lesson in lesson order, inactive lessons left out"""
+        second = add_lesson(db, "B", 2, 2)
+        first = add_lesson(db, "A", 1, 3)
+        add_lesson(db, "Hidden", 3, 4, is_active=False)
+        
+        corpus = CorpusIndex().get(db)
+        
+        assert len(corpus) == 5
+        assert list(corpus.lesson_ids) == [first.id, second.id]
+        assert list(corpus.offsets) == [0, 3, 5]
+        assert corpus.lesson_size(1) == 2
+    
+    def test_sample_sentences_distinct(self, db: Session):
+        """Test uniform samples never repeat and are capped at the corpus size"""
+        add_lesson(db, "A", 1, 3)
+        corpus = CorpusIndex().get(db)
+        
+        assert sorted(corpus.sample_sentences(10)) == sorted(corpus.sentence_ids)
+    
+    def test_propose_lessons_by_size(self, db: Session):
+        """Test lesson proposals follow lesson sizes"""
+        small = add_lesson(db, "A", 1, 1)
+        large = add_lesson(db, "B", 2, 9)
+        corpus = CorpusIndex().get(db)
+        
+        proposals = corpus.propose_lessons(2000)
+        share = sum(1 for lesson_id, _ in proposals if lesson_id == large.id) / len(proposals)
+        assert 0.85 < share < 0.95
+        assert dict(proposals)[small.id] == 1
+    
+    def test_rebuilt_after_invalidation(self, db: Session):
+        """Test any lesson invalidation refreshes the corpus"""
+        index = CorpusIndex(ttl_seconds=3600)
+        add_lesson(db, "A", 1, 3)
+        assert index.get(db) is index.get(db)
+        
+        add_lesson(db, "B", 2, 2)
+        lesson_pool_index.invalidate(None)
+        assert len(index.get(db)) == 5
+    
+    def test_waiting_miss_uses_concurrent_rebuild(self, db: Session):
+        """Test a miss that waited for another rebuild returns its corpus instead of rebuilding again"""
+        index = CorpusIndex(ttl_seconds=3600)
+        results = []
+        
+        with index._lock:
+            waiter = threading.Thread(target=lambda: results.append(index.get(db)))
+            waiter.start()
+            waiter.join(0.1)
+            rebuilt = index._corpus = Corpus(lesson_pool_index.revision, [])  # the concurrent rebuild
+        waiter.join()
+        
+        assert results == [rebuilt]
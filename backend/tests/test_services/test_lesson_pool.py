@@ -0,0 +1,81 @@
+"""
+Tests for the in-process lesson pool index
+"""
+from sqlalchemy.orm import Session
+
+from app.core.metrics import metrics
+from app.models.lesson import Lesson
+from app.models.sentence import Sentence
+from app.services.lesson_pool import LessonPoolIndex
+
+
+class TestLessonPoolIndex:
+    """Test pool building, versioning and counters"""
+    
+    def test_get_builds_pool_in_order(self, db: Session, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test pool holds the lesson's sentences ordered by order_index"""
+        index = LessonPoolIndex()
+        pool = index.get(db, test_lesson.id)
+        
+        assert len(pool) == 3
+        assert list(pool.ids) == [s.id for s in test_sentences]
+        assert test_sentences[1].id in pool
+        
+        sentence = pool.sentence(1)
+        assert sentence.id == test_sentences[1].id
+        assert sentence.lesson_id == test_lesson.id
+        assert sentence.vi_text == "Tạm biệt"
+        assert sentence.en_text == "Goodbye"
+    
+    def test_get_reuses_pool_until_invalidated(self, db: Session, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test reads hit the cached pool and invalidation forces a rebuild"""
+        index = LessonPoolIndex()
+        first = index.get(db, test_lesson.id)
+        assert index.get(db, test_lesson.id) is first
+        
+        db.add(Sentence(lesson_id=test_lesson.id, vi_text="Vâng", en_text="Yes", order_index=4))
+        db.commit()
+        assert len(index.get(db, test_lesson.id)) == 3
+        
+        index.invalidate(test_lesson.id)
+        rebuilt = index.get(db, test_lesson.id)
+        assert rebuilt is not first
+        assert len(rebuilt) == 4
+        assert rebuilt.version > first.version
+    
+    def test_invalidate_all(self, db: Session, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test invalidating without ids drops every pool"""
+        index = LessonPoolIndex()
+        first = index.get(db, test_lesson.id)
+        
+        index.invalidate()
+        
+        assert index.get(db, test_lesson.id) is not first
+    
+    def test_expired_pool_is_rebuilt(self, db: Session, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test TTL bounds staleness"""
+        index = LessonPoolIndex(ttl_seconds=0)
+        first = index.get(db, test_lesson.id)
+        
+        assert index.get(db, test_lesson.id) is not first
+    
+    def test_empty_lesson_not_cached(self, db: Session, test_lesson: Lesson):
+        """Test empty pools are returned but not kept"""
+        index = LessonPoolIndex()
+        
+        assert len(index.get(db, test_lesson.id)) == 0
+        assert len(index.get(db, 99999)) == 0
+        assert index._pools == {}
+    
+    def test_counters(self, db: Session, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test hit/miss counters and rebuild timer"""
+        index = LessonPoolIndex()
+        index.get(db, test_lesson.id)
+        index.get(db, test_lesson.id)
+        index.get(db, test_lesson.id)
+        
+        snapshot = metrics.snapshot()
+        assert snapshot["counters"]["lesson_pool.hits"] == 2
+        assert snapshot["counters"]["lesson_pool.misses"] == 1
+        assert snapshot["ratios"]["lesson_pool.hit_rate"] == round(2 / 3, 4)
+        assert snapshot["timers"]["lesson_pool.rebuild"]["count"] == 1
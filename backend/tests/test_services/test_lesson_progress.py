@@ -0,0 +1,122 @@
+"""
+Tests for the per-lesson progress rollup
+"""
+from datetime import datetime, timedelta
+from sqlalchemy.orm import Session
+
+from app.models.lesson import Lesson
+from app.models.progress import UserLessonProgress, UserProgress
+from app.models.sentence import Sentence
+from app.models.user import User
+from app.services import lesson_progress, srs
+from app.services.practice_service import PracticeService
+from app.services.srs import Review
+
+
+class TestLessonProgress:
+    """Test user_lesson_progress maintenance"""
+    
+    def test_record_practice_updates_rollup(self, db: Session, test_user: User, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test first practices add to the distinct count, repeats only to the total"""
+        PracticeService.record_practice(db, test_user, test_sentences[0].id)
+        PracticeService.record_practice(db, test_user, test_sentences[0].id)
+        PracticeService.record_practice(db, test_user, test_sentences[1].id)
+        
+        assert lesson_progress.get(db, test_user.id, test_lesson.id) == (2, 3)
+        assert lesson_progress.totals(db, test_user.id) == (2, 3)
+        assert lesson_progress.find_drift(db) == []
+    
+    def test_batch_with_repeats(self, db: Session, test_user: User, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test a batch mixing new and already practiced sentences"""
+        PracticeService.record_practice(db, test_user, test_sentences[0].id)
+        PracticeService.record_practice_batch(db, test_user, [
+            Review(None, test_sentences[0].id, count=2),
+            Review(None, test_sentences[1].id, count=4),
+            Review(None, test_sentences[0].id),
+        ])
+        
+        assert lesson_progress.get(db, test_user.id, test_lesson.id) == (2, 8)
+        assert lesson_progress.find_drift(db) == []
+    
+    def test_racing_first_practices_count_once(self, db: Session, test_user: User, test_lesson: Lesson, test_sentences: list[Sentence], monkeypatch):
+        """Test a first practice that another request records mid-way is counted by one of them only"""
+        lessons_of = lesson_progress.lessons_of
+        
+        def interleave(db, sentence_ids):
+            monkeypatch.setattr(lesson_progress, "lessons_of", lessons_of)
+            srs.record_review(db, test_user.id, test_sentences[0].id)  # the other request
+            return lessons_of(db, sentence_ids)
+        
+        monkeypatch.setattr(lesson_progress, "lessons_of", interleave)
+        srs.record_review(db, test_user.id, test_sentences[0].id)
+        db.commit()
+        
+        assert lesson_progress.get(db, test_user.id, test_lesson.id) == (1, 2)
+        assert lesson_progress.find_drift(db) == []
+    
+    def test_unknown_user_lesson_reads_zero(self, db: Session, test_user: User):
+        """Test reads without a rollup row"""
+        assert lesson_progress.get(db, test_user.id, 99999) == (0, 0)
+        assert lesson_progress.totals(db, test_user.id) == (0, 0)
+    
+    def test_find_drift_and_rebuild(self, db: Session, test_user: User, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test the checker reports rows written behind the rollup's back and rebuild fixes them"""
+        for sentence in test_sentences[:2]:
+            db.add(UserProgress(
+                user_id=test_user.id,
+                sentence_id=sentence.id,
+                practiced_count=3,
+                last_practiced_at=datetime.utcnow() - timedelta(days=1),
+            ))
+        db.commit()
+        
+        drift = lesson_progress.find_drift(db)
+        assert drift == [{
+            "user_id": str(test_user.id),
+            "lesson_id": test_lesson.id,
+            "expected": (2, 6),
+            "actual": (0, 0),
+        }]
+        
+        assert lesson_progress.rebuild(db) == 1
+        assert lesson_progress.find_drift(db) == []
+        row = db.query(UserLessonProgress).one()
+        assert (row.practiced_count, row.total_practice_count) == (2, 6)
+    
+    def test_refresh_after_move(self, db: Session, test_user: User, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test moving a sentence shifts its history to the new lesson"""
+        other = Lesson(title="Other", order_index=2)
+        db.add(other)
+        db.commit()
+        PracticeService.record_practice(db, test_user, test_sentences[0].id)
+        PracticeService.record_practice(db, test_user, test_sentences[1].id)
+        
+        test_sentences[0].lesson_id = other.id
+        db.flush()
+        lesson_progress.refresh(db, [test_lesson.id, other.id])
+        db.commit()
+        
+        assert lesson_progress.get(db, test_user.id, test_lesson.id) == (1, 1)
+        assert lesson_progress.get(db, test_user.id, other.id) == (1, 1)
+        assert lesson_progress.find_drift(db) == []
+    
+    def test_move_carries_progress_rows(self, db: Session, test_user: User, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test a moved sentence's progress row and reviews follow it to the new lesson"""
+        other = Lesson(title="Other", order_index=2)
+        db.add(other)
+        db.commit()
+        PracticeService.record_practice(db, test_user, test_sentences[0].id)
+        progress = db.query(UserProgress).one()
+        assert progress.lesson_id == test_lesson.id
+        
+        test_sentences[0].lesson_id = other.id
+        db.flush()
+        lesson_progress.move(db, [test_sentences[0].id], test_lesson.id, other.id)
+        db.commit()
+        
+        db.refresh(progress)
+        assert progress.lesson_id == other.id
+        due = datetime.utcnow() + timedelta(days=2)
+        assert PracticeService._due(db, test_user, other.id, due, 10) == [test_sentences[0].id]
+        assert PracticeService._due(db, test_user, test_lesson.id, due, 10) == []
+        assert lesson_progress.get(db, test_user.id, other.id) == (1, 1)
@@ -0,0 +1,61 @@
+"""
+Tests for MP3 frame parsing
+"""
+import pytest
+
+from app.services import mp3
+from tests.conftest import make_mp3
+
+
+class TestMP3:
+    """Test frame headers and frame extraction"""
+    
+    def test_parse_header(self):
+        """Test an MPEG-2 Layer III header"""
+        header = mp3.parse_header(bytes([0xFF, 0xF3, 0x44, 0xC4]))
+        
+        assert header == mp3.FrameHeader(length=96, samples=576, sample_rate=24000, channels=1)
+    
+    def test_parse_header_mpeg1(self):
+        """Test an MPEG-1 Layer III header with padding (128 kbps, 44.1 kHz, stereo)"""
+        header = mp3.parse_header(bytes([0xFF, 0xFB, 0x92, 0x00]))
+        
+        assert header == mp3.FrameHeader(length=418, samples=1152, sample_rate=44100, channels=2)
+    
+    @pytest.mark.parametrize("header", [
+        b"\x00\x00\x00\x00",
+        bytes([0xFF, 0xFD, 0x44, 0xC4]),  # Layer II
+        bytes([0xFF, 0xF3, 0xF4, 0xC4]),  # bad bitrate
+        bytes([0xFF, 0xF3, 0x4C, 0xC4]),  # reserved sample rate
+    ])
+    def test_parse_header_rejects(self, header):
+        """Test anything but a Layer III frame is rejected"""
+        with pytest.raises(ValueError):
+            mp3.parse_header(header)
+    
+    def test_extract_frames(self):
+        """Test frames are counted into a duration"""
+        frames = mp3.extract_frames(make_mp3(50))
+        
+        assert len(frames.data) == 50 * 96
+        assert frames.sample_rate == 24000
+        assert frames.duration == pytest.approx(1.2)
+    
+    def test_extract_frames_strips_tags_and_vbr_header(self):
+        """Test ID3 tags and the Xing frame are dropped"""
+        data = make_mp3(10, fill=7, id3=True, xing=True) + b"TAG" + b"\x00" * 125
+        
+        frames = mp3.extract_frames(data)
+        
+        assert frames.data == make_mp3(10, fill=7)
+    
+    def test_extract_frames_skips_junk(self):
+        """Test leading garbage is skipped and a truncated last frame dropped"""
+        frames = mp3.extract_frames(b"junk" + make_mp3(3) + make_mp3(1)[:50])
+        
+        assert frames.data == make_mp3(3)
+    
+    def test_extract_frames_requires_audio(self):
+        """Test data without frames is rejected"""
+        with pytest.raises(ValueError):
+            mp3.extract_frames(b"RIFF....WAVEfmt ")
@@ -0,0 +1,137 @@
+"""
+Tests for the practice write-behind buffer
+"""
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.metrics import metrics
+from app.models.progress import UserProgress
+from app.models.sentence import Sentence
+from app.models.user import User
+from app.services import srs
+from app.services.practice_buffer import PracticeWriteBuffer
+from app.services.practice_service import PracticeService
+from tests.conftest import TestingSessionLocal
+
+
+def progress_for(db: Session, sentence_id: int) -> UserProgress:
+    return db.query(UserProgress).filter(
+        UserProgress.sentence_id == sentence_id
+    ).populate_existing().one_or_none()
+
+
+class TestPracticeWriteBuffer:
+    """Test queueing, merging and flushing"""
+    
+    def test_flush_writes_one_statement(self, db: Session, test_user: User, test_sentences: list[Sentence]):
+        """Test queued records land in a single multi-row upsert (plus one rollup upsert)"""
+        buffer = PracticeWriteBuffer(TestingSessionLocal, flush_interval=60, max_pending=100)
+        for sentence in test_sentences:
+            buffer.add(test_user.id, sentence.id)
+        assert len(buffer) == 3
+        assert progress_for(db, test_sentences[0].id) is None
+        
+        statements = []
+        bind = db.get_bind()
+        
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith("INSERT"):
+                statements.append(statement)
+        
+        event.listen(bind, "before_cursor_execute", count_statement)
+        try:
+            assert buffer.flush() == 3
+        finally:
+            event.remove(bind, "before_cursor_execute", count_statement)
+        
+        assert [s.split("(")[0].split()[-1] for s in statements] == ["user_progress", "user_lesson_progress"]
+        assert len(buffer) == 0
+        for sentence in test_sentences:
+            assert progress_for(db, sentence.id).practiced_count == 1
+        
+        snapshot = metrics.snapshot()
+        assert snapshot["counters"]["practice_buffer.flushed_rows"] == 3
+        assert snapshot["timers"]["practice_buffer.flush"]["count"] == 1
+        assert snapshot["gauges"]["practice_buffer.depth"] == 0
+    
+    def test_repeats_are_merged(self, db: Session, test_user: User, test_sentence: Sentence):
+        """Test repeats before a flush add up and keep the lowest grade"""
+        db.add(UserProgress(
+            user_id=test_user.id,
+            sentence_id=test_sentence.id,
+            practiced_count=2,
+            last_practiced_at=datetime.utcnow() - timedelta(days=2),
+        ))
+        db.commit()
+        
+        buffer = PracticeWriteBuffer(TestingSessionLocal, flush_interval=60, max_pending=100)
+        buffer.add(test_user.id, test_sentence.id, grade=5)
+        buffer.add(test_user.id, test_sentence.id, grade=1)
+        buffer.add(test_user.id, test_sentence.id, grade=4)
+        assert len(buffer) == 1
+        
+        buffer.flush()
+        
+        progress = progress_for(db, test_sentence.id)
+        assert progress.practiced_count == 5
+        assert progress.repetitions == 0
+        assert progress.ease_factor < 2.5
+    
+    def test_threshold_wakes_flusher(self, db: Session, test_user: User, test_sentences: list[Sentence]):
+        """Test reaching max_pending flushes without waiting for the interval"""
+        buffer = PracticeWriteBuffer(TestingSessionLocal, flush_interval=60, max_pending=2)
+        buffer.start()
+        try:
+            buffer.add(test_user.id, test_sentences[0].id)
+            buffer.add(test_user.id, test_sentences[1].id)
+            deadline = time.monotonic() + 5
+            while len(buffer) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert len(buffer) == 0
+        finally:
+            buffer.stop()
+        
+        assert progress_for(db, test_sentences[1].id) is not None
+    
+    def test_stop_flushes_pending(self, db: Session, test_user: User, test_sentence: Sentence):
+        """Test shutdown writes whatever is still queued"""
+        buffer = PracticeWriteBuffer(TestingSessionLocal, flush_interval=60, max_pending=100)
+        buffer.start()
+        buffer.add(test_user.id, test_sentence.id)
+        buffer.stop()
+        
+        assert progress_for(db, test_sentence.id).practiced_count == 1
+    
+    def test_failed_batch_retried_row_by_row(self, db: Session, test_user: User, test_sentences: list[Sentence]):
+        """Test one bad row does not drop the rest of the batch"""
+        bad_id = test_sentences[1].id
+        real_record_reviews = srs.record_reviews
+        
+        def flaky(db, reviews):
+            if any(r.sentence_id == bad_id for r in reviews):
+                raise RuntimeError("constraint violation")
+            return real_record_reviews(db, reviews)
+        
+        buffer = PracticeWriteBuffer(TestingSessionLocal, flush_interval=60, max_pending=100)
+        for sentence in test_sentences:
+            buffer.add(test_user.id, sentence.id)
+        
+        with patch("app.services.practice_buffer.srs.record_reviews", side_effect=flaky):
+            assert buffer.flush() == 2
+        
+        assert progress_for(db, bad_id) is None
+        assert progress_for(db, test_sentences[0].id) is not None
+        assert metrics.snapshot()["counters"]["practice_buffer.failed_rows"] == 1
+    
+    def test_record_practice_write_behind(self, db: Session, test_user: User, test_sentence: Sentence):
+        """Test record_practice only queues when write-behind is on"""
+        with patch("app.services.practice_service.settings.practice_write_behind", True), \
+                patch("app.services.practice_service.practice_buffer") as buffer:
+            PracticeService.record_practice(db, user=test_user, sentence_id=test_sentence.id, grade=3)
+        
+        buffer.add.assert_called_once_with(test_user.id, test_sentence.id, 3)
+        assert progress_for(db, test_sentence.id) is None
@@ -0,0 +1,70 @@
+"""
+Tests for stateless practice walks
+"""
+import pytest
+
+from app.services.practice_cursor import FeistelPermutation, PracticeCursor
+
+
+class TestFeistelPermutation:
+    """Test the seeded permutation"""
+    
+    @pytest.mark.parametrize("size", [1, 2, 3, 5, 16, 17, 100, 1000])
+    def test_is_a_permutation(self, size: int):
+        """Test every index maps to a distinct position in range"""
+        permutation = FeistelPermutation(size, seed=42)
+        assert sorted(permutation[i] for i in range(size)) == list(range(size))
+    
+    def test_seed_changes_order(self):
+        """Test different seeds give different shuffles, the same seed the same one"""
+        first = [FeistelPermutation(50, seed=1)[i] for i in range(50)]
+        again = [FeistelPermutation(50, seed=1)[i] for i in range(50)]
+        other = [FeistelPermutation(50, seed=2)[i] for i in range(50)]
+        assert first == again
+        assert first != other
+        assert first != list(range(50))
+    
+    def test_out_of_range(self):
+        """Test indexes outside the permutation are rejected"""
+        with pytest.raises(IndexError):
+            FeistelPermutation(3, seed=1)[3]
+        with pytest.raises(ValueError):
+            FeistelPermutation(0, seed=1)
+
+
+class TestPracticeCursor:
+    """Test cursor encoding and walk positions"""
+    
+    def test_round_trip(self):
+        """Test a cursor survives encoding"""
+        cursor = PracticeCursor(7, 2**62 + 5, 123)
+        token = cursor.encode()
+        assert "=" not in token
+        assert PracticeCursor.decode(token) == cursor
+    
+    @pytest.mark.parametrize("token", ["", "not-a-cursor", "AAAA", "!!!!"])
+    def test_decode_rejects_garbage(self, token: str):
+        """Test malformed cursors raise ValueError"""
+        with pytest.raises(ValueError):
+            PracticeCursor.decode(token)
+    
+    def test_decode_rejects_overflowing_position(self):
+        """Test a forged position that could not be advanced is rejected"""
+        token = PracticeCursor(7, 1, 2**64 - 1).encode()
+        with pytest.raises(ValueError):
+            PracticeCursor.decode(token)
+    
+    def test_shuffled_laps_cover_lesson(self):
+        """Test each lap of a shuffled walk serves every position once, in a new order"""
+        cursor = PracticeCursor.start(1)
+        laps = [
+            [cursor._replace(position=lap * 20 + i).pool_position("shuffled", 20) for i in range(20)]
+            for lap in range(2)
+        ]
+        assert sorted(laps[0]) == sorted(laps[1]) == list(range(20))
+        assert laps[0] != laps[1]
+    
+    def test_ordered_wraps(self):
+        """Test ordered walks follow pool order and wrap around"""
+        positions = [PracticeCursor(1, 0, i).pool_position("ordered", 3) for i in range(5)]
+        assert positions == [0, 1, 2, 0, 1]
@@ -5,6 +5,9 @@ import pytest
 from datetime import datetime, timedelta
 from sqlalchemy.orm import Session
 from app.services.practice_service import PracticeService
+from app.services import lesson_progress
+from app.services.lesson_pool import lesson_pool_index
+from app.services.recent_practice import recent_practice
 from app.models.sentence import Sentence
 from app.models.lesson import Lesson
 from app.models.user import User
@@ -66,6 +69,7 @@ class TestPracticeService:
             )
             db.add(progress)
         db.commit()
+        lesson_progress.rebuild(db)
         
         # Should get one of the unpracticed sentences (index 2+)
         sentence, progress_info = PracticeService.get_next_sentence(
@@ -116,3 +120,395 @@ class TestPracticeService:
         """Test getting sentence when none exist in lesson"""
         with pytest.raises(NotFoundException):
             PracticeService.get_next_sentence(db, lesson_id=99999, user=test_user)
+    
+    def test_get_next_sentence_bounded_statements(self, db: Session, test_user: User, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test that a warm selection costs a fixed number of round trips whatever the history"""
+        from sqlalchemy import event
+        
+        lesson_id = test_lesson.id
+        PracticeService.get_next_sentence(db, lesson_id, mode="smart", user=test_user)
+        statements = []
+        
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        def select_once():
+            statements.clear()
+            event.listen(bind, "before_cursor_execute", count_statement)
+            try:
+                PracticeService.get_next_sentence(db, lesson_id, mode="smart", user=test_user)
+            finally:
+                event.remove(bind, "before_cursor_execute", count_statement)
+            return len(statements)
+        
+        bind = db.get_bind()
+        db.refresh(test_user)
+        assert select_once() == 3  # due seek + rollup row + new-sentence probe
+        
+        for sent in test_sentences:
+            PracticeService.record_practice(db, user=test_user, sentence_id=sent.id)
+        db.refresh(test_user)
+        assert select_once() == 3  # practice-ahead seek instead of the probe
+    
+    def test_get_next_sentence_all_recent_falls_back(self, db: Session, test_user: User, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test that a sentence is still returned when everything was practiced recently"""
+        for i, sent in enumerate(test_sentences):
+            db.add(UserProgress(
+                user_id=test_user.id,
+                sentence_id=sent.id,
+                practiced_count=i + 1,
+                last_practiced_at=datetime.utcnow() - timedelta(minutes=1)
+            ))
+        db.commit()
+        lesson_progress.rebuild(db)
+        
+        sentence, progress_info = PracticeService.get_next_sentence(
+            db, test_lesson.id, mode="smart", user=test_user
+        )
+        
+        # Earliest due among the recent ones
+        assert sentence.id == test_sentences[0].id
+        assert progress_info["practiced_count"] == 3
+        assert progress_info["total_in_lesson"] == 3
+        assert progress_info["percentage"] == 100.0
+    
+    def test_get_next_sentence_recent_ranked_after_older(self, db: Session, test_user: User, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test that an older, more practiced sentence beats a recent one"""
+        db.add(UserProgress(
+            user_id=test_user.id,
+            sentence_id=test_sentences[0].id,
+            practiced_count=1,
+            last_practiced_at=datetime.utcnow() - timedelta(minutes=1)
+        ))
+        for sent in test_sentences[1:]:
+            db.add(UserProgress(
+                user_id=test_user.id,
+                sentence_id=sent.id,
+                practiced_count=10,
+                last_practiced_at=datetime.utcnow() - timedelta(hours=2)
+            ))
+        db.commit()
+        
+        for _ in range(5):
+            sentence, _ = PracticeService.get_next_sentence(
+                db, test_lesson.id, mode="smart", user=test_user
+            )
+            assert sentence.id != test_sentences[0].id
+    
+    def test_get_next_sentence_due_review_first(self, db: Session, test_user: User, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test that an overdue review beats unpracticed sentences"""
+        db.add(UserProgress(
+            user_id=test_user.id,
+            sentence_id=test_sentences[1].id,
+            practiced_count=4,
+            last_practiced_at=datetime.utcnow() - timedelta(days=3),
+            due_at=datetime.utcnow() - timedelta(hours=1),
+        ))
+        db.commit()
+        lesson_progress.rebuild(db)  # seeded without going through record_practice
+        
+        for _ in range(5):
+            sentence, progress_info = PracticeService.get_next_sentence(
+                db, test_lesson.id, mode="smart", user=test_user
+            )
+            assert sentence.id == test_sentences[1].id
+            assert progress_info["practiced_count"] == 1
+    
+    def test_record_practice_schedules_reviews(self, db: Session, test_user: User, test_sentences: list[Sentence]):
+        """Test SM-2 intervals grow 1 -> 6 -> round(6 * ease) days"""
+        sentence = test_sentences[0]
+        
+        def progress():
+            return db.query(UserProgress).filter(
+                UserProgress.user_id == test_user.id,
+                UserProgress.sentence_id == sentence.id
+            ).populate_existing().one()
+        
+        PracticeService.record_practice(db, user=test_user, sentence_id=sentence.id)
+        first = progress()
+        assert (first.repetitions, first.interval_days, first.ease_factor) == (1, 1, 2.5)
+        assert timedelta(hours=23) < first.due_at - datetime.utcnow() <= timedelta(days=1)
+        
+        PracticeService.record_practice(db, user=test_user, sentence_id=sentence.id)
+        second = progress()
+        assert (second.repetitions, second.interval_days) == (2, 6)
+        assert second.practiced_count == 2
+        
+        PracticeService.record_practice(db, user=test_user, sentence_id=sentence.id, grade=5)
+        third = progress()
+        assert third.ease_factor == pytest.approx(2.6)
+        assert (third.repetitions, third.interval_days) == (3, 16)
+        assert timedelta(days=15) < third.due_at - datetime.utcnow() <= timedelta(days=16)
+    
+    def test_record_practice_failed_grade_resets(self, db: Session, test_user: User, test_sentences: list[Sentence]):
+        """Test a failing grade restarts the interval and lowers the ease, never below 1.3"""
+        sentence = test_sentences[0]
+        db.add(UserProgress(
+            user_id=test_user.id,
+            sentence_id=sentence.id,
+            practiced_count=5,
+            last_practiced_at=datetime.utcnow() - timedelta(days=20),
+            repetitions=4,
+            interval_days=15,
+            ease_factor=1.4,
+        ))
+        db.commit()
+        
+        PracticeService.record_practice(db, user=test_user, sentence_id=sentence.id, grade=1)
+        progress = db.query(UserProgress).filter(
+            UserProgress.sentence_id == sentence.id
+        ).populate_existing().one()
+        
+        assert progress.repetitions == 0
+        assert progress.interval_days == 1
+        assert progress.ease_factor == 1.3
+        assert progress.practiced_count == 6
+    
+    def test_get_next_sentences_queue_order(self, db: Session, test_user: User, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test batch queues due reviews first, then new, then practice-ahead, without repeats"""
+        db.add(UserProgress(
+            user_id=test_user.id,
+            sentence_id=test_sentences[2].id,
+            practiced_count=2,
+            last_practiced_at=datetime.utcnow() - timedelta(days=2),
+            due_at=datetime.utcnow() - timedelta(hours=1),
+        ))
+        db.add(UserProgress(
+            user_id=test_user.id,
+            sentence_id=test_sentences[0].id,
+            practiced_count=1,
+            last_practiced_at=datetime.utcnow() - timedelta(hours=1),
+        ))
+        db.commit()
+        lesson_progress.rebuild(db)
+        
+        sentences, progress_info = PracticeService.get_next_sentences(
+            db, test_lesson.id, count=10, mode="smart", user=test_user
+        )
+        
+        assert [s.id for s in sentences] == [test_sentences[2].id, test_sentences[1].id, test_sentences[0].id]
+        assert progress_info["practiced_count"] == 2
+        assert progress_info["total_in_lesson"] == 3
+    
+    def test_get_next_sentences_guest(self, db: Session, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test guest batch is a random sample without repeats"""
+        sentences, progress_info = PracticeService.get_next_sentences(
+            db, test_lesson.id, count=2, mode="random", user=None
+        )
+        
+        assert len(sentences) == 2
+        assert len({s.id for s in sentences}) == 2
+        assert progress_info["total_in_lesson"] == 3
+    
+    def test_get_next_sentence_guest_warm_pool_no_queries(self, db: Session, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test guest picks come from the cached pool without touching the database"""
+        from sqlalchemy import event
+        
+        lesson_id = test_lesson.id
+        PracticeService.get_next_sentence(db, lesson_id, mode="random", user=None)
+        statements = []
+        
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+        
+        bind = db.get_bind()
+        event.listen(bind, "before_cursor_execute", count_statement)
+        try:
+            seen = {
+                PracticeService.get_next_sentence(db, lesson_id, mode="random", user=None)[0].id
+                for _ in range(50)
+            }
+        finally:
+            event.remove(bind, "before_cursor_execute", count_statement)
+        
+        assert statements == []
+        assert seen == {s.id for s in test_sentences}
+    
+    def test_get_next_sentence_guest_no_sentences_found(self, db: Session):
+        """Test guest selection on an empty or unknown lesson"""
+        with pytest.raises(NotFoundException):
+            PracticeService.get_next_sentence(db, lesson_id=99999, user=None)
+    
+    def test_walk_shuffled_follows_cursor(self, db: Session, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test a shuffled walk serves the whole lesson without repeats, one call at a time"""
+        cursor = None
+        served = []
+        for _ in range(3):
+            sentences, progress_info, cursor = PracticeService.walk(db, test_lesson.id, "shuffled", 1, cursor)
+            served += [s.id for s in sentences]
+        
+        assert sorted(served) == sorted(s.id for s in test_sentences)
+        assert progress_info["position"] == 3
+        assert progress_info["total_in_lesson"] == 3
+    
+    def test_walk_ordered_in_lesson_order(self, db: Session, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test an ordered walk follows order_index and wraps around"""
+        sentences, _, cursor = PracticeService.walk(db, test_lesson.id, "ordered", 2)
+        more, _, _ = PracticeService.walk(db, test_lesson.id, "ordered", 2, cursor)
+        
+        ordered = [s.id for s in sorted(test_sentences, key=lambda s: s.order_index)]
+        assert [s.id for s in sentences + more] == ordered + ordered[:1]
+    
+    def test_walk_rejects_foreign_cursor(self, db: Session, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test a cursor cannot be replayed against another lesson or be forged"""
+        from app.core.exceptions import BadRequestException
+        
+        _, _, cursor = PracticeService.walk(db, test_lesson.id, "shuffled")
+        with pytest.raises(BadRequestException):
+            PracticeService.walk(db, test_lesson.id + 1, "shuffled", 1, cursor)
+        with pytest.raises(BadRequestException):
+            PracticeService.walk(db, test_lesson.id, "shuffled", 1, "garbage")
+    
+    def test_get_next_sentence_honors_mode(self, db: Session, test_user: User, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test mode is no longer ignored: ordered starts at the first sentence"""
+        first = min(test_sentences, key=lambda s: s.order_index)
+        sentence, _ = PracticeService.get_next_sentence(db, test_lesson.id, mode="ordered", user=test_user)
+        assert sentence.id == first.id
+    
+    def test_get_next_sentences_across_lessons(self, db: Session, test_user: User, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test practice without a lesson_id draws from every active lesson"""
+        other = Lesson(title="Other", order_index=2)
+        hidden = Lesson(title="Hidden", order_index=3, is_active=False)
+        db.add_all([other, hidden])
+        db.flush()
+        db.add(Sentence(lesson_id=other.id, vi_text="Khác", en_text="Other", order_index=1))
+        db.add(Sentence(lesson_id=hidden.id, vi_text="Ẩn", en_text="Hidden", order_index=1))
+        db.commit()
+        active = {s.id for s in test_sentences} | {
+            s.id for s in db.query(Sentence).filter(Sentence.lesson_id == other.id)
+        }
+        
+        for user in (test_user, None):
+            sentences, progress_info = PracticeService.get_next_sentences(
+                db, None, count=10, mode="smart" if user else "random", user=user
+            )
+            assert {s.id for s in sentences} <= active
+            assert progress_info["total_in_lesson"] == 4
+        
+        # Smart mode keeps drawing until every active sentence was served
+        seen = set()
+        for _ in range(60):
+            sentence, _ = PracticeService.get_next_sentence(db, None, mode="smart", user=test_user)
+            seen.add(sentence.id)
+        assert seen == active
+    
+    def test_weak_lessons_drawn_by_reviews(self, db: Session, test_user: User, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test a lesson with failing, overdue reviews is drawn far more often than a mastered one"""
+        from app.services.corpus_index import corpus_index
+        
+        mastered = Lesson(title="Mastered", order_index=2)
+        db.add(mastered)
+        db.flush()
+        easy = [Sentence(lesson_id=mastered.id, vi_text=f"Dễ {i}", en_text=f"Easy {i}", order_index=i) for i in range(3)]
+        db.add_all(easy)
+        db.flush()
+        now = datetime.utcnow()
+        for sent in test_sentences:
+            db.add(UserProgress(
+                user_id=test_user.id, sentence_id=sent.id, last_practiced_at=now - timedelta(days=2),
+                due_at=now - timedelta(days=1), ease_factor=1.3, repetitions=0,
+            ))
+        for sent in easy:
+            db.add(UserProgress(
+                user_id=test_user.id, sentence_id=sent.id, last_practiced_at=now - timedelta(days=2),
+                due_at=now + timedelta(days=20), ease_factor=2.8, repetitions=4,
+            ))
+        db.commit()
+        lesson_pool_index.invalidate()
+        
+        picks = PracticeService._draw_weak_lessons(db, test_user, corpus_index.get(db), 2000)
+        
+        assert len(picks) == 2000
+        assert picks.count(test_lesson.id) / len(picks) > 0.8
+    
+    def test_walk_needs_lesson(self, db: Session):
+        """Test walk modes reject the all-lessons request"""
+        from app.core.exceptions import BadRequestException
+        
+        with pytest.raises(BadRequestException):
+            PracticeService.walk(db, None, "ordered")
+    
+    def test_recent_window_from_memory(self, db: Session, test_user: User, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test just-practiced sentences go last, and the window is set per call"""
+        for sent in test_sentences:
+            PracticeService.record_practice(db, user=test_user, sentence_id=sent.id)
+        db.refresh(test_user)
+        
+        # Earliest due first, but everything is inside the default window
+        sentences, _ = PracticeService.get_next_sentences(db, test_lesson.id, count=3, mode="smart", user=test_user)
+        assert len(sentences) == 3
+        
+        # Within the window, the ring's practices go after the others
+        recent_practice.clear()
+        recent_practice.add(test_user.id, [test_sentences[0].id])
+        queue, _ = PracticeService.get_next_sentences(db, test_lesson.id, count=3, mode="smart", user=test_user)
+        assert [s.id for s in queue] == [test_sentences[1].id, test_sentences[2].id, test_sentences[0].id]
+        
+        queue, _ = PracticeService.get_next_sentences(
+            db, test_lesson.id, count=3, mode="smart", user=test_user, recent_seconds=0
+        )
+        assert queue[0].id == test_sentences[0].id
+    
+    def test_recent_from_other_workers(self, db: Session, test_user: User, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test a practice recorded by another worker (absent from this ring) still goes last"""
+        now = datetime.utcnow()
+        for i, sent in enumerate(test_sentences):
+            db.add(UserProgress(
+                user_id=test_user.id,
+                sentence_id=sent.id,
+                last_practiced_at=now - (timedelta(minutes=1) if i == 0 else timedelta(hours=2)),
+                due_at=now + timedelta(days=i + 1),
+            ))
+        db.commit()
+        
+        queue, _ = PracticeService.get_next_sentences(db, test_lesson.id, count=3, mode="smart", user=test_user)
+        
+        assert [s.id for s in queue] == [test_sentences[1].id, test_sentences[2].id, test_sentences[0].id]
+    
+    def test_recent_excludes_unflushed_new_sentence(self, db: Session, test_user: User, test_lesson: Lesson, test_sentences: list[Sentence]):
+        """Test a practice still in the write-behind buffer is not served again as new"""
+        recent_practice.add(test_user.id, [test_sentences[0].id, test_sentences[1].id])
+        for _ in range(5):
+            sentence, _ = PracticeService.get_next_sentence(db, test_lesson.id, mode="smart", user=test_user)
+            assert sentence.id == test_sentences[2].id
+    
+    def test_only_unflushed_sentences_left(self, db: Session, test_user: User, test_lesson: Lesson, test_sentence: Sentence):
+        """Test a lesson whose every sentence waits in the write-behind buffer still serves one"""
+        from unittest.mock import patch
+        
+        with patch("app.services.practice_service.settings.practice_write_behind", True), \
+                patch("app.services.practice_service.practice_buffer"):
+            PracticeService.record_practice(db, user=test_user, sentence_id=test_sentence.id)
+        
+        sentence, progress_info = PracticeService.get_next_sentence(db, test_lesson.id, mode="smart", user=test_user)
+        
+        assert sentence.id == test_sentence.id
+        assert progress_info["practiced_count"] == 0
+    
+    def test_record_practice_batch_keeps_latest_time(self, db: Session, test_user: User, test_sentences: list[Sentence]):
+        """Test replayed offline practice never moves last_practiced_at backwards"""
+        from app.services.srs import Review
+        
+        latest = datetime.utcnow() - timedelta(hours=1)
+        db.add(UserProgress(
+            user_id=test_user.id,
+            sentence_id=test_sentences[0].id,
+            practiced_count=1,
+            last_practiced_at=latest,
+        ))
+        db.commit()
+        
+        recorded = PracticeService.record_practice_batch(db, test_user, [
+            Review(None, test_sentences[0].id, practiced_at=latest - timedelta(days=1), count=2),
+            Review(None, test_sentences[1].id, practiced_at=datetime.utcnow() + timedelta(days=1)),
+        ])
+        
+        assert recorded == 2
+        rows = {
+            p.sentence_id: p
+            for p in db.query(UserProgress).populate_existing().all()
+        }
+        assert rows[test_sentences[0].id].practiced_count == 3
+        assert rows[test_sentences[0].id].last_practiced_at == latest
+        # Future timestamps are clamped to now
+        assert rows[test_sentences[1].id].last_practiced_at <= datetime.utcnow()
@@ -0,0 +1,73 @@
+"""
+Tests for the recent-practice window
+"""
+import time
+import pytest
+
+from app.services.recent_practice import InMemoryRecentPractice, RedisRecentPractice
+
+
+class TestInMemoryRecentPractice:
+    """Test the per-process ring buffer"""
+    
+    def test_window(self):
+        """Test only practices inside the window are reported"""
+        recent = InMemoryRecentPractice(capacity=10, max_users=10)
+        now = time.time()
+        recent.add("u1", [1], at=now - 600)
+        recent.add("u1", [2, 3], at=now - 60)
+        
+        assert recent.recent("u1", 300) == {2, 3}
+        assert recent.recent("u1", 900) == {1, 2, 3}
+        assert recent.recent("u1", 0) == set()
+        assert recent.recent("u2", 300) == set()
+    
+    def test_oldest_first(self):
+        """Test the window in order of each sentence's last practice"""
+        recent = InMemoryRecentPractice(capacity=10, max_users=10)
+        now = time.time()
+        recent.add("u1", [1, 2], at=now - 60)
+        recent.add("u1", [3], at=now - 30)
+        recent.add("u1", [1], at=now - 10)
+        recent.add("u1", [4], at=now - 600)
+        
+        assert recent.oldest_first("u1", 300) == [2, 3, 1]
+        assert recent.oldest_first("u2", 300) == []
+    
+    def test_ring_is_bounded(self):
+        """Test each user keeps only the newest `capacity` practices"""
+        recent = InMemoryRecentPractice(capacity=3, max_users=10)
+        recent.add("u1", range(10))
+        assert recent.recent("u1", 300) == {7, 8, 9}
+    
+    def test_least_recent_user_evicted(self):
+        """Test the number of tracked users is bounded"""
+        recent = InMemoryRecentPractice(capacity=3, max_users=2)
+        recent.add("u1", [1])
+        recent.add("u2", [2])
+        recent.add("u1", [3])
+        recent.add("u3", [4])
+        
+        assert recent.recent("u2", 300) == set()
+        assert recent.recent("u1", 300) == {1, 3}
+        assert recent.recent("u3", 300) == {4}
+
+
+class TestRedisRecentPractice:
+    """Test the shared backend against an in-process Redis"""
+    
+    def test_window_and_capacity(self):
+        """Test the sorted-set window behaves like the ring buffer"""
+        fakeredis = pytest.importorskip("fakeredis")
+        recent = RedisRecentPractice(fakeredis.FakeRedis(), capacity=3, key_ttl_seconds=3600)
+        now = time.time()
+        recent.add("u1", [1], at=now - 600)
+        recent.add("u1", [2, 3], at=now - 60)
+        assert recent.recent("u1", 300) == {2, 3}
+        assert recent.oldest_first("u1", 900) == [1, 2, 3]
+        
+        recent.add("u1", [4, 5])
+        assert recent.recent("u1", 900) == {3, 4, 5}
+        
+        recent.clear()
+        assert recent.recent("u1", 900) == set()
@@ -0,0 +1,126 @@
+"""
+Tests for the TTS engine registry
+"""
+import pytest
+from unittest.mock import MagicMock
+
+from app.config import settings
+from app.core.exceptions import BadRequestException
+from app.services import mp3, tts_engines
+from app.services.tts_service import TTSService
+
+
+class TestRegistry:
+    """Test engine lookup"""
+    
+    def test_engines_are_shared(self):
+        """Test each engine is created once per process"""
+        assert tts_engines.get_engine("pyttsx3") is tts_engines.get_engine("pyttsx3")
+        assert {"gtts", "pyttsx3", "synthetic"} <= set(tts_engines.ENGINES)
+    
+    def test_default_engine(self, monkeypatch):
+        """Test the setting picks the engine"""
+        monkeypatch.setattr(settings, "tts_engine", "synthetic")
+        
+        assert tts_engines.get_engine().name == "synthetic"
+    
+    def test_unknown_engine(self):
+        """Test unknown engine names are rejected"""
+        with pytest.raises(ValueError):
+            tts_engines.get_engine("espeak")
+
+
+class TestSyntheticEngine:
+    """Test the offline benchmark engine"""
+    
+    def test_writes_valid_mp3(self, tmp_path):
+        """Test output parses as MP3 and lasts in proportion to the text"""
+        path = tmp_path / "out.mp3"
+        tts_engines.get_engine("synthetic").synthesize("x" * 50, "en", "", str(path))
+        
+        frames = mp3.extract_frames(path.read_bytes())
+        assert frames.duration == pytest.approx(50 * settings.tts_synthetic_seconds_per_char, abs=0.024)
+        assert frames.data == path.read_bytes()
+    
+    def test_deterministic(self, tmp_path):
+        """Test the same text always gives the same bytes"""
+        engine = tts_engines.get_engine("synthetic")
+        engine.synthesize("Xin chào", "vi", "", str(tmp_path / "a.mp3"))
+        engine.synthesize("Xin chào", "vi", "", str(tmp_path / "b.mp3"))
+        
+        assert (tmp_path / "a.mp3").read_bytes() == (tmp_path / "b.mp3").read_bytes()
+    
+    def test_stream_matches_file(self, tmp_path):
+        """Test the streamed chunks are the synthesized file, a second of audio at a time"""
+        engine = tts_engines.get_engine("synthetic")
+        engine.synthesize("x" * 50, "en", "", str(tmp_path / "out.mp3"))
+        
+        chunks = list(engine.stream("x" * 50, "en", ""))
+        
+        assert len(chunks) == 3
+        assert b"".join(chunks) == (tmp_path / "out.mp3").read_bytes()
+    
+    def test_tts_service(self, tmp_path):
+        """Test the whole synthesis path runs without the network"""
+        tts = TTSService(audio_dir=str(tmp_path), engine="synthetic")
+        
+        path = tts.generate_audio("Hello", "en")
+        
+        assert path.endswith(".mp3")
+        assert mp3.extract_frames(open(path, "rb").read()).samples > 0
+
+
+class TestPyttsx3Engine:
+    """Test the pyttsx3 driver is set up once"""
+    
+    @pytest.fixture
+    def driver(self, monkeypatch):
+        driver = MagicMock()
+        voices = [MagicMock(id="en-1"), MagicMock(id="vi-1")]
+        voices[0].name = "English"
+        voices[1].name = "Vietnamese"
+        driver.getProperty.return_value = voices
+        module = MagicMock()
+        module.init.return_value = driver
+        monkeypatch.setattr(tts_engines, "pyttsx3", module, raising=False)
+        monkeypatch.setattr(tts_engines, "PYTTSX3_AVAILABLE", True)
+        return module
+    
+    def test_driver_and_voices_are_reused(self, driver, tmp_path):
+        """Test init and the voice lookup happen once, not per synthesis"""
+        engine = tts_engines.Pyttsx3Engine()
+        for text in ("Một", "Hai", "Ba"):
+            engine.synthesize(text, "vi", "", str(tmp_path / f"{text}.wav"))
+        engine.synthesize("One", "en", "", str(tmp_path / "one.wav"))
+        
+        instance = driver.init.return_value
+        assert driver.init.call_count == 1
+        assert instance.getProperty.call_count == 2  # once per language
+        instance.setProperty.assert_any_call('voice', "vi-1")
+        instance.setProperty.assert_called_with('voice', "en-1")
+        assert instance.runAndWait.call_count == 4
+    
+    def test_configured_voice(self, driver, tmp_path):
+        """Test a configured voice id or name wins over the language default"""
+        engine = tts_engines.Pyttsx3Engine()
+        engine.synthesize("Hello", "en", "Vietnamese", str(tmp_path / "out.wav"))
+        
+        driver.init.return_value.setProperty.assert_called_once_with('voice', "vi-1")
+    
+    def test_failure_resets_driver(self, driver, tmp_path):
+        """Test a failed synthesis starts the next one with a fresh driver"""
+        engine = tts_engines.Pyttsx3Engine()
+        driver.init.return_value.runAndWait.side_effect = [RuntimeError("run loop already started"), None]
+        
+        with pytest.raises(RuntimeError):
+            engine.synthesize("Hello", "en", "", str(tmp_path / "out.wav"))
+        engine.synthesize("Hello", "en", "", str(tmp_path / "out.wav"))
+        
+        assert driver.init.call_count == 2
+    
+    def test_not_installed(self, monkeypatch, tmp_path):
+        """Test a clear error without pyttsx3"""
+        monkeypatch.setattr(tts_engines, "PYTTSX3_AVAILABLE", False)
+        
+        with pytest.raises(BadRequestException):
+            tts_engines.Pyttsx3Engine().synthesize("Hello", "en", "", str(tmp_path / "out.wav"))
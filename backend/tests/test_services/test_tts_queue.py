@@ -0,0 +1,282 @@
+"""
+Tests for the persistent audio pre-generation queue
+"""
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.core.exceptions import ServiceUnavailableException
+from app.core.metrics import metrics
+from app.models.audio_file import AudioBlob, AudioFile
+from app.models.lesson import Lesson
+from app.models.sentence import Sentence
+from app.models.tts_job import TTSJob
+from app.services import tts_queue
+from app.services.tts_queue import TTSJobQueue
+from app.services.tts_service import TTSService
+from tests.conftest import TestingSessionLocal
+
+
+pytestmark = pytest.mark.usefixtures("pregenerate")
+
+
+@pytest.fixture
+def generated(audio_dir, monkeypatch):
+    """Fake synthesis: writes the file and records the call"""
+    calls = []
+    
+    def generate(self, text, language):
+        calls.append((text, language))
+        path = Path(self.get_audio_path(self.audio_key(text, language)))
+        path.parent.mkdir(exist_ok=True)
+        path.write_bytes(b"mp3 " + text.encode())
+        return str(path)
+    
+    monkeypatch.setattr("app.services.tts_service.TTSService.generate_audio", generate)
+    return calls
+
+
+def jobs(db: Session) -> dict[tuple[int, str], TTSJob]:
+    return {
+        (job.sentence_id, job.language): job
+        for job in db.query(TTSJob).populate_existing()
+    }
+
+
+def drain(queue: TTSJobQueue) -> int:
+    processed = 0
+    while queue.run_once():
+        processed += 1
+    return processed
+
+
+class TestEnqueue:
+    """Test queueing jobs"""
+    
+    def test_enqueue_both_languages(self, db: Session, test_sentences: list[Sentence]):
+        """Test one pending job per sentence and language"""
+        assert tts_queue.enqueue(db, [s.id for s in test_sentences]) == 6
+        db.commit()
+        
+        queued = jobs(db)
+        assert set(queued) == {(s.id, lang) for s in test_sentences for lang in ("vi", "en")}
+        assert {job.status for job in queued.values()} == {"pending"}
+    
+    def test_enqueue_resets_existing_job(self, db: Session, test_sentence: Sentence):
+        """Test re-queueing a finished or failed job makes it pending again"""
+        tts_queue.enqueue(db, [test_sentence.id])
+        db.commit()
+        job = jobs(db)[(test_sentence.id, "en")]
+        job.status, job.attempts, job.error = "failed", 3, "boom"
+        db.commit()
+        
+        tts_queue.enqueue(db, [test_sentence.id], ["en"])
+        db.commit()
+        
+        job = jobs(db)[(test_sentence.id, "en")]
+        assert (job.status, job.attempts, job.error) == ("pending", 0, None)
+        assert db.query(TTSJob).count() == 2
+    
+    def test_enqueue_lessons_skips_inactive(self, db: Session, test_sentences: list[Sentence]):
+        """Test warming all lessons covers active lessons only"""
+        hidden = Lesson(title="Hidden", order_index=2, is_active=False)
+        db.add(hidden)
+        db.flush()
+        db.add(Sentence(lesson_id=hidden.id, vi_text="Ẩn", en_text="Hidden", order_index=1))
+        db.commit()
+        
+        assert tts_queue.enqueue_lessons(db) == 6
+        db.commit()
+        assert {sentence_id for sentence_id, _ in jobs(db)} == {s.id for s in test_sentences}
+        
+        assert tts_queue.enqueue_lessons(db, hidden.id) == 2
+        db.commit()
+        assert tts_queue.status(db, hidden.id) == {"pending": 2, "running": 0, "done": 0, "failed": 0, "total": 2}
+        assert tts_queue.status(db)["total"] == 8
+
+
+class TestTTSJobQueue:
+    """Test the job workers"""
+    
+    def test_run_once_generates_audio(self, db: Session, test_sentence: Sentence, generated):
+        """Test a job synthesizes, records the AudioFile and is marked done"""
+        tts_queue.enqueue(db, [test_sentence.id])
+        db.commit()
+        queue = TTSJobQueue(TestingSessionLocal, workers=1)
+        
+        assert drain(queue) == 2
+        
+        assert sorted(generated) == [("Hello", "en"), ("Xin chào", "vi")]
+        assert {job.status for job in jobs(db).values()} == {"done"}
+        audio_files = db.query(AudioFile).filter(AudioFile.sentence_id == test_sentence.id).all()
+        assert {a.language for a in audio_files} == {"vi", "en"}
+        assert all(a.file_size > 0 for a in audio_files)
+        assert metrics.snapshot()["counters"]["tts_queue.done"] == 2
+    
+    def test_failed_job_retries_then_fails(self, db: Session, test_sentence: Sentence, audio_dir, monkeypatch):
+        """Test a failing job is retried up to max_attempts, then left failed"""
+        def broken(self, text, language):
+            raise RuntimeError("gTTS unreachable")
+        
+        monkeypatch.setattr("app.services.tts_service.TTSService.generate_audio", broken)
+        tts_queue.enqueue(db, [test_sentence.id], ["vi"])
+        db.commit()
+        queue = TTSJobQueue(TestingSessionLocal, workers=1, max_attempts=2, retry_seconds=0)
+        
+        assert drain(queue) == 2
+        
+        job = jobs(db)[(test_sentence.id, "vi")]
+        assert (job.status, job.attempts) == ("failed", 2)
+        assert "gTTS unreachable" in job.error
+        counters = metrics.snapshot()["counters"]
+        assert counters["tts_queue.retried"] == 1
+        assert counters["tts_queue.failed"] == 1
+    
+    def test_failed_job_waits_before_retry(self, db: Session, test_sentence: Sentence, audio_dir, monkeypatch):
+        """Test a failed job is not claimed again until its backoff is over"""
+        def broken(self, text, language):
+            raise RuntimeError("gTTS unreachable")
+        
+        monkeypatch.setattr("app.services.tts_service.TTSService.generate_audio", broken)
+        tts_queue.enqueue(db, [test_sentence.id], ["vi"])
+        db.commit()
+        queue = TTSJobQueue(TestingSessionLocal, workers=1, max_attempts=3, retry_seconds=60)
+        
+        assert drain(queue) == 1
+        
+        job = jobs(db)[(test_sentence.id, "vi")]
+        assert (job.status, job.attempts) == ("pending", 1)
+        assert job.not_before > datetime.utcnow() + timedelta(seconds=50)
+        
+        tts_queue.enqueue(db, [test_sentence.id], ["vi"])  # an edit clears the backoff
+        db.commit()
+        assert jobs(db)[(test_sentence.id, "vi")].not_before is None
+    
+    def test_disabled_queues_nothing(self, db: Session, test_sentence: Sentence, monkeypatch):
+        """Test no jobs pile up while pre-generation is off"""
+        monkeypatch.setattr(settings, "tts_pregenerate", False)
+        
+        assert tts_queue.enqueue(db, [test_sentence.id]) == 0
+        assert tts_queue.enqueue_lessons(db) == 0
+        db.commit()
+        assert jobs(db) == {}
+    
+    def test_busy_synthesizer_defers_job(self, db: Session, test_sentence: Sentence, monkeypatch):
+        """Test a 503 from the synthesizer puts the job back without using an attempt"""
+        def busy(key, language, text):
+            raise ServiceUnavailableException("busy")
+        
+        monkeypatch.setattr("app.services.tts_queue.audio_synthesizer.submit", busy)
+        tts_queue.enqueue(db, [test_sentence.id], ["vi"])
+        db.commit()
+        queue = TTSJobQueue(TestingSessionLocal, workers=1, poll_interval=0.01)
+        
+        assert queue.run_once()
+        
+        job = jobs(db)[(test_sentence.id, "vi")]
+        assert (job.status, job.attempts) == ("pending", 0)
+        assert metrics.snapshot()["counters"]["tts_queue.deferred"] == 1
+    
+    def test_edit_during_synthesis_requeues(self, db: Session, test_sentence: Sentence, generated, monkeypatch):
+        """Test a job re-queued while running is not recorded and runs again with the new text"""
+        generate = TTSService.generate_audio
+        
+        def edit_first(self, text, language):
+            if not generated:
+                # An admin edits the sentence mid-synthesis
+                edit = TestingSessionLocal()
+                edit.query(Sentence).filter(Sentence.id == test_sentence.id).update({"en_text": "Hi"})
+                tts_queue.enqueue(edit, [test_sentence.id], ["en"])
+                edit.commit()
+                edit.close()
+            return generate(self, text, language)
+        
+        monkeypatch.setattr("app.services.tts_service.TTSService.generate_audio", edit_first)
+        tts_queue.enqueue(db, [test_sentence.id], ["en"])
+        db.commit()
+        queue = TTSJobQueue(TestingSessionLocal, workers=1)
+        
+        assert drain(queue) == 2
+        
+        assert generated == [("Hello", "en"), ("Hi", "en")]
+        audio_file = db.query(AudioFile).populate_existing().one()
+        assert audio_file.audio_key == TTSService().audio_key("Hi", "en")
+        assert jobs(db)[(test_sentence.id, "en")].status == "done"
+    
+    def test_identical_text_synthesized_once(self, db: Session, test_lesson: Lesson, generated):
+        """Test sentences sharing a phrase share one blob"""
+        sentences = [
+            Sentence(lesson_id=test_lesson.id, vi_text=f"Câu {i}", en_text="Thank you", order_index=i)
+            for i in range(3)
+        ]
+        db.add_all(sentences)
+        db.commit()
+        tts_queue.enqueue(db, [s.id for s in sentences], ["en"])
+        db.commit()
+        
+        assert drain(TTSJobQueue(TestingSessionLocal, workers=1)) == 3
+        
+        assert generated == [("Thank you", "en")]
+        assert db.query(AudioBlob).count() == 1
+        assert {a.audio_key for a in db.query(AudioFile)} == {TTSService().audio_key("Thank you", "en")}
+    
+    def test_deleted_sentence_drops_job(self, db: Session, test_sentence: Sentence, generated):
+        """Test a job whose sentence is gone is removed without synthesis"""
+        tts_queue.enqueue(db, [test_sentence.id], ["vi"])
+        db.commit()
+        db.delete(test_sentence)
+        db.commit()
+        
+        assert TTSJobQueue(TestingSessionLocal, workers=1).run_once()
+        
+        assert generated == []
+        assert db.query(TTSJob).count() == 0
+    
+    def test_start_resumes_orphaned_jobs(self, db: Session, test_sentences: list[Sentence], generated):
+        """Test jobs left running by a dead process are claimed again once their lease ran out"""
+        tts_queue.enqueue(db, [s.id for s in test_sentences])
+        db.commit()
+        claimed_at = datetime.utcnow() - timedelta(seconds=settings.tts_job_lease_seconds + 60)
+        db.query(TTSJob).filter(TTSJob.language == "vi").update({"status": "running", "attempts": 1, "updated_at": claimed_at})
+        db.commit()
+        # One worker: the test database is a single shared SQLite connection
+        queue = TTSJobQueue(TestingSessionLocal, workers=1, poll_interval=0.05)
+        
+        queue.start()
+        try:
+            deadline = time.monotonic() + 5
+            while metrics.snapshot()["counters"].get("tts_queue.done", 0) < 6 and time.monotonic() < deadline:
+                time.sleep(0.02)
+        finally:
+            queue.stop()
+        
+        assert tts_queue.status(db) == {"pending": 0, "running": 0, "done": 6, "failed": 0, "total": 6}
+        assert len(generated) == 6
+    
+    def test_start_leaves_live_jobs_alone(self, db: Session, test_sentences: list[Sentence], generated):
+        """Test a second process starting does not take the job the first one is running"""
+        tts_queue.enqueue(db, [s.id for s in test_sentences])
+        db.commit()
+        first = TTSJobQueue(TestingSessionLocal, workers=1)
+        session = TestingSessionLocal()
+        running = first._claim(session)
+        second = TTSJobQueue(TestingSessionLocal, workers=1, poll_interval=0.05)
+        
+        second.start()
+        try:
+            deadline = time.monotonic() + 5
+            while metrics.snapshot()["counters"].get("tts_queue.done", 0) < 5 and time.monotonic() < deadline:
+                time.sleep(0.02)
+        finally:
+            second.stop()
+        
+        assert tts_queue.status(db) == {"pending": 0, "running": 1, "done": 5, "failed": 0, "total": 6}
+        assert len(generated) == 5
+        
+        first._process(session, running)
+        session.close()
+        assert tts_queue.status(db)["done"] == 6
@@ -2,6 +2,7 @@
 import pytest
 import os
 import tempfile
+import unicodedata
 from pathlib import Path
 from unittest.mock import patch, MagicMock
 
@@ -33,83 +34,120 @@ class TestTTSService:
     
     def test_get_audio_path(self, tts_service, temp_audio_dir):
         """Test audio path generation"""
-        path = tts_service.get_audio_path(123, "vi")
+        key = tts_service.audio_key("Xin chào", "vi")
+        path = tts_service.get_audio_path(key)
         
-        assert temp_audio_dir in path
-        assert "123_vi.mp3" in path
+        assert path == os.path.join(temp_audio_dir, key[:2], f"{key}.mp3")
     
-    def test_get_audio_path_english(self, tts_service):
-        """Test audio path for English"""
-        path = tts_service.get_audio_path(456, "en")
-        assert "456_en.mp3" in path
+    def test_audio_key_normalizes_text(self, tts_service):
+        """Test whitespace and Unicode composition do not change the key"""
+        decomposed = unicodedata.normalize("NFD", "Cảm ơn")
+        
+        assert tts_service.audio_key(f"  {decomposed}\n", "vi") == tts_service.audio_key("Cảm ơn", "vi")
+        assert tts_service.audio_key("Cảm ơn", "vi") != tts_service.audio_key("Cám ơn", "vi")
+    
+    def test_audio_key_covers_language_engine_and_voice(self, temp_audio_dir):
+        """Test any synthesis setting yields a different key"""
+        base = TTSService(audio_dir=temp_audio_dir, engine="gtts", voice="")
+        keys = {
+            base.audio_key("Hello", "en"),
+            base.audio_key("Hello", "vi"),
+            TTSService(audio_dir=temp_audio_dir, engine="pyttsx3", voice="").audio_key("Hello", "en"),
+            TTSService(audio_dir=temp_audio_dir, engine="gtts", voice="com.au").audio_key("Hello", "en"),
+        }
+        assert len(keys) == 4
     
-    @patch('app.services.tts_service.gTTS')
+    @patch('app.services.tts_engines.gTTS')
     def test_generate_audio_success(self, mock_gtts, tts_service):
         """Test audio generation success"""
         mock_tts_instance = MagicMock()
+        mock_tts_instance.save.side_effect = lambda path: Path(path).write_bytes(b"mp3")
         mock_gtts.return_value = mock_tts_instance
         
-        file_path = tts_service.generate_audio("Hello", "en", 1)
+        file_path = tts_service.generate_audio("Hello", "en")
         
         # Verify gTTS called
         mock_gtts.assert_called_once_with(text="Hello", lang="en", slow=False)
         mock_tts_instance.save.assert_called_once()
-        assert file_path.endswith("1_en.mp3")
+        assert file_path == tts_service.get_audio_path(tts_service.audio_key("Hello", "en"))
+        assert Path(file_path).read_bytes() == b"mp3"
+        # Only the final file is left behind
+        assert os.listdir(os.path.dirname(file_path)) == [os.path.basename(file_path)]
     
-    @patch('app.services.tts_service.gTTS')
+    @patch('app.services.tts_engines.gTTS')
+    def test_generate_audio_streams_chunks(self, mock_gtts, tts_service):
+        """Test chunks reach the listener as they are written, and the file is only promoted at the end"""
+        chunks = []
+        
+        def stream():
+            for chunk in (b"ab", b"cd"):
+                # Nothing is in the cache before the synthesis ends
+                assert not os.path.exists(tts_service.get_audio_path(tts_service.audio_key("Hello", "en")))
+                yield chunk
+        
+        mock_gtts.return_value.stream.side_effect = stream
+        
+        file_path = tts_service.generate_audio("Hello", "en", on_chunk=chunks.append)
+        
+        assert chunks == [b"ab", b"cd"]
+        assert Path(file_path).read_bytes() == b"abcd"
+        mock_gtts.return_value.save.assert_not_called()
+        assert os.listdir(os.path.dirname(file_path)) == [os.path.basename(file_path)]
+    
+    @patch('app.services.tts_engines.gTTS')
     def test_generate_audio_vietnamese(self, mock_gtts, tts_service):
         """Test Vietnamese audio generation"""
         mock_tts_instance = MagicMock()
+        mock_tts_instance.save.side_effect = lambda path: Path(path).touch()
         mock_gtts.return_value = mock_tts_instance
         
-        tts_service.generate_audio("Xin chào", "vi", 2)
+        tts_service.generate_audio("Xin chào", "vi")
         
         mock_gtts.assert_called_once_with(text="Xin chào", lang="vi", slow=False)
     
-    @patch('app.services.tts_service.gTTS')
+    @patch('app.services.tts_engines.gTTS')
+    def test_generate_audio_with_voice(self, mock_gtts, temp_audio_dir):
+        """Test the voice setting is passed to gTTS as the accent domain"""
+        mock_gtts.return_value.save.side_effect = lambda path: Path(path).touch()
+        
+        TTSService(audio_dir=temp_audio_dir, engine="gtts", voice="co.uk").generate_audio("Hello", "en")
+        
+        mock_gtts.assert_called_once_with(text="Hello", lang="en", slow=False, tld="co.uk")
+    
+    @patch('app.services.tts_engines.gTTS')
     def test_generate_audio_skips_existing(self, mock_gtts, tts_service):
         """Test skips generation if file exists"""
         # Create dummy file
-        file_path = tts_service.get_audio_path(3, "en")
+        file_path = tts_service.get_audio_path(tts_service.audio_key("Test", "en"))
+        Path(file_path).parent.mkdir(parents=True)
         Path(file_path).touch()
         
-        result = tts_service.generate_audio("Test", "en", 3)
+        result = tts_service.generate_audio("Test", "en")
         
         # Should not call gTTS
         mock_gtts.assert_not_called()
         assert result == file_path
     
-    @patch('app.services.tts_service.gTTS')
+    @patch('app.services.tts_engines.gTTS')
     def test_generate_audio_handles_error(self, mock_gtts, tts_service):
         """Test handles generation error"""
         mock_gtts.side_effect = Exception("TTS Error")
         
         with pytest.raises(BadRequestException) as exc_info:
-            tts_service.generate_audio("Test", "en", 4)
+            tts_service.generate_audio("Test", "en")
         
         assert "Failed to generate audio" in str(exc_info.value.detail)
     
-    def test_delete_audio(self, tts_service):
+    def test_delete_blob(self, tts_service):
         """Test audio file deletion"""
         # Create dummy file
-        file_path = tts_service.get_audio_path(5, "vi")
+        key = tts_service.audio_key("Test", "vi")
+        file_path = tts_service.get_audio_path(key)
+        Path(file_path).parent.mkdir(parents=True)
         Path(file_path).touch()
         
         assert os.path.exists(file_path)
         
-        tts_service.delete_audio(5, "vi")
+        tts_service.delete_blob(key)
         
         assert not os.path.exists(file_path)
-    
-    def test_delete_audio_both_languages(self, tts_service):
-        """Test deleting audio for both languages"""
-        # Create dummy files
-        vi_path = tts_service.get_audio_path(6, "vi")
-        en_path = tts_service.get_audio_path(6, "en")
-        Path(vi_path).touch()
-        Path(en_path).touch()
-        
-        tts_service.delete_audio(6)
-        
-        assert not os.path.exists(vi_path)
-        assert not os.path.exists(en_path)
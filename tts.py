@@ -1,6 +1,8 @@
 from pathlib import Path
 from typing import Optional
+import atexit
 import json
+import shutil
 import subprocess
 import platform
 import time
@@ -10,8 +12,31 @@ CONFIG_PATH = PROJECT_DIR / "config.json"
 AUDIO_DIR = PROJECT_DIR / "audio"
 AUDIO_DIR.mkdir(exist_ok=True)
 
+# config.json as last read, keyed by its mtime: re-read only after an edit
+_config_cache = {"mtime": None, "config": None}
+
+# pyttsx3 driver and the voice picked per language, set up on first use
+_pyttsx3 = {"engine": None, "voices": {}}
+
+# Playback: the `mpg123 -R` process kept for the session, or the one-shot
+# player process of the clip now playing (so it can be cut short and reaped)
+_player = {"mpg123": None, "process": None}
+
 
 def load_config():
+    try:
+        mtime = CONFIG_PATH.stat().st_mtime
+    except FileNotFoundError:
+        mtime = None
+    if mtime is not None and _config_cache["mtime"] == mtime:
+        return _config_cache["config"]
+    config = _read_config()
+    _config_cache["mtime"] = CONFIG_PATH.stat().st_mtime
+    _config_cache["config"] = config
+    return config
+
+
+def _read_config():
     if not CONFIG_PATH.exists():
         # Create a default config file if it doesn't exist
         default_config = {
@@ -41,6 +66,19 @@ def synthesize(text: str, lang: str, basename: str, engine: Optional[str] = None
         raise ValueError(f"Unknown tts engine: {engine}")
 
 
+def warm_up(engine: Optional[str] = None):
+    """Import / initialize the engine ahead of the first synthesis."""
+    cfg = load_config()
+    engine = engine or cfg.get("tts_engine", "gtts")
+    if engine == "gtts":
+        from gtts import gTTS  # noqa: F401
+    elif engine == "pyttsx3":
+        import pyttsx3
+        if _pyttsx3["engine"] is None:
+            _pyttsx3["engine"] = pyttsx3.init()
+            _pyttsx3["voices"] = {}
+
+
 def _synthesize_gtts(text: str, lang: str, basename: str) -> Path:
     from gtts import gTTS
     out_path = AUDIO_DIR / f"{basename}.mp3"
@@ -57,15 +95,20 @@ def _synthesize_pyttsx3(text: str, lang: str, basename: str, cfg) -> Path:
     import pyttsx3
     out_path = AUDIO_DIR / f"{basename}.wav"
     try:
-        engine = pyttsx3.init()
+        if _pyttsx3["engine"] is None:
+            _pyttsx3["engine"] = pyttsx3.init()
+            _pyttsx3["voices"] = {}
+        engine = _pyttsx3["engine"]
         rate = cfg.get("pyttsx3", {}).get("rate", 175)
         volume = cfg.get("pyttsx3", {}).get("volume", 1.0)
 
-        voices = engine.getProperty('voices')
-        for voice in voices:
-            if lang in voice.languages:
-                engine.setProperty('voice', voice.id)
-                break
+        if lang not in _pyttsx3["voices"]:
+            _pyttsx3["voices"][lang] = next(
+                (voice.id for voice in engine.getProperty('voices') if lang in voice.languages),
+                None,
+            )
+        if _pyttsx3["voices"][lang]:
+            engine.setProperty('voice', _pyttsx3["voices"][lang])
 
         engine.setProperty('rate', rate)
         engine.setProperty('volume', volume)
@@ -74,27 +117,107 @@ def _synthesize_pyttsx3(text: str, lang: str, basename: str, cfg) -> Path:
         time.sleep(0.1)
         return out_path
     except Exception as e:
+        _pyttsx3["engine"] = None
         print(f"pyttsx3 synthesis failed: {e}")
         return Path("")
 
 
+def _mpg123() -> Optional[subprocess.Popen]:
+    """The long-lived mpg123 in remote-control mode, started (or restarted) on demand."""
+    process = _player["mpg123"]
+    if process is not None and process.poll() is None:
+        return process
+    if not shutil.which("mpg123"):
+        return None
+    _player["mpg123"] = subprocess.Popen(
+        ["mpg123", "-R"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        bufsize=1,
+    )
+    # No per-frame progress lines
+    _send_mpg123(_player["mpg123"], "SILENCE")
+    return _player["mpg123"]
+
+
+def _send_mpg123(process: subprocess.Popen, command: str) -> bool:
+    try:
+        process.stdin.write(command + "\n")
+        process.stdin.flush()
+        return True
+    except (BrokenPipeError, OSError):
+        return False
+
+
+def _one_shot_player(path: Path, system: str) -> Optional[list]:
+    if system == "Darwin":
+        return ["afplay", str(path)]
+    if system == "Linux":
+        return ["mpg123", "-q", str(path)] if path.suffix == ".mp3" else ["aplay", "-q", str(path)]
+    return None
+
+
 def play_audio(path: Path):
+    """Play a clip, cutting off whatever is playing. Returns at once."""
     if not path.exists():
         print(f"Audio file not found: {path}")
         return
 
+    stop_audio()
     system = platform.system()
     try:
-        if system == "Darwin":
-            subprocess.Popen(["afplay", str(path)], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        elif system == "Linux":
-            subprocess.Popen(["mpg123", str(path)], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        elif system == "Windows":
+        if path.suffix == ".mp3" and system in ("Linux", "Darwin"):
+            # LOAD starts the clip right away: no process start-up per play
+            process = _mpg123()
+            if process is not None and _send_mpg123(process, f"LOAD {path}"):
+                return
+        if system == "Windows":
             import winsound
             winsound.PlaySound(str(path), winsound.SND_FILENAME | winsound.SND_ASYNC)
-        else:
+            return
+        command = _one_shot_player(path, system)
+        if command is None:
             print(f"Don't know how to play audio on {system}")
+            return
+        _player["process"] = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
     except FileNotFoundError:
         print(f"Audio player not found. Please install a player for your OS (e.g., afplay on macOS, mpg123 on Linux).")
     except Exception as e:
-        print("Audio playback failed:", e)
\ No newline at end of file
+        print("Audio playback failed:", e)
+
+
+def stop_audio():
+    """Cut the clip now playing short, if any."""
+    process = _player["mpg123"]
+    if process is not None and process.poll() is None:
+        _send_mpg123(process, "STOP")
+
+    process = _player["process"]
+    if process is not None:
+        if process.poll() is None:
+            process.terminate()
+        process.wait()  # reap it: no zombies over a long session
+        _player["process"] = None
+
+    if platform.system() == "Windows":
+        import winsound
+        winsound.PlaySound(None, 0)
+
+
+def close_audio():
+    """Stop playback and the mpg123 process."""
+    stop_audio()
+    process = _player["mpg123"]
+    if process is not None:
+        _send_mpg123(process, "QUIT")
+        try:
+            process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        _player["mpg123"] = None
+
+
+atexit.register(close_audio)
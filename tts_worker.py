@@ -0,0 +1,88 @@
+"""
+Long-lived TTS worker process for the desktop trainer.
+
+The engine is set up once in a child process (which also gives pyttsx3
+a main thread of its own) and synthesizes requests one at a time. The
+Tk UI submits requests with `request()` and picks up finished files by
+calling `poll()` from `after()`, so it never blocks and never touches
+the database from another thread. A request for a sentence/language
+already queued is dropped: clicking twice synthesizes once.
+"""
+import multiprocessing as mp
+import queue
+from pathlib import Path
+from typing import Optional
+
+
+def _serve(requests, results, engine: Optional[str]):
+    import tts
+
+    # Pay the engine start-up before the first click, not on it
+    try:
+        tts.warm_up(engine)
+    except Exception as e:
+        print(f"TTS warm-up failed: {e}")
+
+    while True:
+        item = requests.get()
+        if item is None:
+            break
+        text, lang, basename = item
+        try:
+            path = tts.synthesize(text, lang, basename, engine)
+        except Exception as e:
+            print(f"TTS synthesis failed: {e}")
+            path = Path("")
+        results.put((basename, str(path) if path.name else ""))
+
+
+class TTSWorker:
+    def __init__(self, engine: Optional[str] = None):
+        self.engine = engine
+        self._context = mp.get_context("spawn")
+        self._requests = self._context.Queue()
+        self._results = self._context.Queue()
+        self._pending = set()
+        self._process = None
+
+    def start(self):
+        if self._process and self._process.is_alive():
+            return
+        self._process = self._context.Process(
+            target=_serve, args=(self._requests, self._results, self.engine), name="tts-worker", daemon=True
+        )
+        self._process.start()
+
+    def request(self, text: str, lang: str, basename: str) -> bool:
+        """Queue a synthesis; False if the same basename is already queued."""
+        if self._process is None or not self._process.is_alive():
+            # First use, or the worker died: whatever it had queued is lost
+            self._pending.clear()
+            self.start()
+        if basename in self._pending:
+            return False
+        self._pending.add(basename)
+        self._requests.put((text, lang, basename))
+        return True
+
+    def poll(self) -> list:
+        """Finished syntheses since the last call: [(basename, path or "")]. Never blocks."""
+        done = []
+        while True:
+            try:
+                basename, path = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending.discard(basename)
+            done.append((basename, path))
+        return done
+
+    def stop(self, timeout: float = 2.0):
+        if self._process is None:
+            return
+        self._requests.put(None)
+        self._process.join(timeout)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        self._process = None